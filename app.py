@@ -5,26 +5,109 @@ A Flask-based audit tool for HIPAA Security Rule compliance assessment
 Created by Chaitanya Eshwar Prasad
 """
 
+import fcntl
+import glob
+import hashlib
 import os
 import sqlite3
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify
+from flask import Flask, abort, render_template, stream_template, request, redirect, url_for, session, flash, send_file, jsonify, g, has_app_context, stream_with_context
+from markupsafe import escape
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+import werkzeug.utils
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from datetime import datetime
+import hmac
 import json
+import mimetypes
+import time
+import click
+from functools import wraps
+from itertools import groupby
+from operator import itemgetter
+
+from db import ConnectionPool
+from cache import DataGeneration, ResponseCache
+import assets
+import auditlog
+import catalog
+import events
+import evidence_store
+import export
+import extraction
+import importer
+import listing
+import metrics
+import reportjobs
+import schema
+import slowlog
+import search
+import stats
+import thumbnails
+import writer
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'hipaa-audit-secret-key-change-in-production'
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
+app.config['UPLOAD_FOLDER'] = evidence_store.DEFAULT_FOLDER  # never under static/: evidence needs a login
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs('database', exist_ok=True)
+# Hand evidence downloads to the front proxy: None, 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd)
+app.config['EVIDENCE_OFFLOAD'] = os.environ.get('EVIDENCE_OFFLOAD') or None
+app.config['EVIDENCE_ACCEL_PREFIX'] = '/protected-evidence/'  # nginx internal location mapped to UPLOAD_FOLDER
 
 # Database configuration
 DATABASE = 'database/hipaa_audit.db'
+app.config['DATABASE'] = DATABASE
+app.config['DB_POOL_SIZE'] = 10
+app.config['DB_POOL_TIMEOUT'] = 30.0  # seconds to wait for a free connection
+app.config['DB_BUSY_TIMEOUT_MS'] = 5000
+app.config['DB_CACHE_SIZE_KB'] = 16384
+app.config['DB_MMAP_SIZE'] = 64 * 1024 * 1024
+app.config['REQUIREMENT_CATALOG'] = catalog.CATALOG_PATH  # versioned HIPAA requirement list, synced at startup
+app.config['IMPORT_BATCH_SIZE'] = importer.DEFAULT_BATCH_SIZE  # rows per executemany in bulk imports
+
+# Audit trail, written in batches by a background thread
+app.config['AUDIT_BATCH_SIZE'] = 500  # most entries committed per transaction
+app.config['AUDIT_MAX_QUEUE'] = 10000  # entries buffered before requests wait for the writer
+
+# Route writes, group-committed by one writer thread per worker process
+app.config['WRITE_BATCH_MAX'] = 64  # most write intents committed per transaction
+app.config['WRITE_QUEUE_MAX'] = 1000  # intents buffered before requests wait to queue theirs
+app.config['WRITE_TIMEOUT'] = 30.0  # seconds a request waits for its write before failing
+
+# Report job queue; finished reports are stored per (report type, data generation)
+app.config['REPORT_FOLDER'] = 'database/reports'
+app.config['REPORT_WORKERS'] = 2  # rendering threads per worker process
+app.config['REPORT_WAIT_SECONDS'] = 3.0  # how long a request waits for a new report before showing progress
+app.config['REPORT_CACHE_MAX_AGE'] = 7 * 24 * 3600  # stored reports older than this are evicted
+app.config['REPORT_CACHE_MAX_BYTES'] = 256 * 1024 * 1024  # beyond this the oldest stored reports are evicted
+
+# Live dashboard updates over Server-Sent Events
+app.config['SSE_MAX_SUBSCRIBERS'] = 50  # open streams per worker; more get 503 and fall back to polling
+app.config['SSE_HEARTBEAT'] = 15.0  # seconds between keep-alive comments
+app.config['SSE_POLL_INTERVAL'] = 2.0  # seconds between checks for writes by other workers (0 = this worker only)
+app.config['SSE_COALESCE'] = 1.0  # seconds to let a burst of writes settle into one event
+app.config['SSE_RETRY_MS'] = 5000  # client reconnect delay
+
+# Background text extraction from uploaded evidence
+app.config['EXTRACTION_WORKERS'] = 2  # extraction threads per worker process
+app.config['EXTRACTION_MAX_ATTEMPTS'] = 3  # tries before a job stays 'failed'
+app.config['EXTRACTION_RETRY_DELAY'] = 5.0  # seconds before the first retry, doubling after each failure
+
+# Image evidence previews, rendered in the background and cached by content hash
+app.config['PREVIEW_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'previews')
+app.config['PREVIEW_WORKERS'] = 1  # rendering threads per worker process
+app.config['PREVIEW_MAX_AGE'] = 365 * 24 * 3600  # renditions never change for a given hash
+
+# Statements slower than this are logged with their query plan (0 turns the log off)
+app.config['SLOW_QUERY_MS'] = 100
+app.config['SLOW_QUERY_LOG'] = 'database/slow_queries.log'  # JSON lines from every worker; None keeps them in memory only
+app.config['SLOW_QUERY_TOP'] = 20  # statements in the /debug/database report
+
+# Prometheus scrapes of /metrics; when a token is set, scrapers must send it as a Bearer token
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN') or None
+
+# Assets from flask build-assets have content-hashed names, so browsers may keep them for good
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600
 
 # Template helper functions
 def get_file_icon(filename):
@@ -68,121 +151,97 @@ def format_file_size(size_bytes):
     
     return f"{size_bytes:.1f} TB"
 
+def list_url(endpoint, filters, **changes):
+    """URL for a paginated list view with some filters or cursors changed"""
+    args = dict(filters)
+    args.update(changes)
+    return url_for(endpoint, **{key: value for key, value in args.items() if value})
+
+def evidence_preview_url(evidence, rendition='thumb'):
+    """URL of a cached image preview for an evidence row, or None to show the icon"""
+    digest = evidence['blob_sha256']
+    if not digest or not thumbnail_pool.cached(digest, rendition):
+        return None
+    return url_for('evidence_preview', digest=digest, rendition=rendition)
+
 # Register template filters
 app.jinja_env.filters['get_file_icon'] = get_file_icon
 app.jinja_env.filters['format_file_size'] = format_file_size
+app.jinja_env.globals['list_url'] = list_url
+app.jinja_env.globals['evidence_preview_url'] = evidence_preview_url
 
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get database connection (pooled, shared for the whole request)"""
+    if not has_app_context():
+        return db_pool.acquire()
+    
+    if 'db_conn' not in g:
+        conn = db_pool.acquire()
+        conn.request_bound = True
+        g.db_conn = conn
+    return g.db_conn
 
-def init_database():
-    """Initialize database with required tables"""
-    conn = get_db_connection()
-    
-    # Users table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            email TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # HIPAA Security Rule Requirements table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS hipaa_requirements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            requirement_id TEXT UNIQUE NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT,
-            category TEXT NOT NULL,
-            status TEXT DEFAULT 'Not Assessed',
-            notes TEXT,
-            assessed_by TEXT,
-            assessed_at TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Evidence table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS evidence (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            requirement_id TEXT NOT NULL,
-            filename TEXT NOT NULL,
-            original_filename TEXT NOT NULL,
-            file_path TEXT NOT NULL,
-            file_size INTEGER,
-            description TEXT,
-            uploaded_by TEXT,
-            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (requirement_id) REFERENCES hipaa_requirements (requirement_id)
-        )
-    ''')
-    
-    # Add description column if it doesn't exist (for existing databases)
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Return the request's database connection to the pool"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+@app.before_request
+def start_request_metrics():
+    """Time the request and tally its queries"""
+    request_metrics.start_request(request.endpoint or 'unmatched')
+
+@app.after_request
+def note_response_status(response):
+    """Keep the status for the metrics recorded at teardown"""
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exception):
+    """Record latency and query totals once the response (streamed or not) is done"""
+    status = 500 if exception is not None else g.get('response_status', 500)
+    # Unrouted paths share one label so scanners cannot inflate the series count
+    request_metrics.finish_request(request.endpoint or 'unmatched', request.method, status)
+
+def database_current(conn, catalog_hash):
+    """True when the schema, default admin user and requirement catalog need no work, in one query"""
     try:
-        conn.execute('ALTER TABLE evidence ADD COLUMN description TEXT')
-        conn.commit()
+        state = conn.execute('''
+            SELECT (SELECT MAX(version) FROM schema_version) AS schema_version,
+                   (SELECT content_hash FROM catalog_state WHERE catalog = ?) AS catalog_hash,
+                   EXISTS (SELECT 1 FROM users WHERE username = ?) AS admin_exists
+        ''', (catalog.CATALOG_NAME, 'acep')).fetchone()
     except sqlite3.OperationalError:
-        # Column already exists
-        pass
-    
-    # Risk register table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS risks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            likelihood INTEGER NOT NULL CHECK (likelihood BETWEEN 1 AND 5),
-            impact INTEGER NOT NULL CHECK (impact BETWEEN 1 AND 5),
-            risk_score INTEGER GENERATED ALWAYS AS (likelihood * impact) STORED,
-            mitigation TEXT,
-            owner TEXT,
-            status TEXT DEFAULT 'Open',
-            created_by TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        return False  # fresh database, or one from before the catalog was versioned
+    return ((state['schema_version'] or 0) >= schema.LATEST_VERSION and bool(state['admin_exists'])
+            and state['catalog_hash'] == catalog_hash)
+
+def init_database():
+    """Initialize database: migrations, default admin user and requirement catalog, each only when stale"""
+    catalog_hash = catalog.content_hash(app.config['REQUIREMENT_CATALOG'])
+    conn = get_db_connection()
     
-    # PHI Tracking table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS phi_tracking (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            phi_type TEXT NOT NULL,
-            description TEXT,
-            classification TEXT NOT NULL,
-            access_patterns TEXT,
-            disposal_procedures TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    # A restarted worker finds everything current with a single query
+    if database_current(conn, catalog_hash):
+        conn.close()
+        return
     
-    # Business Associate Management table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS business_associates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            contact_person TEXT,
-            email TEXT,
-            phone TEXT,
-            contract_status TEXT DEFAULT 'Active',
-            compliance_status TEXT DEFAULT 'Under Review',
-            last_assessment_date DATE,
-            next_assessment_date DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    # Workers started together take turns here: the first bootstraps the
+    # database, the others find it current once they get the lock
+    with open(app.config['DATABASE'] + '.init-lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not database_current(conn, catalog_hash):
+            bootstrap_database(conn)
     
-    conn.commit()
+    conn.close()
+
+def bootstrap_database(conn):
+    """Apply pending migrations, create the default admin user and sync the requirement catalog"""
+    # Tables, indexes and the stats rollup are created by numbered migrations
+    schema.migrate(conn, root_path=app.root_path)
     
     # Create default admin user if not exists
     admin_exists = conn.execute('SELECT id FROM users WHERE username = ?', ('acep',)).fetchone()
@@ -192,85 +251,16 @@ def init_database():
                     ('acep', password_hash, 'acep@chaitanyaeshwarprasad.com'))
         conn.commit()
     
-    # Load HIPAA Security Rule requirements if not exists
-    requirements_exist = conn.execute('SELECT COUNT(*) as count FROM hipaa_requirements').fetchone()
-    if requirements_exist['count'] == 0:
-        load_hipaa_requirements(conn)
-    
-    conn.close()
-
-def load_hipaa_requirements(conn):
-    """Load HIPAA Security Rule requirements into database"""
-    requirements = [
-        # 1. Administrative Safeguards (Security Rule)
-        ('A.1', 'Appoint a HIPAA Privacy Officer and HIPAA Security Officer', 'Designate and document individuals responsible for HIPAA privacy and security compliance within the organization.', 'Administrative Safeguards'),
-        ('A.2', 'Conduct and document a risk assessment of PHI and ePHI', 'Perform comprehensive risk analysis to identify potential threats and vulnerabilities to protected health information.', 'Administrative Safeguards'),
-        ('A.3', 'Implement a risk management plan', 'Develop and execute strategies to address identified risks and reduce them to acceptable levels.', 'Administrative Safeguards'),
-        ('A.4', 'Develop and enforce policies and procedures', 'Create comprehensive written policies and procedures for HIPAA compliance and ensure workforce adherence.', 'Administrative Safeguards'),
-        ('A.5', 'Train all employees on HIPAA policies and security awareness', 'Provide regular training to all workforce members on HIPAA requirements and security best practices.', 'Administrative Safeguards'),
-        ('A.6', 'Perform periodic security audits and reviews', 'Conduct regular assessments to evaluate compliance with HIPAA Security Rule requirements.', 'Administrative Safeguards'),
-        ('A.7', 'Implement sanction policies for violations', 'Establish and enforce disciplinary procedures for workforce members who violate HIPAA policies.', 'Administrative Safeguards'),
-        
-        # 2. Physical Safeguards (Security Rule)
-        ('P.1', 'Control facility access to areas where ePHI is stored', 'Implement physical access controls to restrict entry to locations containing electronic protected health information.', 'Physical Safeguards'),
-        ('P.2', 'Implement workstation use and security policies', 'Establish policies governing the proper use and security of workstations that access ePHI.', 'Physical Safeguards'),
-        ('P.3', 'Secure mobile devices and portable media', 'Implement safeguards to protect ePHI on mobile devices and portable storage media.', 'Physical Safeguards'),
-        ('P.4', 'Protect and monitor server rooms and equipment', 'Secure server rooms and critical equipment with appropriate physical controls and monitoring.', 'Physical Safeguards'),
-        
-        # 3. Technical Safeguards (Security Rule)
-        ('T.1', 'Implement access controls (unique user IDs, emergency access)', 'Establish unique user identification and emergency access procedures for ePHI systems.', 'Technical Safeguards'),
-        ('T.2', 'Use encryption for ePHI in transit and at rest', 'Implement encryption technologies to protect ePHI during transmission and storage.', 'Technical Safeguards'),
-        ('T.3', 'Enable audit controls to log access to ePHI', 'Implement mechanisms to record and examine activity in information systems containing ePHI.', 'Technical Safeguards'),
-        ('T.4', 'Use automatic logoff and session timeouts', 'Configure systems to automatically terminate sessions after periods of inactivity.', 'Technical Safeguards'),
-        ('T.5', 'Ensure data integrity mechanisms are in place', 'Implement policies and procedures to protect ePHI from improper alteration or destruction.', 'Technical Safeguards'),
-        ('T.6', 'Implement transmission security (e.g., TLS, VPN)', 'Use technical security measures to guard against unauthorized access to ePHI during transmission.', 'Technical Safeguards'),
-        
-        # 4. Privacy Rule Requirements
-        ('PR.1', 'Provide Notice of Privacy Practices (NPP) to patients', 'Distribute written notice explaining how the organization uses and discloses PHI.', 'Privacy Rule Requirements'),
-        ('PR.2', 'Limit use/disclosure of PHI to the minimum necessary', 'Implement policies to use or disclose only the minimum PHI necessary for the intended purpose.', 'Privacy Rule Requirements'),
-        ('PR.3', 'Obtain authorization for non-routine disclosures', 'Secure written permission from individuals before using or disclosing PHI for non-routine purposes.', 'Privacy Rule Requirements'),
-        ('PR.4', 'Grant individuals access to their health records', 'Provide individuals with access to inspect and obtain copies of their PHI.', 'Privacy Rule Requirements'),
-        ('PR.5', 'Allow corrections/amendments to PHI', 'Establish procedures for individuals to request corrections or amendments to their PHI.', 'Privacy Rule Requirements'),
-        ('PR.6', 'Implement policies for handling requests for restriction', 'Develop procedures to address individual requests to restrict certain uses and disclosures of PHI.', 'Privacy Rule Requirements'),
-        ('PR.7', 'Verify identity before disclosing PHI', 'Implement reasonable procedures to verify the identity of individuals requesting PHI.', 'Privacy Rule Requirements'),
-        
-        # 5. Breach Notification Rule
-        ('BN.1', 'Develop a Breach Notification Policy', 'Create comprehensive policies and procedures for identifying and responding to breaches of unsecured PHI.', 'Breach Notification Rule'),
-        ('BN.2', 'Maintain a log of all security incidents and breaches', 'Document all security incidents and breaches for tracking and reporting purposes.', 'Breach Notification Rule'),
-        ('BN.3', 'Notify affected individuals within 60 days of discovery', 'Provide notification to individuals whose unsecured PHI has been compromised within required timeframe.', 'Breach Notification Rule'),
-        ('BN.4', 'Notify the HHS Office for Civil Rights (OCR)', 'Report breaches to OCR according to established timelines based on number of affected individuals.', 'Breach Notification Rule'),
-        ('BN.5', 'Notify the media (if >500 individuals affected in a region)', 'Provide media notification for breaches affecting more than 500 individuals in a state or region.', 'Breach Notification Rule'),
-        
-        # 6. Business Associate Agreements (BAAs)
-        ('BA.1', 'Identify all business associates (vendors handling PHI)', 'Maintain comprehensive inventory of all business associates who create, receive, maintain, or transmit PHI.', 'Business Associate Agreements'),
-        ('BA.2', 'Execute HIPAA-compliant BAAs with each associate', 'Establish written agreements ensuring business associates comply with applicable HIPAA requirements.', 'Business Associate Agreements'),
-        ('BA.3', 'Ensure business associates are HIPAA compliant', 'Verify that business associates have appropriate safeguards and compliance measures in place.', 'Business Associate Agreements'),
-        ('BA.4', 'Review BAAs regularly for compliance updates', 'Periodically review and update business associate agreements to maintain HIPAA compliance.', 'Business Associate Agreements'),
-        
-        # 7. Documentation & Record-Keeping
-        ('DR.1', 'Maintain HIPAA-related policies and procedures for 6 years', 'Retain all HIPAA-related documentation for the required six-year retention period.', 'Documentation & Record-Keeping'),
-        ('DR.2', 'Keep records of training, risk assessments, and compliance efforts', 'Document all training activities, risk assessments, and compliance initiatives for audit purposes.', 'Documentation & Record-Keeping'),
-        ('DR.3', 'Document all breach investigations and outcomes', 'Maintain comprehensive records of breach investigations, findings, and remediation actions.', 'Documentation & Record-Keeping'),
-        
-        # 8. Ongoing Monitoring & Auditing
-        ('OA.1', 'Conduct periodic internal audits', 'Perform regular internal assessments to evaluate ongoing compliance with HIPAA requirements.', 'Ongoing Monitoring & Auditing'),
-        ('OA.2', 'Review access logs for unauthorized activity', 'Regularly examine system access logs to identify and investigate suspicious or unauthorized activities.', 'Ongoing Monitoring & Auditing'),
-        ('OA.3', 'Monitor compliance with technical and physical safeguards', 'Continuously assess adherence to technical and physical security measures.', 'Ongoing Monitoring & Auditing'),
-        ('OA.4', 'Update policies/procedures as needed', 'Maintain current policies and procedures by updating them based on changes in operations or regulations.', 'Ongoing Monitoring & Auditing')
-    ]
-    
-    for requirement_id, title, description, category in requirements:
-        conn.execute('''
-            INSERT OR IGNORE INTO hipaa_requirements (requirement_id, title, description, category)
-            VALUES (?, ?, ?, ?)
-        ''', (requirement_id, title, description, category))
-    
-    conn.commit()
+    # Bring the HIPAA requirements up to the catalog file, keeping every assessment
+    report = catalog.sync_catalog(conn, catalog.load_catalog(app.config['REQUIREMENT_CATALOG']))
+    if report:
+        print(f"Requirement catalog v{report['version']}: {report['added']} added, {report['updated']} updated")
+        if report['retired']:
+            print(f"Requirements no longer in the catalog (kept): {', '.join(report['retired'])}")
 
 # Authentication helper functions
 def login_required(f):
     """Decorator to require login for routes"""
-    from functools import wraps
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
@@ -278,6 +268,249 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Cache helper functions
+def mark_data_changed():
+    """Invalidate cached API responses and notify live streams after a write"""
+    data_generation.bump()
+    change_notifier.publish()
+
+def audit(action, entity_type, entity_id=None, username=None, **details):
+    """Queue an audit trail entry for the current user (committed in the background)"""
+    audit_trail.record(action, entity_type, entity_id,
+                       username=username or session.get('username'),
+                       details=details)
+
+def cached_api(f):
+    """Decorator serving read-only API responses from the generation cache"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.full_path
+        generation = data_generation.current()
+        entry = response_cache.get(key, generation)
+        
+        if entry is not None:
+            etag, body, mimetype = entry
+            # Nothing changed since the client's copy: no body, no DB access
+            if request.if_none_match.contains(etag):
+                response_cache.count_not_modified()
+                response = app.response_class(status=304)
+            else:
+                response = app.response_class(body, mimetype=mimetype)
+        else:
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            etag = response_cache.put(key, generation, response.get_data(), response.mimetype)
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+# Report helper functions
+def report_context(conn, report_type, requested_by):
+    """Template and context of a report; detail rows stay cursors read while rendering"""
+    generated_at = datetime.now()
+    
+    if report_type == 'compliance':
+        # Counts come from the stats rollup; only the detail rows are read from the tables
+        summary = stats.read_rollup(conn)
+        requirement_summary = summary['requirements']
+        risk_summary = summary['risks']
+        
+        documented_controls = conn.execute('''
+            SELECT COUNT(*) FROM hipaa_requirements
+            WHERE notes IS NOT NULL AND notes != ''
+        ''').fetchone()[0]
+        
+        requirements = conn.execute('''
+            SELECT requirement_id, title, category, status, notes, assessed_by
+            FROM hipaa_requirements
+            ORDER BY category, requirement_id
+        ''')
+        non_compliant = conn.execute('''
+            SELECT requirement_id, title FROM hipaa_requirements
+            WHERE status = 'Not Compliant'
+            ORDER BY category, requirement_id
+        ''')
+        risks = conn.execute('SELECT * FROM risks ORDER BY risk_score DESC')
+        
+        return 'report.html', dict(report_type='HIPAA Security Rule Compliance Report',
+                                   control_categories=groupby(requirements, key=itemgetter('category')),
+                                   non_compliant_list=non_compliant,
+                                   risks=risks,
+                                   risk_count=risk_summary['total'],
+                                   total_controls=requirement_summary['total'],
+                                   compliant_controls=requirement_summary['compliant'],
+                                   non_compliant_controls=requirement_summary['non_compliant'],
+                                   not_applicable_controls=requirement_summary['not_applicable'],
+                                   not_assessed_controls=requirement_summary['not_assessed'],
+                                   compliance_percentage=stats.compliance_percentage(requirement_summary),
+                                   documented_controls=documented_controls,
+                                   evidence_count=summary['evidence']['total'],
+                                   high_risks=risk_summary['high'],
+                                   medium_risks=risk_summary['medium'],
+                                   low_risks=risk_summary['low'],
+                                   generated_at=generated_at,
+                                   generated_by=requested_by)
+    
+    if report_type == 'evidence':
+        overview = stats.evidence_overview(conn, generated_at.strftime('%Y-%m-%d'))
+        evidence = conn.execute('''
+            SELECT e.*, h.title as requirement_title 
+            FROM evidence e 
+            LEFT JOIN hipaa_requirements h ON e.requirement_id = h.requirement_id
+            ORDER BY e.uploaded_at DESC
+        ''')
+        return 'evidence_report.html', dict(evidence=evidence,
+                                            evidence_overview=overview,
+                                            today_uploads=overview['today_uploads'],
+                                            generated_at=generated_at,
+                                            generated_by=requested_by)
+    
+    risks = conn.execute('SELECT * FROM risks ORDER BY risk_score DESC')
+    mitigations = conn.execute('''
+        SELECT title, risk_score, mitigation FROM risks
+        WHERE mitigation IS NOT NULL AND mitigation != ''
+        ORDER BY risk_score DESC
+    ''')
+    return 'risk_report.html', dict(risks=risks,
+                                    mitigations=mitigations,
+                                    risk_stats=stats.read_rollup(conn)['risks'],
+                                    generated_at=generated_at,
+                                    generated_by=requested_by)
+
+def render_report(report_type, out):
+    """Render a report into a file on a report worker thread"""
+    # Templates need a request; the stored page is shared by every user, so
+    # wherever it names the user it holds a placeholder filled in when served
+    with app.test_request_context('/reports/generate'):
+        session['username'] = reportjobs.REQUESTER
+        session['user_id'] = reportjobs.REQUESTER
+        conn = get_db_connection()
+        # One read transaction, so every section sees the same snapshot
+        conn.execute('BEGIN')
+        try:
+            template, context = report_context(conn, report_type, reportjobs.REQUESTER)
+            for chunk in stream_template(template, requester_initial=reportjobs.REQUESTER_INITIAL, **context):
+                out.write(chunk)
+        finally:
+            conn.rollback()
+
+def init_services():
+    """Build this process's database pool, caches and background pools from app.config"""
+    global request_metrics, slow_query_log, db_pool, data_generation, response_cache, change_notifier
+    global extraction_pool, db_writer, audit_trail, thumbnail_pool, report_queue, asset_manifest
+    
+    # Ensure upload and database directories exist
+    os.makedirs(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']), exist_ok=True)
+    os.makedirs(os.path.dirname(app.config['DATABASE']) or '.', exist_ok=True)
+    
+    request_metrics = metrics.RequestMetrics()
+    slow_query_log = None
+    if app.config['SLOW_QUERY_MS']:
+        slow_query_log = slowlog.SlowQueryLog(app.config['SLOW_QUERY_MS'], log_path=app.config['SLOW_QUERY_LOG'],
+                                              top=app.config['SLOW_QUERY_TOP'])
+    metrics.set_slow_query_log(slow_query_log)
+    db_pool = ConnectionPool(app.config['DATABASE'],
+                             size=app.config['DB_POOL_SIZE'],
+                             timeout=app.config['DB_POOL_TIMEOUT'],
+                             busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+                             cache_size_kb=app.config['DB_CACHE_SIZE_KB'],
+                             mmap_size=app.config['DB_MMAP_SIZE'])
+    
+    # Cache for the read-only JSON APIs, invalidated by every write
+    data_generation = DataGeneration(app.config['DATABASE'])
+    response_cache = ResponseCache(data_generation)
+    change_notifier = events.ChangeNotifier(data_generation,
+                                            max_subscribers=app.config['SSE_MAX_SUBSCRIBERS'],
+                                            poll_interval=app.config['SSE_POLL_INTERVAL'])
+    
+    # Extracted text changes search results, so finished jobs invalidate the cache
+    extraction_pool = extraction.ExtractionPool(db_pool, root_path=app.root_path,
+                                                workers=app.config['EXTRACTION_WORKERS'],
+                                                max_attempts=app.config['EXTRACTION_MAX_ATTEMPTS'],
+                                                retry_delay=app.config['EXTRACTION_RETRY_DELAY'],
+                                                on_complete=lambda: mark_data_changed())
+    db_writer = writer.WriteCoordinator(db_pool, max_batch=app.config['WRITE_BATCH_MAX'],
+                                        max_queue=app.config['WRITE_QUEUE_MAX'],
+                                        timeout=app.config['WRITE_TIMEOUT'])
+    audit_trail = auditlog.AuditTrail(db_pool, batch_size=app.config['AUDIT_BATCH_SIZE'],
+                                      max_queue=app.config['AUDIT_MAX_QUEUE'])
+    thumbnail_pool = thumbnails.ThumbnailPool(app.config['PREVIEW_FOLDER'], root_path=app.root_path,
+                                              workers=app.config['PREVIEW_WORKERS'])
+    report_queue = reportjobs.ReportQueue(db_pool, render_report, app.config['REPORT_FOLDER'],
+                                          root_path=app.root_path,
+                                          workers=app.config['REPORT_WORKERS'],
+                                          max_age=app.config['REPORT_CACHE_MAX_AGE'],
+                                          max_bytes=app.config['REPORT_CACHE_MAX_BYTES'])
+    
+    # Until assets are built this is empty and pages link the source files
+    asset_manifest = assets.load_manifest(app.static_folder)
+
+init_services()
+
+def preload():
+    """Compile every template and drop pooled connections, ahead of forking workers"""
+    # Cleared first, so a graceful reload picks up edited templates
+    app.jinja_env.cache.clear()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    
+    # SQLite handles must not cross fork(); each worker opens its own
+    db_pool.close_all()
+
+def create_app(config=None):
+    """Configure the app for serving and return it (see wsgi.py and gunicorn.conf.py)
+
+    Settings are the defaults above, overridden by ACEP_* environment variables
+    (parsed as JSON, e.g. ACEP_DB_POOL_SIZE=4) and then by config. Routes are
+    registered on this module's app, so a process has one app and this
+    reconfigures it, rebuilding the services from the final settings.
+    """
+    app.config.from_prefixed_env('ACEP')
+    app.config.update(config or {})
+    init_services()
+    init_database()
+    preload()
+    return app
+
+# Static assets
+def protected_folders():
+    """Real paths of the folders holding evidence and its previews"""
+    return [os.path.realpath(os.path.join(app.root_path, folder))
+            for folder in (app.config['UPLOAD_FOLDER'], app.config['PREVIEW_FOLDER'], evidence_store.LEGACY_FOLDER)]
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    """Point url_for('static', ...) at the built, content-hashed copy of an asset when there is one"""
+    if endpoint == 'static' and values.get('filename') in asset_manifest:
+        values['filename'] = asset_manifest[values['filename']]
+
+def static_file(filename):
+    """Flask's static view, except built assets go out precompressed and cached as immutable"""
+    path = safe_join(app.static_folder, filename)
+    # Evidence is only sent by the login-protected routes, even if its folder is configured under static/
+    if path is not None and any(os.path.commonpath([os.path.realpath(path), folder]) == folder
+                                for folder in protected_folders()):
+        abort(404)  # same answer as for a file that does not exist
+    if not filename.startswith(assets.BUILD_DIR + '/') or path is None or not os.path.isfile(path):
+        return app.send_static_file(filename)
+    
+    sent, encoding = assets.negotiate(path, request.accept_encodings)
+    # Typed as the asset itself, whichever encoding of it is sent
+    response = send_file(sent, mimetype=mimetypes.guess_type(path)[0], conditional=True,
+                         max_age=app.config['ASSET_MAX_AGE'])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = static_file
+
 # Routes
 @app.route('/')
 def index():
@@ -300,9 +533,11 @@ def login():
         if user and check_password_hash(user['password_hash'], password):
             session['user_id'] = user['id']
             session['username'] = user['username']
+            audit('login', 'user', user['id'])
             flash('Login successful!', 'success')
             return redirect(url_for('dashboard'))
         else:
+            audit('login_failed', 'user', username=username)
             flash('Invalid username or password!', 'error')
     
     return render_template('login.html')
@@ -310,6 +545,8 @@ def login():
 @app.route('/logout')
 def logout():
     """Logout and clear session"""
+    if 'user_id' in session:
+        audit('logout', 'user', session['user_id'])
     session.clear()
     flash('You have been logged out.', 'info')
     return redirect(url_for('login'))
@@ -320,25 +557,12 @@ def dashboard():
     """Main dashboard with HIPAA compliance overview"""
     conn = get_db_connection()
     
-    # Get requirement statistics
-    total_requirements = conn.execute('SELECT COUNT(*) as count FROM hipaa_requirements').fetchone()['count']
-    compliant_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Compliant'").fetchone()['count']
-    non_compliant_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Not Compliant'").fetchone()['count']
-    not_applicable_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Not Applicable'").fetchone()['count']
-    not_assessed_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Not Assessed'").fetchone()['count']
-    
-    # Get risk statistics
-    total_risks = conn.execute('SELECT COUNT(*) as count FROM risks').fetchone()['count']
-    high_risks = conn.execute('SELECT COUNT(*) as count FROM risks WHERE risk_score >= 15').fetchone()['count']
-    medium_risks = conn.execute('SELECT COUNT(*) as count FROM risks WHERE risk_score >= 8 AND risk_score < 15').fetchone()['count']
-    low_risks = conn.execute('SELECT COUNT(*) as count FROM risks WHERE risk_score < 8').fetchone()['count']
-    
-    # Get PHI tracking statistics
-    total_phi_types = conn.execute('SELECT COUNT(*) as count FROM phi_tracking').fetchone()['count']
-    
-    # Get Business Associate statistics
-    total_business_associates = conn.execute('SELECT COUNT(*) as count FROM business_associates').fetchone()['count']
-    active_business_associates = conn.execute("SELECT COUNT(*) as count FROM business_associates WHERE contract_status = 'Active'").fetchone()['count']
+    # Get requirement, risk, PHI and Business Associate statistics (single rollup row)
+    summary = stats.read_rollup(conn)
+    requirement_stats = summary['requirements']
+    risk_stats = summary['risks']
+    phi_stats = summary['phi']
+    ba_stats = summary['business_associates']
     
     # Get recent activity
     recent_requirements = conn.execute('''
@@ -350,8 +574,7 @@ def dashboard():
     ''').fetchall()
     
     # Calculate compliance percentage
-    assessed_requirements = total_requirements - not_assessed_requirements
-    compliance_percentage = round((compliant_requirements / assessed_requirements * 100) if assessed_requirements > 0 else 0, 1)
+    compliance_percentage = stats.compliance_percentage(requirement_stats)
     
     # Get current date and time
     current_date = datetime.now().strftime('%d %B %Y')
@@ -360,19 +583,19 @@ def dashboard():
     conn.close()
     
     return render_template('dashboard.html',
-                         total_requirements=total_requirements,
-                         compliant_requirements=compliant_requirements,
-                         non_compliant_requirements=non_compliant_requirements,
-                         not_applicable_requirements=not_applicable_requirements,
-                         not_assessed_requirements=not_assessed_requirements,
+                         total_requirements=requirement_stats['total'],
+                         compliant_requirements=requirement_stats['compliant'],
+                         non_compliant_requirements=requirement_stats['non_compliant'],
+                         not_applicable_requirements=requirement_stats['not_applicable'],
+                         not_assessed_requirements=requirement_stats['not_assessed'],
                          compliance_percentage=compliance_percentage,
-                         total_risks=total_risks,
-                         high_risks=high_risks,
-                         medium_risks=medium_risks,
-                         low_risks=low_risks,
-                         total_phi_types=total_phi_types,
-                         total_business_associates=total_business_associates,
-                         active_business_associates=active_business_associates,
+                         total_risks=risk_stats['total'],
+                         high_risks=risk_stats['high'],
+                         medium_risks=risk_stats['medium'],
+                         low_risks=risk_stats['low'],
+                         total_phi_types=phi_stats['total'],
+                         total_business_associates=ba_stats['total'],
+                         active_business_associates=ba_stats['active'],
                          recent_requirements=recent_requirements,
                          current_date=current_date,
                          current_time=current_time)
@@ -408,42 +631,106 @@ def update_requirement():
     status = request.form['status']
     notes = request.form['notes']
     
-    conn = get_db_connection()
-    conn.execute('''
+    db_writer.execute('''
         UPDATE hipaa_requirements 
         SET status = ?, notes = ?, assessed_by = ?, assessed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
         WHERE requirement_id = ?
     ''', (status, notes, session['username'], requirement_id))
-    conn.commit()
-    conn.close()
+    mark_data_changed()
+    audit('assess', 'requirement', requirement_id, status=status, notes=notes)
     
     flash('Requirement updated successfully!', 'success')
     return redirect(url_for('audit_checklist'))
 
+ASSESSMENT_STATUSES = ('Compliant', 'Not Compliant', 'Partially Compliant', 'Not Applicable', 'Not Assessed')
+
+def assessment_updates_from_request():
+    """(requirement_id, status, notes) changes from a JSON body or parallel form fields"""
+    if request.is_json:
+        data = request.get_json(silent=True)
+        items = data.get('updates') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return []
+        return [(str(item.get('requirement_id', '')).strip(), item.get('status'), item.get('notes') or '')
+                for item in items if isinstance(item, dict)]
+    
+    return list(zip(request.form.getlist('requirement_id'),
+                    request.form.getlist('status'),
+                    request.form.getlist('notes')))
+
+@app.route('/audit/update-batch', methods=['POST'])
+@login_required
+def update_requirements_batch():
+    """Apply many requirement assessments in one transaction"""
+    updates = assessment_updates_from_request()
+    
+    # Later edits of the same requirement win
+    changes = {}
+    errors = []
+    for requirement_id, status, notes in updates:
+        if status not in ASSESSMENT_STATUSES:
+            errors.append({'requirement_id': requirement_id, 'error': f'Invalid status: {status}'})
+            continue
+        changes[requirement_id] = (status, notes)
+    
+    username = session['username']
+    
+    def apply(conn):
+        conn.executemany('''
+            UPDATE hipaa_requirements 
+            SET status = ?, notes = ?, assessed_by = ?, assessed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE requirement_id = ?
+        ''', [(status, notes, username, requirement_id)
+              for requirement_id, (status, notes) in changes.items()])
+        
+        placeholders = ', '.join('?' for _ in changes)
+        return conn.execute(f'''
+            SELECT requirement_id, title, category, status, notes, assessed_by, assessed_at
+            FROM hipaa_requirements
+            WHERE requirement_id IN ({placeholders})
+            ORDER BY category, requirement_id
+        ''', list(changes)).fetchall()
+    
+    updated = db_writer.run(apply) if changes else []
+    
+    if updated:
+        mark_data_changed()
+    for row in updated:
+        audit('assess', 'requirement', row['requirement_id'], status=row['status'], notes=row['notes'])
+    
+    found = {row['requirement_id'] for row in updated}
+    errors.extend({'requirement_id': requirement_id, 'error': 'Unknown requirement'}
+                  for requirement_id in changes if requirement_id not in found)
+    
+    if request.is_json:
+        return jsonify({'updated': [dict(row) for row in updated], 'errors': errors})
+    
+    if updated:
+        flash(f'{len(updated)} requirement(s) updated successfully!', 'success')
+    if errors:
+        flash(f'{len(errors)} assessment(s) could not be saved.', 'error')
+    return redirect(url_for('audit_checklist'))
+
 @app.route('/evidence')
 @login_required
 def evidence():
     """Evidence management for HIPAA requirements"""
     conn = get_db_connection()
     
-    # Get all evidence with requirement details
-    evidence_list = conn.execute('''
-        SELECT e.*, h.title as requirement_title, h.requirement_id
-        FROM evidence e
-        JOIN hipaa_requirements h ON e.requirement_id = h.requirement_id
-        ORDER BY e.uploaded_at DESC
-    ''').fetchall()
+    # Get one page of evidence with requirement details
+    page = listing.fetch_page(conn, listing.EVIDENCE, request.args)
     
     # Get requirements for dropdown
     requirements = conn.execute('SELECT requirement_id, title FROM hipaa_requirements ORDER BY requirement_id').fetchall()
     
-    # Calculate today's uploads
+    # Totals across all evidence (not just this page), including today's uploads
     today = datetime.now().strftime('%Y-%m-%d')
-    today_uploads = sum(1 for e in evidence_list if e['uploaded_at'] and str(e['uploaded_at'])[:10] == today)
+    overview = stats.evidence_overview(conn, today)
     
     conn.close()
     
-    return render_template('evidence.html', evidence_list=evidence_list, requirements=requirements, today_uploads=today_uploads)
+    return render_template('evidence.html', evidence_list=page['items'], page=page, requirements=requirements,
+                           evidence_overview=overview, today_uploads=overview['today_uploads'])
 
 @app.route('/evidence/upload', methods=['POST'])
 @login_required
@@ -463,20 +750,36 @@ def upload_evidence():
     
     if file:
         filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{timestamp}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
         
-        file.save(file_path)
-        file_size = os.path.getsize(file_path)
+        # Stream to a temp file while hashing; identical content is stored once
+        temp_path, digest, file_size = evidence_store.stream_to_temp(file.stream, app.config['UPLOAD_FOLDER'],
+                                                                       root_path=app.root_path)
         
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO evidence (requirement_id, filename, original_filename, file_path, file_size, description, uploaded_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (requirement_id, unique_filename, filename, file_path, file_size, description, session['username']))
-        conn.commit()
-        conn.close()
+        username = session['username']
+        
+        def apply(conn):
+            file_path = evidence_store.store_blob(conn, app.config['UPLOAD_FOLDER'], temp_path, digest, file_size,
+                                                  root_path=app.root_path)
+            cursor = conn.execute('''
+                INSERT INTO evidence (requirement_id, filename, original_filename, file_path, file_size, description, uploaded_by, blob_sha256)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (requirement_id, digest, filename, file_path, file_size, description, username, digest))
+            extraction.queue_blob(conn, digest)
+            return file_path, cursor.lastrowid
+        
+        try:
+            file_path, evidence_id = db_writer.run(apply)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        mark_data_changed()
+        audit('upload', 'evidence', evidence_id, requirement_id=requirement_id, filename=filename,
+              sha256=digest, file_size=file_size, description=description)
+        
+        # Text extraction and previews run in the background; the upload returns now
+        extraction_pool.submit(digest)
+        thumbnail_pool.submit(digest, file_path)
         
         flash('Evidence uploaded successfully!', 'success')
     
@@ -485,39 +788,104 @@ def upload_evidence():
 @app.route('/evidence/download/<int:evidence_id>')
 @login_required
 def download_evidence(evidence_id):
-    """Download evidence file"""
+    """Download evidence file (conditional and range requests supported)"""
     conn = get_db_connection()
-    evidence = conn.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,)).fetchone()
+    evidence = conn.execute('SELECT file_path, original_filename, blob_sha256 FROM evidence WHERE id = ?', (evidence_id,)).fetchone()
     conn.close()
     
-    if evidence:
-        return send_file(evidence['file_path'], as_attachment=True, download_name=evidence['original_filename'])
+    if not evidence:
+        flash('Evidence not found!', 'error')
+        return redirect(url_for('evidence'))
     
-    flash('Evidence not found!', 'error')
-    return redirect(url_for('evidence'))
+    # Content hash makes a strong ETag; legacy files fall back to mtime/size
+    etag = evidence['blob_sha256'] or True
+    file_path = os.path.join(app.root_path, evidence['file_path'])
+    
+    offload = app.config['EVIDENCE_OFFLOAD']
+    if not offload:
+        return send_file(file_path, as_attachment=True, download_name=evidence['original_filename'],
+                         etag=etag, conditional=True)
+    
+    # The access check above stays in Flask; the proxy streams the bytes
+    # (and answers Range requests) without holding a Python worker.
+    response = werkzeug.utils.send_file(file_path, request.environ, as_attachment=True,
+                                        download_name=evidence['original_filename'],
+                                        etag=etag, conditional=False, use_x_sendfile=True)
+    response = response.make_conditional(request)
+    sendfile_path = response.headers.pop('X-Sendfile', None)
+    if response.status_code == 304 or sendfile_path is None:
+        return response
+    
+    if offload == 'x-accel-redirect':
+        relative_path = os.path.relpath(file_path, os.path.join(app.root_path, app.config['UPLOAD_FOLDER']))
+        response.headers['X-Accel-Redirect'] = app.config['EVIDENCE_ACCEL_PREFIX'] + relative_path.replace(os.sep, '/')
+    else:
+        response.headers['X-Sendfile'] = sendfile_path
+    return response
+
+@app.route('/evidence/preview/<digest>/<rendition>')
+@login_required
+def evidence_preview(digest, rendition):
+    """Cached thumbnail or preview of image evidence, immutable for its content hash"""
+    if rendition not in thumbnails.RENDITIONS or len(digest) != 64 or digest.strip('0123456789abcdef'):
+        return jsonify({'error': 'Preview not found'}), 404
+    
+    path = os.path.join(app.root_path, thumbnails.rendition_path(app.config['PREVIEW_FOLDER'], digest, rendition))
+    if not os.path.exists(path):
+        return jsonify({'error': 'Preview not found'}), 404
+    
+    response = send_file(path, mimetype='image/jpeg', etag=f'{digest}-{rendition}', conditional=True,
+                         max_age=app.config['PREVIEW_MAX_AGE'])
+    # Evidence may show PHI: browsers may keep it, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+def remove_blob_files(conn, digest, file_path):
+    """Write intent run after a blob's last reference is deleted: remove its file and previews"""
+    if evidence_store.remove_unreferenced(conn, digest, file_path, root_path=app.root_path):
+        thumbnails.remove_renditions(os.path.join(app.root_path, app.config['PREVIEW_FOLDER']), digest)
 
 @app.route('/evidence/delete/<int:evidence_id>', methods=['POST'])
 @login_required
 def delete_evidence(evidence_id):
     """Delete evidence file"""
-    conn = get_db_connection()
-    evidence = conn.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,)).fetchone()
+    def apply(conn):
+        evidence = conn.execute('''
+            SELECT e.*, b.file_path AS blob_file_path
+            FROM evidence e
+            LEFT JOIN evidence_blobs b ON b.sha256 = e.blob_sha256
+            WHERE e.id = ?
+        ''', (evidence_id,)).fetchone()
+        if not evidence:
+            return None, False
+        
+        # Delete from database; shared content is only removed with its last reference,
+        # and only once the delete has committed
+        conn.execute('DELETE FROM evidence WHERE id = ?', (evidence_id,))
+        released_path = evidence['blob_sha256'] and evidence_store.release_blob(conn, evidence['blob_sha256'])
+        if released_path:
+            db_writer.after_commit(remove_blob_files, evidence['blob_sha256'], released_path)
+        return evidence
+    
+    evidence = db_writer.run(apply)
     
     if evidence:
-        # Delete file from filesystem
-        try:
-            os.remove(evidence['file_path'])
-        except:
-            pass
+        # Files outside the blob store belong to this row alone
+        if evidence['file_path'] != evidence['blob_file_path']:
+            try:
+                os.remove(os.path.join(app.root_path, evidence['file_path']))
+            except OSError:
+                pass
         
-        # Delete from database
-        conn.execute('DELETE FROM evidence WHERE id = ?', (evidence_id,))
-        conn.commit()
+        mark_data_changed()
+        audit('delete', 'evidence', evidence_id, requirement_id=evidence['requirement_id'],
+              filename=evidence['original_filename'], sha256=evidence['blob_sha256'])
         flash('Evidence deleted successfully!', 'success')
     else:
         flash('Evidence not found!', 'error')
     
-    conn.close()
     return redirect(url_for('evidence'))
 
 @app.route('/risks')
@@ -526,14 +894,12 @@ def risk_register():
     """Risk register for HIPAA compliance"""
     conn = get_db_connection()
     
-    risks = conn.execute('''
-        SELECT * FROM risks 
-        ORDER BY risk_score DESC, created_at DESC
-    ''').fetchall()
+    page = listing.fetch_page(conn, listing.RISKS, request.args)
+    risk_stats = stats.read_rollup(conn)['risks']
     
     conn.close()
     
-    return render_template('risk_register.html', risks=risks)
+    return render_template('risk_register.html', risks=page['items'], page=page, risk_stats=risk_stats)
 
 @app.route('/risks/add', methods=['POST'])
 @login_required
@@ -546,13 +912,13 @@ def add_risk():
     mitigation = request.form['mitigation']
     owner = request.form['owner']
     
-    conn = get_db_connection()
-    conn.execute('''
+    cursor = db_writer.execute('''
         INSERT INTO risks (title, description, likelihood, impact, mitigation, owner, created_by)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     ''', (title, description, likelihood, impact, mitigation, owner, session['username']))
-    conn.commit()
-    conn.close()
+    mark_data_changed()
+    audit('create', 'risk', cursor.lastrowid, title=title, description=description, likelihood=likelihood,
+          impact=impact, mitigation=mitigation, owner=owner)
     
     flash('Risk added successfully!', 'success')
     return redirect(url_for('risk_register'))
@@ -569,14 +935,14 @@ def update_risk(risk_id):
     owner = request.form['owner']
     status = request.form['status']
     
-    conn = get_db_connection()
-    conn.execute('''
+    db_writer.execute('''
         UPDATE risks 
         SET title = ?, description = ?, likelihood = ?, impact = ?, mitigation = ?, owner = ?, status = ?, updated_at = CURRENT_TIMESTAMP
         WHERE id = ?
     ''', (title, description, likelihood, impact, mitigation, owner, status, risk_id))
-    conn.commit()
-    conn.close()
+    mark_data_changed()
+    audit('update', 'risk', risk_id, title=title, description=description, likelihood=likelihood,
+          impact=impact, mitigation=mitigation, owner=owner, status=status)
     
     flash('Risk updated successfully!', 'success')
     return redirect(url_for('risk_register'))
@@ -585,10 +951,9 @@ def update_risk(risk_id):
 @login_required
 def delete_risk(risk_id):
     """Delete risk from register"""
-    conn = get_db_connection()
-    conn.execute('DELETE FROM risks WHERE id = ?', (risk_id,))
-    conn.commit()
-    conn.close()
+    db_writer.execute('DELETE FROM risks WHERE id = ?', (risk_id,))
+    mark_data_changed()
+    audit('delete', 'risk', risk_id)
     
     flash('Risk deleted successfully!', 'success')
     return redirect(url_for('risk_register'))
@@ -599,11 +964,12 @@ def phi_tracking():
     """PHI tracking and management"""
     conn = get_db_connection()
     
-    phi_types = conn.execute('SELECT * FROM phi_tracking ORDER BY created_at DESC').fetchall()
+    page = listing.fetch_page(conn, listing.PHI_TYPES, request.args)
+    phi_stats = stats.phi_classification_stats(conn)
     
     conn.close()
     
-    return render_template('phi_tracking.html', phi_types=phi_types)
+    return render_template('phi_tracking.html', phi_types=page['items'], page=page, phi_stats=phi_stats)
 
 @app.route('/phi-tracking/add', methods=['POST'])
 @login_required
@@ -615,13 +981,13 @@ def add_phi_type():
     access_patterns = request.form['access_patterns']
     disposal_procedures = request.form['disposal_procedures']
     
-    conn = get_db_connection()
-    conn.execute('''
+    cursor = db_writer.execute('''
         INSERT INTO phi_tracking (phi_type, description, classification, access_patterns, disposal_procedures)
         VALUES (?, ?, ?, ?, ?)
     ''', (phi_type, description, classification, access_patterns, disposal_procedures))
-    conn.commit()
-    conn.close()
+    mark_data_changed()
+    audit('create', 'phi', cursor.lastrowid, phi_type=phi_type, description=description, classification=classification,
+          access_patterns=access_patterns, disposal_procedures=disposal_procedures)
     
     flash('PHI type added successfully!', 'success')
     return redirect(url_for('phi_tracking'))
@@ -636,14 +1002,14 @@ def update_phi_type(phi_id):
     access_patterns = request.form['access_patterns']
     disposal_procedures = request.form['disposal_procedures']
     
-    conn = get_db_connection()
-    conn.execute('''
+    db_writer.execute('''
         UPDATE phi_tracking 
         SET phi_type = ?, description = ?, classification = ?, access_patterns = ?, disposal_procedures = ?, updated_at = CURRENT_TIMESTAMP
         WHERE id = ?
     ''', (phi_type, description, classification, access_patterns, disposal_procedures, phi_id))
-    conn.commit()
-    conn.close()
+    mark_data_changed()
+    audit('update', 'phi', phi_id, phi_type=phi_type, description=description, classification=classification,
+          access_patterns=access_patterns, disposal_procedures=disposal_procedures)
     
     flash('PHI type updated successfully!', 'success')
     return redirect(url_for('phi_tracking'))
@@ -652,10 +1018,9 @@ def update_phi_type(phi_id):
 @login_required
 def delete_phi_type(phi_id):
     """Delete PHI type"""
-    conn = get_db_connection()
-    conn.execute('DELETE FROM phi_tracking WHERE id = ?', (phi_id,))
-    conn.commit()
-    conn.close()
+    db_writer.execute('DELETE FROM phi_tracking WHERE id = ?', (phi_id,))
+    mark_data_changed()
+    audit('delete', 'phi', phi_id)
     
     flash('PHI type deleted successfully!', 'success')
     return redirect(url_for('phi_tracking'))
@@ -666,11 +1031,12 @@ def business_associates():
     """Business Associate management"""
     conn = get_db_connection()
     
-    business_associates_list = conn.execute('SELECT * FROM business_associates ORDER BY created_at DESC').fetchall()
+    page = listing.fetch_page(conn, listing.BUSINESS_ASSOCIATES, request.args)
+    ba_stats = stats.business_associate_status_stats(conn)
     
     conn.close()
     
-    return render_template('business_associates.html', business_associates=business_associates_list)
+    return render_template('business_associates.html', business_associates=page['items'], page=page, ba_stats=ba_stats)
 
 @app.route('/business-associates/add', methods=['POST'])
 @login_required
@@ -685,13 +1051,14 @@ def add_business_associate():
     last_assessment_date = request.form.get('last_assessment_date')
     next_assessment_date = request.form.get('next_assessment_date')
     
-    conn = get_db_connection()
-    conn.execute('''
+    cursor = db_writer.execute('''
         INSERT INTO business_associates (name, contact_person, email, phone, contract_status, compliance_status, last_assessment_date, next_assessment_date)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
     ''', (name, contact_person, email, phone, contract_status, compliance_status, last_assessment_date, next_assessment_date))
-    conn.commit()
-    conn.close()
+    mark_data_changed()
+    audit('create', 'business_associate', cursor.lastrowid, name=name, contact_person=contact_person, email=email,
+          phone=phone, contract_status=contract_status, compliance_status=compliance_status,
+          last_assessment_date=last_assessment_date, next_assessment_date=next_assessment_date)
     
     flash('Business Associate added successfully!', 'success')
     return redirect(url_for('business_associates'))
@@ -709,14 +1076,15 @@ def edit_business_associate(ba_id):
     last_assessment_date = request.form.get('last_assessment_date')
     next_assessment_date = request.form.get('next_assessment_date')
     
-    conn = get_db_connection()
-    conn.execute('''
+    db_writer.execute('''
         UPDATE business_associates 
-        SET name = ?, contact_person = ?, email = ?, phone = ?, contract_status = ?, compliance_status = ?, last_assessment_date = ?, next_assessment_date = ?
+        SET name = ?, contact_person = ?, email = ?, phone = ?, contract_status = ?, compliance_status = ?, last_assessment_date = ?, next_assessment_date = ?, updated_at = CURRENT_TIMESTAMP
         WHERE id = ?
     ''', (name, contact_person, email, phone, contract_status, compliance_status, last_assessment_date, next_assessment_date, ba_id))
-    conn.commit()
-    conn.close()
+    mark_data_changed()
+    audit('update', 'business_associate', ba_id, name=name, contact_person=contact_person, email=email,
+          phone=phone, contract_status=contract_status, compliance_status=compliance_status,
+          last_assessment_date=last_assessment_date, next_assessment_date=next_assessment_date)
     
     flash('Business Associate updated successfully!', 'success')
     return redirect(url_for('business_associates'))
@@ -730,14 +1098,16 @@ def conduct_assessment(ba_id):
     assessment_notes = request.form.get('assessment_notes', '')
     next_assessment_date = request.form.get('next_assessment_date')
     
-    conn = get_db_connection()
-    conn.execute('''
+    db_writer.execute('''
         UPDATE business_associates 
-        SET compliance_status = ?, last_assessment_date = ?, next_assessment_date = ?
+        SET compliance_status = ?, last_assessment_date = ?, next_assessment_date = ?, updated_at = CURRENT_TIMESTAMP
         WHERE id = ?
     ''', (compliance_status, assessment_date, next_assessment_date, ba_id))
-    conn.commit()
-    conn.close()
+    mark_data_changed()
+    # The business_associates table has no notes column; the audit trail keeps them
+    audit('assess', 'business_associate', ba_id, compliance_status=compliance_status,
+          assessment_date=assessment_date, next_assessment_date=next_assessment_date,
+          assessment_notes=assessment_notes)
     
     flash('Assessment completed successfully!', 'success')
     return redirect(url_for('business_associates'))
@@ -749,151 +1119,97 @@ def reports():
     conn = get_db_connection()
     
     # Get summary statistics for reports
-    total_requirements = conn.execute('SELECT COUNT(*) as count FROM hipaa_requirements').fetchone()['count']
-    compliant_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Compliant'").fetchone()['count']
-    total_risks = conn.execute('SELECT COUNT(*) as count FROM risks').fetchone()['count']
-    high_risks = conn.execute('SELECT COUNT(*) as count FROM risks WHERE risk_score >= 15').fetchone()['count']
+    summary = stats.read_rollup(conn)
+    requirement_stats = summary['requirements']
+    risk_stats = summary['risks']
     
     conn.close()
     
     return render_template('reports.html', 
-                         total_requirements=total_requirements,
-                         compliant_requirements=compliant_requirements,
-                         total_risks=total_risks,
-                         high_risks=high_risks)
+                         total_requirements=requirement_stats['total'],
+                         compliant_requirements=requirement_stats['compliant'],
+                         total_risks=risk_stats['total'],
+                         high_risks=risk_stats['high'])
 
 @app.route('/reports/generate', methods=['POST'])
 @login_required
 def generate_report():
-    """Generate HIPAA compliance report"""
-    try:
-        report_type = request.form.get('report_type', 'compliance')
-        
-        conn = get_db_connection()
-        
-        if report_type == 'compliance':
-            # Generate compliance report
-            try:
-                requirements = conn.execute('''
-                    SELECT * FROM hipaa_requirements 
-                    ORDER BY category, requirement_id
-                ''').fetchall()
-                
-                # Get evidence with LEFT JOIN to handle cases where there's no evidence
-                evidence = conn.execute('''
-                    SELECT e.*, h.title as requirement_title 
-                    FROM evidence e 
-                    LEFT JOIN hipaa_requirements h ON e.requirement_id = h.requirement_id
-                ''').fetchall()
-                
-                risks = conn.execute('SELECT * FROM risks ORDER BY risk_score DESC').fetchall()
-                
-                # Calculate compliance statistics
-                total_requirements = len(requirements) if requirements else 0
-                compliant_requirements = len([r for r in requirements if r['status'] == 'Compliant']) if requirements else 0
-                non_compliant_requirements = len([r for r in requirements if r['status'] == 'Not Compliant']) if requirements else 0
-                not_applicable_requirements = len([r for r in requirements if r['status'] == 'Not Applicable']) if requirements else 0
-                not_assessed_requirements = len([r for r in requirements if r['status'] == 'Not Assessed']) if requirements else 0
-                
-                # Calculate compliance percentage
-                assessed_requirements = total_requirements - not_assessed_requirements
-                compliance_percentage = round((compliant_requirements / assessed_requirements * 100) if assessed_requirements > 0 else 0, 1)
-                
-                # Get evidence count
-                evidence_count = len(evidence) if evidence else 0
-                
-                # Get risk statistics
-                high_risks = len([r for r in risks if r['risk_score'] >= 15]) if risks else 0
-                medium_risks = len([r for r in risks if 8 <= r['risk_score'] < 15]) if risks else 0
-                low_risks = len([r for r in risks if r['risk_score'] < 8]) if risks else 0
-                
-                conn.close()
-                
-                # Debug information
-                print(f"DEBUG: Generating report with {total_requirements} requirements, {evidence_count} evidence, {len(risks) if risks else 0} risks")
-                
-                return render_template('report.html',
-                                     report_type='HIPAA Security Rule Compliance Report',
-                                     requirements=requirements or [],
-                                     evidence=evidence or [],
-                                     risks=risks or [],
-                                     total_requirements=total_requirements,
-                                     total_controls=total_requirements,
-                                     compliant_requirements=compliant_requirements,
-                                     compliant_controls=compliant_requirements,
-                                     non_compliant_controls=non_compliant_requirements,
-                                     non_compliant_requirements=non_compliant_requirements,
-                                     not_applicable_requirements=not_applicable_requirements,
-                                     not_applicable_controls=not_applicable_requirements,
-                                     not_assessed_requirements=not_assessed_requirements,
-                                     not_assessed_controls=not_assessed_requirements,
-                                     compliance_percentage=compliance_percentage,
-                                     evidence_count=evidence_count,
-                                     high_risks=high_risks,
-                                     medium_risks=medium_risks,
-                                     low_risks=low_risks,
-                                     generated_at=datetime.now())
-            
-            except Exception as db_error:
-                conn.close()
-                print(f"Database error in report generation: {db_error}")
-                flash(f'Database error while generating report: {str(db_error)}', 'error')
-                return redirect(url_for('reports'))
-        elif report_type == 'evidence':
-            # Generate evidence report
-            try:
-                evidence = conn.execute('''
-                    SELECT e.*, h.title as requirement_title 
-                    FROM evidence e 
-                    LEFT JOIN hipaa_requirements h ON e.requirement_id = h.requirement_id
-                    ORDER BY e.uploaded_at DESC
-                ''').fetchall()
-                
-                # Calculate today's uploads
-                today = datetime.now().strftime('%Y-%m-%d')
-                today_uploads = sum(1 for e in evidence if e['uploaded_at'] and str(e['uploaded_at'])[:10] == today) if evidence else 0
-                
-                conn.close()
-                
-                return render_template('evidence_report.html',
-                                     evidence=evidence or [],
-                                     today_uploads=today_uploads,
-                                     generated_at=datetime.now(),
-                                     generated_by=session['username'])
-            except Exception as db_error:
-                conn.close()
-                print(f"Database error in evidence report: {db_error}")
-                flash(f'Database error while generating evidence report: {str(db_error)}', 'error')
-                return redirect(url_for('reports'))
-                
-        elif report_type == 'risk':
-            # Generate risk report
-            try:
-                risks = conn.execute('SELECT * FROM risks ORDER BY risk_score DESC').fetchall()
-                
-                conn.close()
-                
-                return render_template('risk_report.html',
-                                     risks=risks or [],
-                                     generated_at=datetime.now(),
-                                     generated_by=session['username'])
-            except Exception as db_error:
-                conn.close()
-                print(f"Database error in risk report: {db_error}")
-                flash(f'Database error while generating risk report: {str(db_error)}', 'error')
-                return redirect(url_for('reports'))
-        else:
-            conn.close()
-            flash('Invalid report type!', 'error')
-            return redirect(url_for('reports'))
-            
-    except Exception as general_error:
-        print(f"General error in report generation: {general_error}")
-        flash(f'Error generating report: {str(general_error)}', 'error')
+    """Queue a HIPAA compliance report, or serve the stored one if the data is unchanged"""
+    report_type = request.form.get('report_type', 'compliance')
+    if report_type not in reportjobs.REPORT_TYPES:
+        flash('Invalid report type!', 'error')
         return redirect(url_for('reports'))
+    
+    conn = get_db_connection()
+    job = report_queue.request(conn, report_type, session['username'])
+    
+    # Small reports finish quickly; only show the progress page for slow ones
+    if job['status'] != 'done':
+        report_queue.wait(job['id'], app.config['REPORT_WAIT_SECONDS'])
+        job = report_queue.get(conn, job['id'])
+    conn.close()
+    
+    if job['status'] == 'failed':
+        flash(f"Error generating report: {job['error']}", 'error')
+        return redirect(url_for('reports'))
+    if job['status'] == 'done':
+        return redirect(url_for('report_job', job_id=job['id']), code=303)
+    return render_template('report_pending.html', job=job), 202
+
+@app.route('/reports/jobs/<int:job_id>')
+@login_required
+def report_job(job_id):
+    """A rendered report, or a progress page while it is still being generated"""
+    conn = get_db_connection()
+    job = report_queue.get(conn, job_id)
+    conn.close()
+    
+    if not job:
+        flash('Report not found!', 'error')
+        return redirect(url_for('reports'))
+    if job['status'] == 'failed':
+        flash(f"Error generating report: {job['error']}", 'error')
+        return redirect(url_for('reports'))
+    if job['status'] != 'done':
+        return render_template('report_pending.html', job=job), 202
+    if not report_queue.output_exists(job):
+        flash('This report has expired; please generate it again.', 'error')
+        return redirect(url_for('reports'))
+    
+    # A job's output never changes, so browsers can revalidate by job id and
+    # user; the stored page is shared, and each viewer sees their own name
+    username = session['username']
+    etag = f"report-{job['id']}-{hashlib.sha256(username.encode('utf-8')).hexdigest()[:16]}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(reportjobs.personalize(os.path.join(app.root_path, job['output_path']), {
+            reportjobs.REQUESTER: str(escape(username)),
+            reportjobs.REQUESTER_INITIAL: str(escape(username[0].upper())),
+        }), mimetype='text/html')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/reports/jobs/<int:job_id>')
+@login_required
+def api_report_job(job_id):
+    """Report job status for the progress page to poll"""
+    conn = get_db_connection()
+    job = report_queue.get(conn, job_id)
+    conn.close()
+    
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    
+    result = reportjobs.job_dict(job)
+    result['url'] = url_for('report_job', job_id=job_id) if job['status'] == 'done' else None
+    return jsonify(result)
 
 @app.route('/api/requirements')
 @login_required
+@cached_api
 def api_requirements():
     """API endpoint for requirements data"""
     conn = get_db_connection()
@@ -908,63 +1224,313 @@ def api_requirements():
     
     return jsonify([dict(req) for req in requirements])
 
+def list_page_json(spec):
+    """JSON for one page of a list view (same paging contract as the HTML pages)"""
+    conn = get_db_connection()
+    page = listing.fetch_page(conn, spec, request.args)
+    conn.close()
+    
+    return jsonify({
+        'items': [dict(row) for row in page['items']],
+        'limit': page['limit'],
+        'filters': page['filters'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
+    })
+
+@app.route('/api/evidence')
+@login_required
+@cached_api
+def api_evidence():
+    """API endpoint for paginated evidence metadata"""
+    return list_page_json(listing.EVIDENCE)
+
+@app.route('/api/audit-log')
+@login_required
+def api_audit_log():
+    """Audit trail entries, newest first, filtered by entity, user, action or time range"""
+    return list_page_json(listing.AUDIT_LOG)
+
+@app.route('/api/evidence/<int:evidence_id>/extraction', methods=['GET', 'POST'])
+@login_required
+def api_evidence_extraction(evidence_id):
+    """Text extraction job status for an evidence file; POST queues it again"""
+    conn = get_db_connection()
+    evidence = conn.execute('SELECT blob_sha256 FROM evidence WHERE id = ?', (evidence_id,)).fetchone()
+    if not evidence:
+        conn.close()
+        return jsonify({'error': 'Evidence not found'}), 404
+    if not evidence['blob_sha256']:
+        conn.close()
+        return jsonify({'error': 'Evidence predates the blob store and has no extraction job'}), 409
+    
+    digest = evidence['blob_sha256']
+    if request.method == 'POST':
+        # A retry starts from a clean slate, whatever the previous outcome
+        def apply(writer_conn):
+            extraction.queue_blob(writer_conn, digest)
+            writer_conn.execute('''
+                UPDATE evidence_text SET status = 'pending', attempts = 0, error = NULL
+                WHERE blob_sha256 = ? AND status != 'running'
+            ''', (digest,))
+        
+        db_writer.run(apply)
+        extraction_pool.submit(digest)
+    
+    job = conn.execute('''
+        SELECT status, attempts, error, LENGTH(content) AS text_length, queued_at, started_at, finished_at
+        FROM evidence_text WHERE blob_sha256 = ?
+    ''', (digest,)).fetchone()
+    conn.close()
+    
+    return jsonify(dict(job, evidence_id=evidence_id, blob_sha256=digest)), 202 if request.method == 'POST' else 200
+
+@app.route('/api/risks')
+@login_required
+@cached_api
+def api_risks():
+    """API endpoint for paginated risks"""
+    return list_page_json(listing.RISKS)
+
+@app.route('/api/phi-types')
+@login_required
+@cached_api
+def api_phi_types():
+    """API endpoint for paginated PHI types"""
+    return list_page_json(listing.PHI_TYPES)
+
+@app.route('/api/business-associates')
+@login_required
+@cached_api
+def api_business_associates():
+    """API endpoint for paginated Business Associates"""
+    return list_page_json(listing.BUSINESS_ASSOCIATES)
+
+@app.route('/api/export/<table>')
+@login_required
+def api_export(table):
+    """Stream a whole table (or rows changed since updated_since) as CSV or NDJSON"""
+    spec = export.EXPORTS.get(table)
+    if spec is None:
+        return jsonify({'error': f'Unknown table: {table}', 'tables': sorted(export.EXPORTS)}), 404
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        return jsonify({'error': f'Unknown format: {export_format}', 'formats': sorted(export.FORMATS)}), 400
+    
+    since = request.args.get('updated_since')
+    if since:
+        try:
+            since = export.parse_since(since)
+        except ValueError:
+            return jsonify({'error': 'updated_since must be an ISO 8601 date or date-time'}), 400
+    
+    conn = get_db_connection()
+    # Taken before the read, so using it as the next updated_since never skips a change
+    started_at = conn.execute('SELECT CURRENT_TIMESTAMP').fetchone()[0]
+    
+    stream, mimetype, extension = export.FORMATS[export_format]
+    body = stream(spec.columns, export.iter_rows(conn, spec, since))
+    
+    # The request context (and with it the pooled connection) lives until the stream ends
+    response = app.response_class(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.{extension}'
+    response.headers['X-Export-Started-At'] = started_at
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/import/<table>', methods=['POST'])
+@login_required
+def api_import(table):
+    """Bulk import risks, PHI types or Business Associates from CSV or JSON"""
+    spec = importer.IMPORTS.get(table)
+    if spec is None:
+        return jsonify({'error': f'Unknown table: {table}', 'tables': sorted(importer.IMPORTS)}), 404
+    
+    # Either an uploaded file or a JSON body
+    upload = request.files.get('file')
+    if upload is not None and upload.filename:
+        data_format = request.form.get('format') or importer.guess_format(upload.filename)
+    elif request.is_json:
+        upload = None
+        data_format = 'json'
+    else:
+        return jsonify({'error': 'Send a CSV/JSON file in the "file" field or a JSON body'}), 400
+    
+    # Undecodable or malformed input is the client's error, even when found mid-import
+    conn = get_db_connection()
+    try:
+        text = importer.decode_upload(upload.read()) if upload is not None else request.get_data(as_text=True)
+        rows = importer.parse_rows(text, data_format)
+        batch_size = max(1, int(request.args.get('batch_size', app.config['IMPORT_BATCH_SIZE'])))
+        report = importer.import_rows(conn, spec, rows,
+                                      batch_size=batch_size,
+                                      created_by=session['username'],
+                                      strict=request.args.get('strict') == '1')
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    finally:
+        conn.close()
+    
+    if report['inserted']:
+        mark_data_changed()
+        audit('import', spec.entity_type, inserted=report['inserted'], rejected=len(report['errors']))
+    return jsonify(report)
+
+# Where each kind of search hit is shown in the UI
+SEARCH_RESULT_ENDPOINTS = {
+    'requirement': lambda record_id: url_for('audit_checklist'),
+    'evidence': lambda record_id: url_for('download_evidence', evidence_id=record_id),
+    'evidence_content': lambda record_id: url_for('download_evidence', evidence_id=record_id),
+    'risk': lambda record_id: url_for('risk_register'),
+    'phi': lambda record_id: url_for('phi_tracking'),
+    'business_associate': lambda record_id: url_for('business_associates'),
+}
+
+@app.route('/api/search')
+@login_required
+@cached_api
+def api_search():
+    """Ranked full-text search across requirements, evidence, risks, PHI and Business Associates"""
+    query = request.args.get('q', '').strip()
+    kinds = [kind for kind in request.args.getlist('type') if kind in search.KINDS]
+    try:
+        limit = max(1, min(int(request.args.get('limit', search.DEFAULT_LIMIT)), search.MAX_LIMIT))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    
+    conn = get_db_connection()
+    found = search.search(conn, query, kinds=kinds, limit=limit, offset=offset)
+    conn.close()
+    
+    for result in found['results']:
+        result['url'] = SEARCH_RESULT_ENDPOINTS[result['type']](result['id'])
+    
+    next_offset = offset + limit
+    return jsonify({
+        'query': query,
+        'types': kinds,
+        'total': found['total'],
+        'limit': limit,
+        'offset': offset,
+        'next_offset': next_offset if next_offset < found['total'] else None,
+        'results': found['results']
+    })
+
 @app.route('/api/compliance-stats')
 @login_required
+@cached_api
 def api_compliance_stats():
     """API endpoint for compliance statistics"""
     conn = get_db_connection()
     
-    # Get compliance statistics
-    total_requirements = conn.execute('SELECT COUNT(*) as count FROM hipaa_requirements').fetchone()['count']
-    compliant_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Compliant'").fetchone()['count']
-    non_compliant_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Not Compliant'").fetchone()['count']
-    not_applicable_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Not Applicable'").fetchone()['count']
-    not_assessed_requirements = conn.execute("SELECT COUNT(*) as count FROM hipaa_requirements WHERE status = 'Not Assessed'").fetchone()['count']
-    
-    # Get risk statistics
-    total_risks = conn.execute('SELECT COUNT(*) as count FROM risks').fetchone()['count']
+    # Get compliance and risk statistics
+    summary = stats.read_rollup(conn)
+    requirement_stats = summary['requirements']
+    risk_stats = summary['risks']
     
     conn.close()
     
     return jsonify({
-        'total': total_requirements,
-        'compliant': compliant_requirements,
-        'non_compliant': non_compliant_requirements,
-        'not_applicable': not_applicable_requirements,
-        'not_assessed': not_assessed_requirements,
-        'total_risks': total_risks
+        'total': requirement_stats['total'],
+        'compliant': requirement_stats['compliant'],
+        'non_compliant': requirement_stats['non_compliant'],
+        'not_applicable': requirement_stats['not_applicable'],
+        'not_assessed': requirement_stats['not_assessed'],
+        'total_risks': risk_stats['total']
     })
 
+def read_stream_stats():
+    """Flattened dashboard statistics for the live stream"""
+    # Streams are long-lived, so borrow a pooled connection only for the read
+    conn = db_pool.acquire()
+    try:
+        summary = stats.read_rollup(conn)
+    finally:
+        conn.close()
+    
+    values = events.flatten_stats(summary)
+    values['requirements.compliance_percentage'] = stats.compliance_percentage(summary['requirements'])
+    return values
+
+def stats_event_stream(last_event_id):
+    """Snapshot of the statistics, then one coalesced delta per change"""
+    yield f"retry: {app.config['SSE_RETRY_MS']}\n\n"
+    
+    generation = data_generation.current()
+    values = read_stream_stats()
+    # A reconnecting client that already has this snapshot needs nothing resent
+    if events.snapshot_id(values) != last_event_id:
+        yield events.format_event('snapshot', {'stats': values}, events.snapshot_id(values))
+    
+    while True:
+        seen = generation
+        generation = change_notifier.wait(seen, app.config['SSE_HEARTBEAT'])
+        if generation == seen:
+            yield ': heartbeat\n\n'
+            continue
+        
+        # Let a burst of writes land so subscribers get one event for all of them
+        time.sleep(app.config['SSE_COALESCE'])
+        generation = data_generation.current()
+        latest = read_stream_stats()
+        changes = events.stats_delta(values, latest)
+        if not changes:
+            continue
+        values = latest
+        yield events.format_event('stats', {'stats': values, 'changes': changes}, events.snapshot_id(values))
+
+@app.route('/api/stream')
+@login_required
+def api_stream():
+    """Server-Sent Events stream of dashboard statistics"""
+    try:
+        change_notifier.subscribe()
+    except events.TooManySubscribers:
+        response = jsonify({'error': 'Too many live connections; poll /api/compliance-stats instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = app.response_class(stats_event_stream(last_event_id), mimetype='text/event-stream')
+    response.call_on_close(change_notifier.unsubscribe)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/evidence-stats')
 @login_required
+@cached_api
 def api_evidence_stats():
     """API endpoint for evidence statistics"""
     conn = get_db_connection()
     
-    total_evidence = conn.execute('SELECT COUNT(*) as count FROM evidence').fetchone()['count']
-    total_size = conn.execute('SELECT SUM(file_size) as size FROM evidence').fetchone()['size'] or 0
+    evidence_stats = stats.read_rollup(conn)['evidence']
     
     conn.close()
     
     return jsonify({
-        'total': total_evidence,
-        'total_size': total_size
+        'total': evidence_stats['total'],
+        'total_size': evidence_stats['total_size']
     })
 
 @app.route('/api/ba-stats')
 @login_required
+@cached_api
 def api_ba_stats():
     """API endpoint for business associate statistics"""
     conn = get_db_connection()
     
-    total_ba = conn.execute('SELECT COUNT(*) as count FROM business_associates').fetchone()['count']
-    active_ba = conn.execute("SELECT COUNT(*) as count FROM business_associates WHERE contract_status = 'Active'").fetchone()['count']
+    ba_stats = stats.read_rollup(conn)['business_associates']
     
     conn.close()
     
     return jsonify({
-        'total': total_ba,
-        'active': active_ba
+        'total': ba_stats['total'],
+        'active': ba_stats['active']
     })
 
 @app.route('/debug/database')
@@ -993,44 +1559,218 @@ def debug_database():
         risk_count = conn.execute('SELECT COUNT(*) as count FROM risks').fetchone()['count']
         tables_info['risks'] = {'count': risk_count}
         
+        extraction_jobs = extraction.job_counts(conn)
+        catalog_state = conn.execute('SELECT * FROM catalog_state').fetchall()
+        
         conn.close()
         
         return jsonify({
             'status': 'success',
-            'database_file': DATABASE,
-            'tables': tables_info
+            'database_file': app.config['DATABASE'],
+            'tables': tables_info,
+            'requirement_catalog': [dict(row) for row in catalog_state],
+            'connection_pool': db_pool.stats(),
+            'db_writer': db_writer.stats(),
+            'stats_cache': response_cache.stats(),
+            'live_streams': change_notifier.stats(),
+            'evidence_extraction': dict(extraction_pool.stats(), jobs=extraction_jobs),
+            'evidence_previews': thumbnail_pool.stats(),
+            'report_jobs': report_queue.stats(),
+            'audit_trail': audit_trail.stats(),
+            'slow_queries': slow_query_log.report() if slow_query_log else None
         })
         
     except Exception as e:
         return jsonify({
             'status': 'error',
             'error': str(e),
-            'database_file': DATABASE
+            'database_file': app.config['DATABASE']
         })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request, query and pool metrics of this worker in Prometheus text format"""
+    token = app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    pool = db_pool.stats()
+    writes = db_writer.stats()
+    families = [
+        ('acep_db_pool_connections', 'gauge', 'Pooled SQLite connections by state', ('state',),
+         {('in_use',): pool['in_use'], ('idle',): pool['idle']}),
+        ('acep_db_pool_waits_total', 'counter', 'Connection checkouts that had to wait', (), {(): pool['waits']}),
+        ('acep_db_writer_queued', 'gauge', 'Write intents waiting for the writer thread', (), {(): writes['queued']}),
+        ('acep_db_writer_commits_total', 'counter', 'Group commits made by the writer thread', (),
+         {(): writes['batches']}),
+        ('acep_audit_log_queued', 'gauge', 'Audit entries not yet committed', (), {(): audit_trail.stats()['queued']}),
+        ('acep_report_jobs_in_flight', 'gauge', 'Report jobs queued or rendering in this worker', (),
+         {(): report_queue.stats()['in_flight']}),
+    ]
+    return request_metrics.render(families), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/debug/reset-requirements')
 @login_required
 def reset_requirements():
-    """Reset requirements to load new minimum requirements"""
+    """Sync the requirements with the catalog file, keeping every assessment"""
     try:
-        conn = get_db_connection()
-        
-        # Clear existing requirements
-        conn.execute('DELETE FROM hipaa_requirements')
-        conn.commit()
+        requirement_catalog = catalog.load_catalog(app.config['REQUIREMENT_CATALOG'])
         
-        # Reload new requirements
-        load_hipaa_requirements(conn)
+        # Only requirements whose catalog text changed are written
+        report = db_writer.run(catalog.apply_catalog, requirement_catalog)
+        if report['added'] or report['updated']:
+            mark_data_changed()
+        audit('sync', 'requirement', version=report['version'], added=report['added'],
+              updated=report['updated'], retired=report['retired'])
         
-        conn.close()
-        
-        flash('Requirements have been reset and updated with new minimum requirements!', 'success')
+        message = (f"Requirements synced with catalog v{report['version']}: "
+                   f"{report['added']} added, {report['updated']} updated; assessments kept.")
+        if report['retired']:
+            message += f" No longer in the catalog (kept): {', '.join(report['retired'])}."
+        flash(message, 'success')
         return redirect(url_for('audit_checklist'))
         
     except Exception as e:
-        flash(f'Error resetting requirements: {str(e)}', 'error')
+        flash(f'Error syncing requirements: {str(e)}', 'error')
         return redirect(url_for('audit_checklist'))
 
+@app.cli.command('rebuild-stats')
+@click.option('--check', is_flag=True, help='Only report drift, do not rewrite the rollup')
+def rebuild_stats_command(check):
+    """Recompute the stats_rollup row and report any drift"""
+    conn = get_db_connection()
+    drift = stats.check_rollup(conn) if check else stats.rebuild_rollup(conn)
+    conn.close()
+    
+    if not drift:
+        click.echo('stats_rollup is consistent with the base tables')
+        return
+    
+    for column, values in drift.items():
+        click.echo(f"{column}: stored={values['stored']} actual={values['actual']}")
+    if check:
+        raise SystemExit(1)
+    click.echo(f'stats_rollup rebuilt ({len(drift)} drifted columns corrected)')
+
+@app.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Re-index all audit records in the full-text search index"""
+    conn = get_db_connection()
+    indexed = search.rebuild_search_index(conn)
+    conn.close()
+    click.echo(f'search index rebuilt ({indexed} entries)')
+
+@app.cli.command('extract-evidence')
+@click.option('--retry-failed', is_flag=True, help='Also retry jobs that used up their attempts')
+def extract_evidence_command(retry_failed):
+    """Extract searchable text from evidence uploaded before extraction ran"""
+    queued = extraction_pool.submit_pending(include_failed=retry_failed)
+    click.echo(f'extracting text from {queued} evidence file(s)...')
+    start = time.monotonic()
+    extraction_pool.drain()
+    
+    conn = get_db_connection()
+    counts = extraction.job_counts(conn)
+    conn.close()
+    summary = ', '.join(f'{status}: {count}' for status, count in sorted(counts.items()))
+    click.echo(f'finished in {time.monotonic() - start:.1f}s ({summary})')
+
+@app.cli.command('build-previews')
+def build_previews_command():
+    """Render previews for image evidence uploaded before previews existed"""
+    if not thumbnails.available():
+        raise click.ClickException('Pillow is not installed (pip install -r requirements.txt)')
+    
+    conn = get_db_connection()
+    blobs = conn.execute('SELECT sha256, file_path FROM evidence_blobs').fetchall()
+    conn.close()
+    
+    queued = sum(1 for blob in blobs if thumbnail_pool.submit(blob['sha256'], blob['file_path']))
+    click.echo(f'checking {queued} evidence file(s) for images...')
+    thumbnail_pool.drain()
+    pool_stats = thumbnail_pool.stats()
+    click.echo(f"rendered {pool_stats['rendered']}, skipped {pool_stats['skipped']}, failed {pool_stats['failed']}")
+
+@app.cli.command('build-assets')
+@click.option('--no-purge', is_flag=True, help='Keep stylesheet rules whose classes no template uses')
+def build_assets_command(no_purge):
+    """Minify, fingerprint and precompress the stylesheets and scripts under static/"""
+    # Every file that can name a CSS class: templates, scripts and the views themselves
+    usage_paths = [os.path.join(app.root_path, app.template_folder, name) for name in app.jinja_env.list_templates()]
+    usage_paths += glob.glob(os.path.join(app.static_folder, 'js', '*.js'))
+    usage_paths += glob.glob(os.path.join(app.root_path, '*.py'))
+    try:
+        report = assets.build(app.static_folder, usage_paths, purge=not no_purge)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    
+    for asset in report:
+        compressed = '  '.join(f'{encoding} {asset[encoding]:>7,}' for encoding in ('gzip', 'br') if asset[encoding])
+        click.echo(f"{asset['source']:20} {asset['bytes']:>9,} -> {asset['minified']:>9,}  {compressed}  {asset['output']}")
+    if 'br' not in assets.available_encodings():
+        click.echo('Brotli is not installed (pip install -r requirements.txt): wrote .gz copies only')
+    click.echo('reload the workers (kill -HUP) to serve the new build')
+
+@app.cli.command('verify-audit-log')
+def verify_audit_log_command():
+    """Recompute the audit trail hash chain and report the first broken entry"""
+    conn = get_db_connection()
+    result = auditlog.verify_chain(conn)
+    conn.close()
+    if not result['valid']:
+        raise click.ClickException(f"hash chain broken at entry {result['first_invalid_id']} "
+                                   f"({result['entries']} entries verified before it)")
+    click.echo(f"audit log intact ({result['entries']} entries)")
+
+@app.cli.command('slow-queries')
+@click.option('--top', default=20, show_default=True, help='Statements to show')
+def slow_queries_command(top):
+    """Summarize the slow-query log written by every worker, costliest statements first"""
+    path = app.config['SLOW_QUERY_LOG']
+    if not path or not os.path.exists(path):
+        raise click.ClickException('no slow-query log yet (see SLOW_QUERY_MS and SLOW_QUERY_LOG)')
+    report = slowlog.read_log(path, top=top)
+    click.echo(f"{report['logged']} slow statements, {report['distinct_statements']} distinct")
+    for statement in report['statements']:
+        flags = [flag for flag in ('full_scan', 'temp_btree') if statement[flag]]
+        click.echo(f"\n{statement['total_ms']:10.1f} ms total  {statement['count']:>5}x  "
+                   f"avg {statement['avg_ms']:.1f} ms  max {statement['max_ms']:.1f} ms  {' '.join(flags)}")
+        click.echo(f"  {statement['sql']}")
+        click.echo(f"  params {', '.join(statement['params'])}  routes {', '.join(statement['routes'])}")
+        for line in statement['plan'] or []:
+            click.echo(f"    {line}")
+
+@app.cli.command('import-data')
+@click.argument('table', type=click.Choice(sorted(importer.IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'data_format', type=click.Choice(['csv', 'json']), help='Defaults to the file extension')
+@click.option('--batch-size', default=importer.DEFAULT_BATCH_SIZE, show_default=True, help='Rows per executemany')
+@click.option('--strict', is_flag=True, help='Insert nothing if any row is invalid')
+@click.option('--created-by', default='admin', show_default=True, help='Recorded as the creator of imported risks')
+def import_data_command(table, path, data_format, batch_size, strict, created_by):
+    """Bulk import risks, PHI types or Business Associates from a CSV/JSON file"""
+    conn = get_db_connection()
+    try:
+        with open(path, 'rb') as f:
+            rows = importer.parse_rows(importer.decode_upload(f.read()), data_format or importer.guess_format(path))
+        report = importer.import_rows(conn, importer.IMPORTS[table], rows,
+                                      batch_size=max(1, batch_size), created_by=created_by, strict=strict)
+    except ValueError as error:
+        raise click.ClickException(f'{path}: {error}')
+    finally:
+        conn.close()
+    
+    if report['inserted']:
+        audit_trail.record('import', importer.IMPORTS[table].entity_type, username=created_by,
+                           details={'inserted': report['inserted'], 'rejected': len(report['errors']), 'source': path})
+        audit_trail.flush()
+    
+    for failure in report['errors']:
+        click.echo(f"row {failure['row']}: {'; '.join(failure['errors'])}", err=True)
+    click.echo(f"{report['inserted']} of {report['received']} rows imported into {table}")
+    if report['errors']:
+        raise SystemExit(1)
+
 if __name__ == '__main__':
-    init_database()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server; production runs wsgi.py under gunicorn (see gunicorn.conf.py)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
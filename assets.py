@@ -0,0 +1,319 @@
+"""
+ACEP HIPAA Audit Assistant - Static asset pipeline
+Minifies the stylesheets and scripts, drops CSS rules for classes no template,
+script or view uses, and writes content-hashed copies with precompressed
+.gz/.br siblings plus the manifest url_for('static', ...) is rewritten through
+Created by Chaitanya Eshwar Prasad
+"""
+
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # Brotli missing: built assets are precompressed with gzip only
+    brotli = None
+
+BUILD_DIR = 'dist'  # under the static folder; every file in it is content-addressed
+MANIFEST = 'manifest.json'
+SOURCES = ('css/*.css', 'js/*.js')  # static files that are built
+HASH_LENGTH = 12
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Classes Bootstrap's JavaScript adds at run time, so no template mentions them
+RUNTIME_CLASS_PREFIXES = ('show', 'showing', 'hiding', 'fade', 'collaps', 'modal', 'tooltip', 'popover', 'bs-',
+                          'dropdown', 'offcanvas', 'toast', 'active', 'disabled', 'was-validated', 'is-valid',
+                          'is-invalid', 'carousel')
+
+_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'')
+_PLACEHOLDER = re.compile('\x00(\\d+)\x00')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_WHITESPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_CSS_PROPERTY = re.compile(r'([{;][\w-]+): ')  # "a :hover" is a selector and keeps its space
+_NOT = re.compile(r':not\([^)]*\)')
+_SELECTOR_NAME = re.compile(r'[.#](-?[_a-zA-Z][\w-]*)')
+_TOKEN = re.compile(r'[A-Za-z_][\w-]*')
+# "status-{{ x }}", f'bi-{icon}', 'badge-' + level, `text-${tone}`: any class with this prefix may be used
+_DYNAMIC_PREFIX = re.compile(r'([A-Za-z_][\w-]*-)(?:\{|\$\{|[\'"`]\s*[+~])')
+# class="ba-status {{ ba.contract_status|lower }}", className = `badge ${tone}`: a whole class filled in from data
+_DYNAMIC_CLASS_LIST = re.compile(r'(?:class="|className\s*=\s*`)([^"`]*(?:\{\{|\$\{)[^"`]*)')
+_INTERPOLATION = re.compile(r'\{\{.*?\}\}|\$\{.*?\}')
+_CLASS_NAME = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+_PARENTHESES = re.compile(r'\([^)]*\)')
+_COMBINATOR = re.compile(r'[\s>+~]+')
+
+
+def available_encodings():
+    """Content-Encodings the build writes"""
+    return [name for name, _ in ENCODINGS if name != 'br' or brotli is not None]
+
+
+def _protect_strings(text):
+    """Replace string literals by placeholders so minifying cannot touch them"""
+    strings = []
+
+    def stash(match):
+        strings.append(match.group(0))
+        return f'\x00{len(strings) - 1}\x00'
+    return _STRING.sub(stash, text), strings
+
+
+def _restore_strings(text, strings):
+    return _PLACEHOLDER.sub(lambda match: strings[int(match.group(1))], text)
+
+
+def used_names(paths):
+    """Every identifier-like token in the given files, the class prefixes they build
+    dynamically, and the hosts: static classes sharing a class list with a class filled in from data
+    """
+    tokens = set()
+    prefixes = set(RUNTIME_CLASS_PREFIXES)
+    hosts = set()
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        tokens.update(_TOKEN.findall(text))
+        prefixes.update(_DYNAMIC_PREFIX.findall(text))
+        for class_list in _DYNAMIC_CLASS_LIST.findall(text):
+            # "alert-{{ category }}" is a prefix, not a host
+            hosts.update(name for name in _INTERPOLATION.sub(' ', class_list).split()
+                         if _TOKEN.fullmatch(name) and not name.endswith('-'))
+    return tokens, tuple(sorted(prefixes)), frozenset(hosts)
+
+
+def _compounds(selector):
+    """The compound selectors of a complex selector: ".a.b > .c" -> [".a.b", ".c"]"""
+    return [part for part in _COMBINATOR.split(_PARENTHESES.sub('()', selector)) if part]
+
+
+def hosted(selector, hosts):
+    """Whether some compound of the selector pairs a host class with other classes, as in .ba-status.terminated"""
+    for compound in _compounds(_NOT.sub('', selector)):
+        names = _SELECTOR_NAME.findall(compound)
+        if len(names) > 1 and hosts.intersection(_CLASS_NAME.findall(compound)):
+            return True
+    return False
+
+
+def selector_used(selector, tokens, prefixes, hosts=frozenset()):
+    """Whether every class and id the selector requires is mentioned somewhere
+
+    On an element whose class list is partly filled in from data, any class
+    may sit next to the host, so a compound holding a used host is kept whole.
+    """
+    # ".alert:not(.alert-permanent)" still matches when the negated class is unused
+    for compound in _compounds(_NOT.sub('', selector)):
+        names = _SELECTOR_NAME.findall(compound)
+        if any(name in hosts and name in tokens for name in _CLASS_NAME.findall(compound)):
+            continue
+        if not all(name in tokens or name.startswith(prefixes) for name in names):
+            return False
+    return True
+
+
+def _selectors(css):
+    """Every selector of the style rules in minified CSS, @media blocks included"""
+    found = []
+    _purge_rules(css, lambda selector: found.append(selector) or True)
+    return found
+
+
+def check_hosted_rules(source, purged, hosts):
+    """Raise ValueError if purging dropped a selector for a class filled in from data"""
+    kept = set(_selectors(purged))
+    dropped = [selector for selector in _selectors(source) if hosted(selector, hosts) and selector not in kept]
+    if dropped:
+        raise ValueError(f"purge dropped rules for classes rendered from data: {', '.join(dropped)}")
+
+
+def _split_selectors(prelude):
+    """Split a selector list on the commas outside parentheses"""
+    selectors, depth, start = [], 0, 0
+    for index, char in enumerate(prelude):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:index])
+            start = index + 1
+    selectors.append(prelude[start:])
+    return selectors
+
+
+def _matching_brace(css, opening):
+    depth = 0
+    for index in range(opening, len(css)):
+        if css[index] == '{':
+            depth += 1
+        elif css[index] == '}':
+            depth -= 1
+            if depth == 0:
+                return index
+    raise ValueError('unbalanced braces in stylesheet')
+
+
+def _purge_rules(css, keep):
+    """Drop the selectors keep() rejects, and rules left with none, from minified CSS"""
+    out = []
+    position = 0
+    while position < len(css):
+        brace = css.find('{', position)
+        semicolon = css.find(';', position)
+        if brace == -1:
+            out.append(css[position:])
+            break
+        if semicolon != -1 and semicolon < brace:
+            # Statement at-rule (@import, @charset)
+            out.append(css[position:semicolon + 1])
+            position = semicolon + 1
+            continue
+
+        prelude = css[position:brace]
+        end = _matching_brace(css, brace)
+        block = css[brace + 1:end]
+        if prelude.startswith(('@media', '@supports')):
+            inner = _purge_rules(block, keep)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            # @keyframes, @font-face and the like are kept whole
+            out.append(css[position:end + 1])
+        else:
+            selectors = [selector for selector in _split_selectors(prelude) if keep(selector)]
+            if selectors:
+                out.append(f"{','.join(selectors)}{{{block}}}")
+        position = end + 1
+    return ''.join(out)
+
+
+def minify_css(css, keep=None):
+    """Strip comments and whitespace; with keep, also drop rules for unused selectors"""
+    css, strings = _protect_strings(css)
+    css = _CSS_COMMENT.sub('', css)
+    css = _WHITESPACE.sub(' ', css)
+    css = _CSS_PUNCTUATION.sub(r'\1', css)
+    css = _CSS_PROPERTY.sub(r'\1:', css).replace(';}', '}').strip()
+    if keep is not None:
+        css = _purge_rules(css, keep)
+    return _restore_strings(css, strings)
+
+
+def minify_js(js):
+    """Drop indentation, blank lines and comment-only lines
+
+    Line breaks are kept, so automatic semicolon insertion behaves exactly as
+    before, and lines inside a multi-line template literal are left verbatim;
+    no JavaScript parser needed.
+    """
+    lines = []
+    in_comment = in_template = False
+    for line in js.splitlines():
+        stripped = line.strip()
+        if in_template:
+            lines.append(line)
+        elif in_comment:
+            in_comment = '*/' not in stripped
+            continue
+        elif stripped.startswith('/*'):
+            in_comment = '*/' not in stripped
+            continue
+        elif stripped.startswith('//'):
+            continue
+        elif stripped:
+            lines.append(stripped)
+        if (line.count('`') - line.count('\\`')) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+def hashed_name(name, data):
+    """styles.css -> styles.<first 12 hex digits of its SHA-256>.css"""
+    stem, extension = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}'
+
+
+def write_compressed(path, data):
+    """Write the .gz (and .br, when Brotli is installed) siblings; returns {encoding: size}"""
+    sizes = {}
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    for name, suffix in ENCODINGS:
+        if name in variants:
+            with open(path + suffix, 'wb') as f:
+                f.write(variants[name])
+            sizes[name] = len(variants[name])
+    return sizes
+
+
+def build(static_folder, usage_paths, purge=True):
+    """Build every source asset into static/dist and write the manifest
+
+    usage_paths are the templates, scripts and modules searched for the class
+    names a stylesheet rule needs to be kept. A purge that would drop a rule for
+    a class rendered from template data raises ValueError, and the manifest is
+    left alone. Earlier builds are left in place, so pages rendered before a
+    reload keep finding their assets. Returns one
+    {'source', 'output', 'bytes', 'minified', 'gzip', 'br'} per asset.
+    """
+    tokens, prefixes, hosts = used_names(usage_paths)
+    keep = (lambda selector: selector_used(selector, tokens, prefixes, hosts)) if purge else None
+
+    manifest = {}
+    report = []
+    for pattern in SOURCES:
+        for source in sorted(glob.glob(os.path.join(static_folder, pattern))):
+            name = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, encoding='utf-8') as f:
+                text = f.read()
+            if name.endswith('.css'):
+                minified = minify_css(text, keep)
+                if keep is not None:
+                    check_hosted_rules(minify_css(text), minified, hosts)
+            else:
+                minified = minify_js(text)
+            data = minified.encode('utf-8')
+
+            output = f'{BUILD_DIR}/{hashed_name(name, data)}'
+            path = os.path.join(static_folder, output)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            sizes = write_compressed(path, data)
+
+            manifest[name] = output
+            report.append(dict({'source': name, 'output': output, 'bytes': len(text.encode('utf-8')),
+                                'minified': len(data), 'gzip': None, 'br': None}, **sizes))
+
+    # Written last and atomically: a half-finished build never changes the URLs
+    manifest_path = os.path.join(static_folder, BUILD_DIR, MANIFEST)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return report
+
+
+def load_manifest(static_folder):
+    """Source name -> built name, or {} when assets have not been built"""
+    try:
+        with open(os.path.join(static_folder, BUILD_DIR, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def negotiate(path, accept_encodings):
+    """(file to send, Content-Encoding or None) for a built asset and the client's Accept-Encoding"""
+    for name, suffix in ENCODINGS:
+        if accept_encodings[name] and os.path.isfile(path + suffix):
+            return path + suffix, name
+    return path, None
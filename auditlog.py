@@ -0,0 +1,195 @@
+"""
+ACEP HIPAA Audit Assistant - Audit trail
+Append-only, hash-chained history of every change to the audit data, queued
+by the request threads and written in batches by one writer thread
+Created by Chaitanya Eshwar Prasad
+"""
+
+import atexit
+import hashlib
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+# Columns hashed into each entry, in chain order
+ENTRY_COLUMNS = ('occurred_at', 'username', 'action', 'entity_type', 'entity_id', 'details')
+
+MAX_RETRY_DELAY = 30.0  # seconds between attempts while the database refuses a batch
+
+
+def install_audit_log(conn):
+    """Audit log table, its query indexes and the triggers that make it append-only"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            occurred_at TEXT NOT NULL,
+            username TEXT,
+            action TEXT NOT NULL,
+            entity_type TEXT NOT NULL,
+            entity_id TEXT,
+            details TEXT,
+            prev_hash TEXT,
+            entry_hash TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_audit_log_entity
+        ON audit_log (entity_type, entity_id, occurred_at, id)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log (username, occurred_at, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_log_time ON audit_log (occurred_at, id)')
+    for event in ('UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS audit_log_no_{event.lower()}
+            BEFORE {event} ON audit_log
+            BEGIN
+                SELECT RAISE(ABORT, 'audit_log is append-only');
+            END
+        ''')
+
+
+def chain_hash(prev_hash, entry):
+    """SHA-256 linking an entry to the one before it"""
+    encoded = json.dumps([prev_hash] + list(entry), separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def verify_chain(conn, batch_size=1000):
+    """Recompute the hash chain; reports the first entry that does not match"""
+    checked = 0
+    prev_hash = None
+    last_id = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT id, {', '.join(ENTRY_COLUMNS)}, prev_hash, entry_hash FROM audit_log
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return {'entries': checked, 'valid': True, 'first_invalid_id': None}
+        for row in rows:
+            entry = tuple(row[column] for column in ENTRY_COLUMNS)
+            if row['prev_hash'] != prev_hash or row['entry_hash'] != chain_hash(prev_hash, entry):
+                return {'entries': checked, 'valid': False, 'first_invalid_id': row['id']}
+            prev_hash = row['entry_hash']
+            checked += 1
+        last_id = rows[-1]['id']
+
+
+class AuditTrail:
+    """Queue of audit entries drained by a single batching writer thread
+
+    record() only appends to an in-memory queue, so routes do not pay for
+    a second write. The writer commits everything queued in one transaction
+    per batch and extends the hash chain from the last stored entry, which
+    it reads under the write lock so worker processes share one chain.
+    """
+
+    def __init__(self, db_pool, batch_size=500, max_queue=10000):
+        self.db_pool = db_pool
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._pending = 0
+        self._writer = None
+        self._counters = {'recorded': 0, 'written': 0, 'batches': 0, 'largest_batch': 0,
+                          'write_seconds': 0.0, 'errors': 0}
+
+    def _ensure_writer(self):
+        """Start the writer thread on first use"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name='audit-writer', daemon=True)
+            self._writer.start()
+            atexit.register(self.flush, 5.0)
+
+    def record(self, action, entity_type, entity_id=None, username=None, details=None):
+        """Queue one entry; blocks only if the writer has fallen max_queue entries behind"""
+        occurred_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        entry = (occurred_at, username, action, entity_type,
+                 None if entity_id is None else str(entity_id),
+                 json.dumps(details, sort_keys=True, default=str) if details else None)
+        with self._lock:
+            self._ensure_writer()
+            self._pending += 1
+            self._counters['recorded'] += 1
+        # Back-pressure rather than dropping entries when the database stalls
+        self._queue.put(entry)
+
+    def flush(self, timeout=None):
+        """Wait until every queued entry is committed; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._done:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._done.wait(remaining)
+        return True
+
+    def _write_loop(self):
+        """Take whatever is queued (up to batch_size) and commit it as one batch"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            delay = 0.1
+            while True:
+                try:
+                    self._write(batch)
+                    break
+                except Exception as failure:
+                    # Never drop entries: keep the batch and try again
+                    print(f'Audit log write failed ({len(batch)} entries), retrying: {failure}')
+                    with self._lock:
+                        self._counters['errors'] += 1
+                    time.sleep(delay)
+                    delay = min(delay * 2, MAX_RETRY_DELAY)
+
+            with self._done:
+                self._pending -= len(batch)
+                self._done.notify_all()
+
+    def _write(self, batch):
+        """Chain and insert a batch of entries in one transaction"""
+        start = time.perf_counter()
+        conn = self.db_pool.acquire()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                last = conn.execute('SELECT entry_hash FROM audit_log ORDER BY id DESC LIMIT 1').fetchone()
+                prev_hash = last[0] if last else None
+                rows = []
+                for entry in batch:
+                    entry_hash = chain_hash(prev_hash, entry)
+                    rows.append(entry + (prev_hash, entry_hash))
+                    prev_hash = entry_hash
+                conn.executemany(f'''
+                    INSERT INTO audit_log ({', '.join(ENTRY_COLUMNS)}, prev_hash, entry_hash)
+                    VALUES ({', '.join('?' for _ in ENTRY_COLUMNS)}, ?, ?)
+                ''', rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._counters['written'] += len(batch)
+            self._counters['batches'] += 1
+            self._counters['largest_batch'] = max(self._counters['largest_batch'], len(batch))
+            self._counters['write_seconds'] += time.perf_counter() - start
+
+    def stats(self):
+        """Writer counters for the debug endpoint"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['write_seconds'] = round(stats['write_seconds'], 4)
+            stats['queued'] = self._pending
+        return stats
@@ -0,0 +1,124 @@
+"""
+ACEP HIPAA Audit Assistant - Evidence text extraction benchmark
+Writes synthetic txt/csv/docx/xlsx/pptx evidence files and measures
+extraction throughput for thread and process pools of several sizes
+Created by Chaitanya Eshwar Prasad
+
+Usage: python benchmarks/bench_extraction.py [--files 200] [--paragraphs 400] [--workers 1 2 4]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction
+
+WORDS = ('access audit backup breach cloud contract disposal email encryption firewall laptop '
+         'logging malware mobile network password patch phishing policy portal retention '
+         'server shredding training transmission vendor workstation').split()
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+S_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+
+
+def sentence(rng, length=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def write_txt(path, rng, paragraphs):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(sentence(rng) for _ in range(paragraphs)))
+
+
+def write_csv(path, rng, paragraphs):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('id,control,owner,notes\n')
+        f.writelines(f'{row},{rng.choice(WORDS)},{rng.choice(WORDS)},{sentence(rng, 8)}\n'
+                     for row in range(paragraphs))
+
+
+def write_docx(path, rng, paragraphs):
+    body = ''.join(f'<w:p><w:r><w:t>{sentence(rng)}</w:t></w:r></w:p>' for _ in range(paragraphs))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{W_NS}"><w:body>{body}</w:body></w:document>')
+
+
+def write_xlsx(path, rng, paragraphs):
+    strings = ''.join(f'<si><t>{sentence(rng, 6)}</t></si>' for _ in range(paragraphs))
+    rows = ''.join(f'<row r="{row + 1}"><c r="A{row + 1}"><v>{row}</v></c>'
+                   f'<c r="B{row + 1}" t="s"><v>{row}</v></c></row>' for row in range(paragraphs))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{S_NS}">{strings}</sst>')
+        archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{S_NS}"><sheetData>{rows}</sheetData></worksheet>')
+
+
+def write_pptx(path, rng, paragraphs):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        for slide in range(1, max(2, paragraphs // 20) + 1):
+            shapes = ''.join(f'<a:p><a:r><a:t>{sentence(rng)}</a:t></a:r></a:p>' for _ in range(20))
+            archive.writestr(f'ppt/slides/slide{slide}.xml', f'<p:sld xmlns:p="p" xmlns:a="{A_NS}">{shapes}</p:sld>')
+
+
+WRITERS = {'txt': write_txt, 'csv': write_csv, 'docx': write_docx, 'xlsx': write_xlsx, 'pptx': write_pptx}
+
+
+def make_corpus(workdir, files, paragraphs):
+    """Evidence files spread evenly over the supported formats"""
+    rng = random.Random(42)
+    paths = []
+    for number in range(files):
+        extension = list(WRITERS)[number % len(WRITERS)]
+        path = os.path.join(workdir, f'evidence{number}.{extension}')
+        WRITERS[extension](path, rng, paragraphs)
+        paths.append(path)
+    return paths
+
+
+def text_length(path):
+    return len(extraction.extract_text(path))
+
+
+def run(executor_class, workers, paths):
+    start = time.perf_counter()
+    with executor_class(max_workers=workers) as executor:
+        chars = sum(executor.map(text_length, paths))
+    return time.perf_counter() - start, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--paragraphs', type=int, default=400, help='Paragraphs, rows or strings per file')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='acep-bench-')
+    try:
+        paths = make_corpus(workdir, args.files, args.paragraphs)
+        megabytes = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+        print(f'{args.files} files, {megabytes:.1f} MB on disk')
+
+        for executor_class in (ThreadPoolExecutor, ProcessPoolExecutor):
+            for workers in args.workers:
+                elapsed, chars = run(executor_class, workers, paths)
+                print(f'{executor_class.__name__:20} {workers:>2} workers  '
+                      f'{args.files / elapsed:8.1f} files/s  {megabytes / elapsed:6.1f} MB/s  '
+                      f'{chars / elapsed / 1e6:6.1f} M chars/s')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
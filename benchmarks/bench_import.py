@@ -0,0 +1,76 @@
+"""
+ACEP HIPAA Audit Assistant - Bulk import benchmark
+Compares adding risks one form post at a time (/risks/add) with a single
+/api/import/risks request, against a throwaway database
+Created by Chaitanya Eshwar Prasad
+
+Usage: python benchmarks/bench_import.py [--rows 2000] [--batch-size 500]
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_rows(count):
+    """Synthetic risk register rows"""
+    return [{
+        'title': f'Benchmark risk {i}',
+        'description': 'Synthetic row for the import benchmark',
+        'likelihood': i % 5 + 1,
+        'impact': (i * 3) % 5 + 1,
+        'mitigation': 'Review quarterly',
+        'owner': f'owner{i % 7}',
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    # The app keeps its database under the working directory
+    workdir = tempfile.mkdtemp(prefix='acep-bench-')
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    import app as app_module
+
+    app_module.init_database()
+    client = app_module.app.test_client()
+    client.post('/login', data={'username': 'acep', 'password': 'acep123'})
+    rows = sample_rows(args.rows)
+
+    try:
+        start = time.perf_counter()
+        for row in rows:
+            client.post('/risks/add', data={key: str(value) for key, value in row.items()})
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post(f'/api/import/risks?batch_size={args.batch_size}',
+                               data={'file': (io.BytesIO(json.dumps(rows).encode()), 'risks.json')},
+                               content_type='multipart/form-data')
+        bulk = time.perf_counter() - start
+        report = response.get_json()
+        assert report['inserted'] == args.rows, report
+
+        print(f'rows:            {args.rows}')
+        print(f'one-row path:    {single:8.3f}s  {args.rows / single:10.0f} rows/s')
+        print(f'bulk import:     {bulk:8.3f}s  {args.rows / bulk:10.0f} rows/s  (batch size {args.batch_size})')
+        print(f'speed-up:        {single / bulk:8.1f}x')
+    finally:
+        app_module.db_pool.close_all()
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
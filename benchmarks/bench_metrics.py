@@ -0,0 +1,64 @@
+"""
+ACEP HIPAA Audit Assistant - Query instrumentation overhead benchmark
+Times point lookups and full scans through a plain sqlite3 cursor and
+through the TimedCursor that feeds /metrics and the slow-query log,
+inside a request tally
+Created by Chaitanya Eshwar Prasad
+
+Usage: python benchmarks/bench_metrics.py [--rows 50000] [--lookups 20000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+import slowlog
+
+
+def workload(conn, factory, rows, lookups):
+    """(seconds for point lookups, seconds for a full scan)"""
+    start = time.perf_counter()
+    for number in range(lookups):
+        conn.cursor(factory).execute('SELECT id, title FROM risks WHERE id = ?', (number % rows + 1,)).fetchone()
+    point = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in conn.cursor(factory).execute('SELECT * FROM risks'):
+        pass
+    return point, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE risks (id INTEGER PRIMARY KEY, title TEXT, description TEXT, score INTEGER)')
+    conn.executemany('INSERT INTO risks (title, description, score) VALUES (?, ?, ?)',
+                     ((f'risk {number}', 'synthetic ' * 10, number % 25) for number in range(args.rows)))
+
+    # Same request scope and slow-query threshold as the app
+    metrics.RequestMetrics().start_request('bench')
+    metrics.set_slow_query_log(slowlog.SlowQueryLog(100))
+    results = {}
+    for label, factory in (('plain cursor', sqlite3.Cursor), ('timed cursor', metrics.TimedCursor)):
+        workload(conn, factory, args.rows, args.lookups)  # warm the page cache
+        results[label] = workload(conn, factory, args.rows, args.lookups)
+        point, scan = results[label]
+        print(f'{label:14} lookup {point / args.lookups * 1e6:6.2f} us  scan {scan / args.rows * 1e6:6.3f} us/row')
+
+    plain, timed = results['plain cursor'], results['timed cursor']
+    print(f'overhead       lookup {(timed[0] - plain[0]) / args.lookups * 1e6:+6.2f} us  '
+          f'scan {(timed[1] - plain[1]) / args.rows * 1e6:+6.3f} us/row')
+
+
+if __name__ == '__main__':
+    main()
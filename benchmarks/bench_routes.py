@@ -0,0 +1,440 @@
+"""
+ACEP HIPAA Audit Assistant - Route load test
+Drives every route against a seeded database, in process through the Flask
+test client and over real HTTP, with concurrent workers, and reports
+throughput, p50/p95/p99 latency and peak RSS per route as JSON
+Created by Chaitanya Eshwar Prasad
+
+Usage: python benchmarks/bench_routes.py [--workdir DIR] [--mode client|http|both] [--concurrency 8]
+                                         [--requests 200] [--output results.json] [--compare baseline.json]
+                                         [--server dev|gunicorn] [--workers N] [--threads 8]
+
+Without --workdir a throwaway directory is seeded (see benchmarks/seed.py for
+the volumes). In http mode the seeded data is served by the threaded
+development server, or with --server gunicorn by gunicorn.conf.py with the
+given workers and threads; --url targets an already running server instead.
+"""
+
+import argparse
+import http.cookiejar
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import seed as seeding
+
+USERNAME = 'acep'
+PASSWORD = 'acep123'
+SEARCH_TERMS = ('encryption', 'laptop malware', 'vend', 'password policy')
+
+
+def form(**fields):
+    return {key: str(value) for key, value in fields.items()}
+
+
+def risk_form(rng, ids):
+    return form(title=seeding.sentence(rng, 5), description=seeding.sentence(rng, 20),
+                likelihood=rng.randint(1, 5), impact=rng.randint(1, 5), mitigation=seeding.sentence(rng, 10),
+                owner='bench', status=rng.choice(seeding.RISK_STATUSES))
+
+
+def phi_form(rng, ids):
+    return form(phi_type=seeding.sentence(rng, 3), description=seeding.sentence(rng, 15),
+                classification=rng.choice(seeding.PHI_CLASSIFICATIONS), access_patterns=seeding.sentence(rng, 8),
+                disposal_procedures=seeding.sentence(rng, 8))
+
+
+def business_associate_form(rng, ids):
+    return form(name=seeding.sentence(rng, 2), contact_person=seeding.sentence(rng, 2), email='bench@example.com',
+                phone='555-0100', contract_status=rng.choice(seeding.CONTRACT_STATUSES),
+                compliance_status=rng.choice(seeding.COMPLIANCE_STATUSES),
+                last_assessment_date='2024-01-01', next_assessment_date='2025-01-01')
+
+
+# name -> (method, path(rng, ids), form(rng, ids) or None, upload); ids holds the seeded id ranges
+ROUTES = {
+    'dashboard': ('GET', lambda rng, ids: '/dashboard', None, False),
+    'audit_checklist': ('GET', lambda rng, ids: '/audit', None, False),
+    'evidence': ('GET', lambda rng, ids: '/evidence', None, False),
+    'evidence_filtered': ('GET', lambda rng, ids: f"/evidence?requirement={rng.choice(ids['requirements'])}", None, False),
+    'risk_register': ('GET', lambda rng, ids: '/risks', None, False),
+    'risk_register_high': ('GET', lambda rng, ids: '/risks?level=high&status=Open', None, False),
+    'phi_tracking': ('GET', lambda rng, ids: '/phi-tracking', None, False),
+    'business_associates': ('GET', lambda rng, ids: '/business-associates', None, False),
+    'reports': ('GET', lambda rng, ids: '/reports', None, False),
+    'generate_report': ('POST', lambda rng, ids: '/reports/generate',
+                        lambda rng, ids: form(report_type=rng.choice(('compliance', 'evidence', 'risk'))), False),
+    'download_evidence': ('GET', lambda rng, ids: f"/evidence/download/{rng.randint(1, ids['evidence'])}", None, False),
+    'api_requirements': ('GET', lambda rng, ids: '/api/requirements', None, False),
+    'api_evidence': ('GET', lambda rng, ids: '/api/evidence?limit=100', None, False),
+    'api_risks': ('GET', lambda rng, ids: '/api/risks?limit=100', None, False),
+    'api_phi_types': ('GET', lambda rng, ids: '/api/phi-types?limit=100', None, False),
+    'api_business_associates': ('GET', lambda rng, ids: '/api/business-associates?limit=100', None, False),
+    'api_compliance_stats': ('GET', lambda rng, ids: '/api/compliance-stats', None, False),
+    'api_evidence_stats': ('GET', lambda rng, ids: '/api/evidence-stats', None, False),
+    'api_ba_stats': ('GET', lambda rng, ids: '/api/ba-stats', None, False),
+    'api_search': ('GET', lambda rng, ids: '/api/search?' + urllib.parse.urlencode({'q': rng.choice(SEARCH_TERMS)}),
+                   None, False),
+    'api_export_risks': ('GET', lambda rng, ids: '/api/export/risks?format=csv', None, False),
+    'api_audit_log': ('GET', lambda rng, ids: '/api/audit-log?limit=100', None, False),
+    'update_requirement': ('POST', lambda rng, ids: '/audit/update',
+                           lambda rng, ids: form(requirement_id=rng.choice(ids['requirements']),
+                                                 status=rng.choice(seeding.REQUIREMENT_STATUSES),
+                                                 notes=seeding.sentence(rng, 10)), False),
+    'upload_evidence': ('POST', lambda rng, ids: '/evidence/upload',
+                        lambda rng, ids: form(requirement_id=rng.choice(ids['requirements']),
+                                              description=seeding.sentence(rng, 8)), True),
+    'add_risk': ('POST', lambda rng, ids: '/risks/add', risk_form, False),
+    'update_risk': ('POST', lambda rng, ids: f"/risks/update/{rng.randint(1, ids['risks'])}", risk_form, False),
+    'add_phi_type': ('POST', lambda rng, ids: '/phi-tracking/add', phi_form, False),
+    'update_phi_type': ('POST', lambda rng, ids: f"/phi-tracking/update/{rng.randint(1, ids['phi_types'])}",
+                        phi_form, False),
+    'add_business_associate': ('POST', lambda rng, ids: '/business-associates/add', business_associate_form, False),
+    'edit_business_associate': ('POST',
+                                lambda rng, ids: f"/business-associates/edit/{rng.randint(1, ids['business_associates'])}",
+                                business_associate_form, False),
+    'conduct_assessment': ('POST',
+                           lambda rng, ids: f"/business-associates/assess/{rng.randint(1, ids['business_associates'])}",
+                           lambda rng, ids: form(compliance_status=rng.choice(seeding.COMPLIANCE_STATUSES),
+                                                 assessment_date='2025-01-01', next_assessment_date='2026-01-01',
+                                                 assessment_notes=seeding.sentence(rng, 10)), False),
+}
+WRITE_ROUTES = {name for name, (method, _, _, _) in ROUTES.items() if method == 'POST' and name != 'generate_report'}
+
+
+def seeded_ids(database):
+    """Highest ids and the requirement ids, for building request paths"""
+    conn = sqlite3.connect(database)
+    try:
+        ids = {'requirements': [row[0] for row in conn.execute('SELECT requirement_id FROM hipaa_requirements')]}
+        for key, table in (('evidence', 'evidence'), ('risks', 'risks'), ('phi_types', 'phi_tracking'),
+                           ('business_associates', 'business_associates')):
+            ids[key] = max(1, conn.execute(f'SELECT COALESCE(MAX(id), 1) FROM {table}').fetchone()[0])
+    finally:
+        conn.close()
+    return ids
+
+
+# Peak RSS per route: Linux lets a process's high-water mark be reset through clear_refs
+def reset_peak_rss(pid):
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb(pid, resettable):
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Elsewhere only the lifetime peak of this process is available
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if pid == os.getpid() and not resettable else None
+
+
+class TestClientSession:
+    """One logged-in Flask test client per worker thread"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+        self.request('POST', '/login', form(username=USERNAME, password=PASSWORD), None)
+
+    def request(self, method, path, data, upload):
+        if upload:
+            data = dict(data, file=upload)
+        response = self.client.open(path, method=method, data=data, follow_redirects=True,
+                                    content_type='multipart/form-data' if upload else None)
+        response.get_data()
+        return response.status_code
+
+
+class HttpSession:
+    """One logged-in urllib opener (own cookie jar) per worker thread"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.request('POST', '/login', form(username=USERNAME, password=PASSWORD), None)
+
+    def request(self, method, path, data, upload):
+        body = None
+        headers = {}
+        if upload:
+            body, content_type = multipart(data, upload)
+            headers['Content-Type'] = content_type
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=120) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as failure:
+            failure.read()
+            return failure.code
+
+
+def multipart(fields, upload):
+    """multipart/form-data body for an upload; upload is (file object, file name)"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    stream, filename = upload
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n'.encode() + stream.read() + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def upload_file(rng):
+    return io.BytesIO(seeding.sentence(rng, 200).encode()), f'bench-{rng.randint(0, 10 ** 9)}.txt'
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_route(name, sessions, requests, ids, rss_pid):
+    """Send `requests` requests to one route, split over the worker sessions"""
+    method, path, make_form, upload = ROUTES[name]
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    share = [requests // len(sessions) + (1 if index < requests % len(sessions) else 0)
+             for index in range(len(sessions))]
+    gate = threading.Barrier(len(sessions) + 1)
+
+    def worker(index, session):
+        rng = random.Random(f'{name}-{index}')
+        gate.wait()
+        for _ in range(share[index]):
+            data = make_form(rng, ids) if make_form else None
+            start = time.perf_counter()
+            try:
+                status = session.request(method, path(rng, ids), data, upload_file(rng) if upload else None)
+            except Exception as failure:
+                status = type(failure).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    resettable = rss_pid is not None and reset_peak_rss(rss_pid)
+    threads = [threading.Thread(target=worker, args=(index, session)) for index, session in enumerate(sessions)]
+    for thread in threads:
+        thread.start()
+    gate.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400))
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'peak_rss_kb': peak_rss_kb(rss_pid, resettable),
+    }
+
+
+def run_mode(mode, make_session, routes, args, ids, rss_pid):
+    print(f'\n{mode}: {args.concurrency} workers, {args.requests} requests per route')
+    sessions = [make_session() for _ in range(args.concurrency)]
+    results = {}
+    for name in routes:
+        result = run_route(name, sessions, args.requests, ids, rss_pid)
+        results[name] = result
+        rss = f"{result['peak_rss_kb'] / 1024:7.1f} MB" if result['peak_rss_kb'] else '      -   '
+        print(f"  {name:24} {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:8.1f}  "
+              f"p95 {result['p95_ms']:8.1f}  p99 {result['p99_ms']:8.1f} ms  {rss}  errors {result['errors']}")
+    return results
+
+
+def upload_folder(workdir):
+    """Keep uploads inside the seeded directory whatever the app's root path"""
+    return os.path.join(workdir, 'instance', 'evidence')
+
+
+def serve(workdir, port):
+    """Child process for --server dev: the app on the seeded data, on the threaded development server"""
+    os.chdir(workdir)
+    import app as app_module
+    from werkzeug.serving import run_simple
+    run_simple('127.0.0.1', port, app_module.create_app({'UPLOAD_FOLDER': upload_folder(workdir)}), threaded=True)
+
+
+def start_server(workdir, args):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+                   '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--threads', str(args.threads),
+                   '--chdir', workdir, '--pythonpath', REPO_ROOT, 'wsgi:application']
+        env = dict(os.environ, ACEP_UPLOAD_FOLDER=upload_folder(workdir))
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--serve', str(port), '--workdir', workdir]
+        env = None
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit('benchmark server did not start')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print p95 and throughput changes against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nagainst {baseline_path} (commit {baseline.get('commit')}):")
+    for mode, routes in results['modes'].items():
+        for name, result in routes.items():
+            before = baseline.get('modes', {}).get(mode, {}).get(name)
+            if not before:
+                continue
+            p95 = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            rps = ((result['throughput_rps'] - before['throughput_rps']) / before['throughput_rps'] * 100
+                   if before['throughput_rps'] else 0.0)
+            flag = '  <-- slower' if p95 > 20 else ''
+            print(f'  {mode:6} {name:24} p95 {p95:+7.1f}%  throughput {rps:+7.1f}%{flag}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--workdir', help='Seeded directory to reuse (default: seed a throwaway one)')
+    parser.add_argument('--mode', choices=('client', 'http', 'both'), default='both')
+    parser.add_argument('--url', help='Benchmark this running server instead of starting one (http mode)')
+    parser.add_argument('--server', choices=('dev', 'gunicorn'), default='dev', help='Server to start in http mode')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent workers per route')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route')
+    parser.add_argument('--routes', nargs='+', choices=sorted(ROUTES), help='Only these routes')
+    parser.add_argument('--read-only', action='store_true', help='Skip the routes that write')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    for table, count in seeding.DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{table.replace('_', '-')}", type=int, default=count)
+    parser.add_argument('--files', type=int, default=seeding.DEFAULT_FILES)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.workdir, args.serve)
+        return
+
+    # Result files are named relative to where the harness was started
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    routes = args.routes or [name for name in ROUTES if not (args.read_only and name in WRITE_ROUTES)]
+    throwaway = args.workdir is None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='acep-bench-'))
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    import app as app_module
+
+    server = None
+    try:
+        app_module.create_app({'UPLOAD_FOLDER': upload_folder(workdir)})
+        counts = {table: getattr(args, table) for table in seeding.DEFAULT_COUNTS}
+        if throwaway:
+            conn = app_module.db_pool.acquire()
+            try:
+                start = time.perf_counter()
+                seeding.seed(conn, app_module.app.config['UPLOAD_FOLDER'], counts, args.files)
+                print(f'seeded {workdir} in {time.perf_counter() - start:.1f}s')
+            finally:
+                conn.close()
+        ids = seeded_ids(app_module.DATABASE)
+
+        results = {
+            'commit': git_commit(),
+            'recorded_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'python': sys.version.split()[0],
+            'cpus': os.cpu_count(),
+            'concurrency': args.concurrency,
+            'server': args.url or (f'gunicorn {args.workers}x{args.threads}' if args.server == 'gunicorn' else 'dev'),
+            'requests_per_route': args.requests,
+            'dataset': {key: value for key, value in ids.items() if key != 'requirements'},
+            'modes': {},
+        }
+        if args.mode in ('client', 'both'):
+            results['modes']['client'] = run_mode('client', lambda: TestClientSession(app_module.app),
+                                                  routes, args, ids, os.getpid())
+            app_module.audit_trail.flush(30)
+        if args.mode in ('http', 'both'):
+            if args.url:
+                base_url, rss_pid = args.url, None
+            else:
+                server, base_url = start_server(workdir, args)
+                # gunicorn's memory is in its workers, not the master
+                rss_pid = server.pid if args.server == 'dev' else None
+            results['modes']['http'] = run_mode(f'http {base_url}', lambda: HttpSession(base_url),
+                                                routes, args, ids, rss_pid)
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f'\nresults written to {output}')
+        if baseline:
+            compare(results, baseline)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        app_module.db_pool.close_all()
+        os.chdir(REPO_ROOT)
+        if throwaway:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+ACEP HIPAA Audit Assistant - Full-text search benchmark
+Loads synthetic risks, PHI types and Business Associates into a throwaway
+database (indexed by the FTS5 triggers) and times /api/search style queries
+Created by Chaitanya Eshwar Prasad
+
+Usage: python benchmarks/bench_search.py [--rows 100000] [--repeat 50]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema
+import search
+
+WORDS = ('access audit backup breach cloud contract disposal email encryption firewall laptop '
+         'logging malware mobile network password patch phishing policy portal retention '
+         'server shredding training transmission vendor workstation').split()
+
+# Everyday filler vocabulary, so audit terms are about as selective as in real records
+FILLER = [f'term{number}' for number in range(5000)]
+AUDIT_TERM_SHARE = 0.1
+
+QUERIES = ['encryption', 'laptop malware', 'vend', 'disposal shredding', 'password policy training']
+
+
+def sentence(rng, length):
+    """Random text: mostly filler with audit terms mixed in"""
+    return ' '.join(rng.choice(WORDS) if rng.random() < AUDIT_TERM_SHARE else rng.choice(FILLER)
+                    for _ in range(length))
+
+
+def load(conn, rows):
+    """Insert rows across three tables; the triggers index them as they go"""
+    rng = random.Random(42)
+    conn.execute('BEGIN')
+    conn.executemany('''
+        INSERT INTO risks (title, description, likelihood, impact, mitigation, owner)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', ((sentence(rng, 4), sentence(rng, 20), rng.randint(1, 5), rng.randint(1, 5), sentence(rng, 12), 'owner')
+          for _ in range(rows // 2)))
+    conn.executemany('''
+        INSERT INTO phi_tracking (phi_type, description, classification, access_patterns, disposal_procedures)
+        VALUES (?, ?, 'High', ?, ?)
+    ''', ((sentence(rng, 3), sentence(rng, 15), sentence(rng, 8), sentence(rng, 8)) for _ in range(rows // 4)))
+    conn.executemany('''
+        INSERT INTO business_associates (name, contact_person, email)
+        VALUES (?, ?, ?)
+    ''', ((sentence(rng, 2), sentence(rng, 2), 'contact@example.com') for _ in range(rows - rows // 2 - rows // 4)))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='acep-bench-')
+    try:
+        conn = sqlite3.connect(os.path.join(workdir, 'bench.db'), isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        schema.migrate(conn)
+
+        start = time.perf_counter()
+        load(conn, args.rows)
+        print(f'loaded and indexed {args.rows} rows in {time.perf_counter() - start:.1f}s')
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                found = search.search(conn, query, limit=20)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            median = timings[len(timings) // 2] * 1000
+            p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+            print(f'{query!r:28} {found["total"]:>7} hits  median {median:7.2f} ms  p95 {p95:7.2f} ms')
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+ACEP HIPAA Audit Assistant - Worker cold-start benchmark
+Starts fresh interpreter processes that import the app and run
+init_database(), against an empty database and against a current one,
+as a newly deployed and a restarted worker would
+Created by Chaitanya Eshwar Prasad
+
+Usage: python benchmarks/bench_startup.py [--runs 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child; the parent adds interpreter start-up by timing the whole process
+CHILD = '''
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.init_database()
+done = time.perf_counter()
+app.db_pool.close_all()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'init_ms': (done - imported) * 1000}))
+'''
+
+
+def start_worker(workdir):
+    """One cold start in workdir: {process_ms, import_ms, init_ms}"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process_ms'] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def summarize(label, runs):
+    print(f'{label:16}', '  '.join(
+        f"{key} p50 {statistics.median(run[key] for run in runs):7.2f} ms"
+        for key in ('process_ms', 'import_ms', 'init_ms')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='acep-startup-') as scratch:
+        # A new directory per run, so every start bootstraps an empty database
+        fresh = [start_worker(tempfile.mkdtemp(dir=scratch)) for _ in range(args.runs)]
+
+        workdir = tempfile.mkdtemp(dir=scratch)
+        start_worker(workdir)
+        restart = [start_worker(workdir) for _ in range(args.runs)]
+
+    summarize('empty database', fresh)
+    summarize('current database', restart)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+ACEP HIPAA Audit Assistant - Concurrent write benchmark
+Compares many threads committing their own writes (each contending for the
+SQLite write lock) with the same writes group-committed by the app's write
+coordinator, against a throwaway database
+Created by Chaitanya Eshwar Prasad
+
+Usage: python benchmarks/bench_writes.py [--writers 50] [--writes 40]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INSERT_RISK = '''
+    INSERT INTO risks (title, description, likelihood, impact, mitigation, owner, created_by)
+    VALUES (?, 'Synthetic row for the write benchmark', 3, 3, 'Review quarterly', 'bench', 'bench')
+'''
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(writers, writes, write_one):
+    """Start all writers together; returns (elapsed, latencies, errors)"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(writers + 1)
+
+    def worker(number):
+        start_gate.wait()
+        for i in range(writes):
+            start = time.perf_counter()
+            try:
+                write_one(f'Benchmark risk {number}-{i}')
+            except sqlite3.Error as failure:
+                with lock:
+                    errors.append(failure)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(writers)]
+    for thread in threads:
+        thread.start()
+    start_gate.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--writers', type=int, default=50, help='Concurrent writing threads')
+    parser.add_argument('--writes', type=int, default=40, help='Writes per thread')
+    parser.add_argument('--busy-timeout-ms', type=int, default=5000)
+    args = parser.parse_args()
+
+    # The app keeps its database under the working directory
+    workdir = tempfile.mkdtemp(prefix='acep-bench-')
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    import app as app_module
+    from db import ConnectionPool
+
+    app_module.init_database()
+    # One connection per writer, as if each were its own worker process
+    direct_pool = ConnectionPool(app_module.DATABASE, size=args.writers, busy_timeout_ms=args.busy_timeout_ms)
+
+    def direct(title):
+        conn = direct_pool.acquire()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(INSERT_RISK, (title,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def coordinated(title):
+        app_module.db_writer.execute(INSERT_RISK, (title,))
+
+    try:
+        print(f'{args.writers} writers x {args.writes} writes')
+        for label, write_one in (('own transaction', direct), ('write coordinator', coordinated)):
+            elapsed, latencies, errors = run(args.writers, args.writes, write_one)
+            print(f'{label:18} {len(latencies) / elapsed:8.0f} writes/s  '
+                  f'p50 {percentile(latencies, 0.50) * 1000:7.1f} ms  '
+                  f'p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  '
+                  f'errors {len(errors)}')
+        stats = app_module.db_writer.stats()
+        print(f"coordinator: {stats['intents']} intents in {stats['batches']} commits "
+              f"(largest batch {stats['largest_batch']})")
+    finally:
+        direct_pool.close_all()
+        app_module.db_pool.close_all()
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+ACEP HIPAA Audit Assistant - Synthetic data generator
+Fills all six tables (users, requirements, evidence, risks, PHI types and
+Business Associates) with realistic volumes, writing dummy evidence files
+into the blob store, so routes can be measured at production scale
+Created by Chaitanya Eshwar Prasad
+
+Usage: python benchmarks/seed.py --workdir DIR [--evidence 100000] [--risks 50000] [--files 2000]
+
+DIR is the directory the app runs from: the database goes to DIR/database and
+the evidence files to DIR/instance/evidence, as for a normal deployment.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import evidence_store
+import extraction
+
+WORDS = ('access audit backup breach cloud contract disposal email encryption firewall laptop '
+         'logging malware mobile network password patch phishing policy portal retention '
+         'server shredding training transmission vendor workstation').split()
+
+REQUIREMENT_STATUSES = ('Compliant', 'Not Compliant', 'Partially Compliant', 'Not Applicable', 'Not Assessed')
+RISK_STATUSES = ('Open', 'In Progress', 'Closed')
+PHI_CLASSIFICATIONS = ('High', 'Medium', 'Low')
+CONTRACT_STATUSES = ('Active', 'Pending', 'Terminated')
+COMPLIANCE_STATUSES = ('Compliant', 'Non-Compliant', 'Under Review', 'Not Assessed')
+EVIDENCE_NAMES = ('access-review', 'training-roster', 'risk-assessment', 'backup-log', 'baa-signed',
+                  'incident-report', 'policy', 'firewall-config', 'audit-log-export', 'disposal-certificate')
+
+DEFAULT_COUNTS = {
+    'users': 50,
+    'evidence': 100000,
+    'risks': 50000,
+    'phi_types': 2000,
+    'business_associates': 5000,
+}
+DEFAULT_FILES = 2000  # distinct evidence blobs; rows beyond this share content, as duplicates do
+BATCH_SIZE = 5000  # rows per executemany
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def timestamp(rng, now, days):
+    """A moment within the last `days` days, in SQLite's CURRENT_TIMESTAMP format"""
+    return (now - timedelta(seconds=rng.randint(0, days * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def insert_batches(conn, sql, rows):
+    """executemany in BATCH_SIZE slices of a row generator; returns the row count"""
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            conn.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def write_blobs(upload_folder, files, rng):
+    """Dummy text and CSV evidence files (1-64 KB) registered in the blob store"""
+    blobs = []
+    for number in range(files):
+        extension = 'csv' if number % 3 == 0 else 'txt'
+        if extension == 'csv':
+            lines = ['date,user,action,resource'] + [
+                f'2024-{rng.randint(1, 12):02}-{rng.randint(1, 28):02},user{rng.randint(1, 200)},'
+                f'{rng.choice(WORDS)},{rng.choice(WORDS)}' for _ in range(rng.randint(30, 2000))]
+        else:
+            lines = [sentence(rng, 12) for _ in range(rng.randint(10, 600))]
+        data = ('\n'.join(lines) + '\n').encode()
+        digest = hashlib.sha256(data).hexdigest()
+
+        path = evidence_store.blob_path(upload_folder, digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        blobs.append((digest, path, len(data), extension))
+    return blobs
+
+
+def seed(conn, upload_folder, counts=None, files=DEFAULT_FILES, seed_value=42):
+    """Add synthetic rows to every table; returns {table: rows added}"""
+    counts = dict(DEFAULT_COUNTS, **(counts or {}))
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    added = {}
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Users share one password hash: hashing each one would dominate the run
+        password_hash = generate_password_hash('bench123')
+        usernames = [f'auditor{number}' for number in range(counts['users'])]
+        added['users'] = insert_batches(conn, '''
+            INSERT OR IGNORE INTO users (username, password_hash, email) VALUES (?, ?, ?)
+        ''', ((name, password_hash, f'{name}@example.com') for name in usernames))
+        usernames = usernames or ['acep']
+
+        # The requirement catalog is fixed; give every requirement an assessment
+        requirement_ids = [row[0] for row in conn.execute('SELECT requirement_id FROM hipaa_requirements')]
+        added['hipaa_requirements'] = insert_batches(conn, '''
+            UPDATE hipaa_requirements
+            SET status = ?, notes = ?, assessed_by = ?, assessed_at = ?, updated_at = ?
+            WHERE requirement_id = ?
+        ''', ((rng.choice(REQUIREMENT_STATUSES), sentence(rng, 15), rng.choice(usernames),
+               timestamp(rng, now, 365), timestamp(rng, now, 30), requirement_id)
+              for requirement_id in requirement_ids))
+
+        blobs = write_blobs(upload_folder, min(files, counts['evidence']), rng) if counts['evidence'] else []
+        references = [0] * len(blobs)
+
+        def evidence_rows():
+            for number in range(counts['evidence']):
+                index = number % len(blobs)
+                references[index] += 1
+                digest, path, size, extension = blobs[index]
+                name = f'{rng.choice(EVIDENCE_NAMES)}-{number}.{extension}'
+                yield (rng.choice(requirement_ids), digest, name, path, size, sentence(rng, 10),
+                       rng.choice(usernames), timestamp(rng, now, 730), digest)
+
+        added['evidence'] = insert_batches(conn, '''
+            INSERT INTO evidence (requirement_id, filename, original_filename, file_path, file_size, description,
+                                  uploaded_by, uploaded_at, blob_sha256)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', evidence_rows())
+        conn.executemany('''
+            INSERT INTO evidence_blobs (sha256, file_path, file_size, ref_count) VALUES (?, ?, ?, ?)
+            ON CONFLICT(sha256) DO UPDATE SET ref_count = ref_count + excluded.ref_count
+        ''', [(digest, path, size, references[index]) for index, (digest, path, size, _) in enumerate(blobs)])
+        for digest, _, _, _ in blobs:
+            extraction.queue_blob(conn, digest)
+
+        def risk_rows():
+            for _ in range(counts['risks']):
+                created = timestamp(rng, now, 730)
+                yield (sentence(rng, 5), sentence(rng, 25), rng.randint(1, 5), rng.randint(1, 5), sentence(rng, 15),
+                       rng.choice(usernames), rng.choice(RISK_STATUSES), rng.choice(usernames), created, created)
+
+        added['risks'] = insert_batches(conn, '''
+            INSERT INTO risks (title, description, likelihood, impact, mitigation, owner, status, created_by,
+                               created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', risk_rows())
+
+        def phi_rows():
+            for _ in range(counts['phi_types']):
+                created = timestamp(rng, now, 730)
+                yield (sentence(rng, 3), sentence(rng, 20), rng.choice(PHI_CLASSIFICATIONS), sentence(rng, 10),
+                       sentence(rng, 10), created, created)
+
+        added['phi_tracking'] = insert_batches(conn, '''
+            INSERT INTO phi_tracking (phi_type, description, classification, access_patterns, disposal_procedures,
+                                      created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', phi_rows())
+
+        def business_associate_rows():
+            for number in range(counts['business_associates']):
+                created = timestamp(rng, now, 730)
+                last = (now - timedelta(days=rng.randint(0, 400))).strftime('%Y-%m-%d')
+                upcoming = (now + timedelta(days=rng.randint(-60, 365))).strftime('%Y-%m-%d')
+                yield (f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {number}', sentence(rng, 2),
+                       f'vendor{number}@example.com', f'555-{number % 10000:04}', rng.choice(CONTRACT_STATUSES),
+                       rng.choice(COMPLIANCE_STATUSES), last, upcoming, created, created)
+
+        added['business_associates'] = insert_batches(conn, '''
+            INSERT INTO business_associates (name, contact_person, email, phone, contract_status, compliance_status,
+                                             last_assessment_date, next_assessment_date, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', business_associate_rows())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    added['files'] = len(blobs)
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--workdir', required=True, help='Directory the app runs from')
+    for table, count in DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{table.replace('_', '-')}", type=int, default=count)
+    parser.add_argument('--files', type=int, default=DEFAULT_FILES, help='Distinct evidence files to write')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # The app keeps its database and uploads under the working directory
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+    import app as app_module
+
+    app_module.init_database()
+    conn = app_module.db_pool.acquire()
+    try:
+        start = time.perf_counter()
+        # Absolute file paths, so the files are found whatever the app's root path
+        added = seed(conn, os.path.abspath(app_module.app.config['UPLOAD_FOLDER']),
+                     {table: getattr(args, table) for table in DEFAULT_COUNTS}, args.files, args.seed)
+        elapsed = time.perf_counter() - start
+    finally:
+        conn.close()
+        app_module.db_pool.close_all()
+
+    for table, count in added.items():
+        print(f'{table:20} {count:>9}')
+    print(f'seeded in {elapsed:.1f}s; run `flask --app app extract-evidence` there to index the file contents')
+
+
+if __name__ == '__main__':
+    main()
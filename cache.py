@@ -0,0 +1,92 @@
+"""
+ACEP HIPAA Audit Assistant - Response cache
+In-process cache for the read-only JSON APIs, keyed by a data-generation
+counter that write routes bump, with strong ETags for 304 revalidation
+Created by Chaitanya Eshwar Prasad
+"""
+
+import hashlib
+import os
+import threading
+
+
+class DataGeneration:
+    """Monotonic counter of data changes seen by this worker"""
+
+    def __init__(self, database):
+        self.database = database
+        self._lock = threading.Lock()
+        self._value = 0
+        self._fingerprint = self._probe()
+
+    def _probe(self):
+        """Cheap stat() fingerprint of the database and its WAL file"""
+        fingerprint = []
+        for path in (self.database, self.database + '-wal'):
+            try:
+                st = os.stat(path)
+                fingerprint.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                fingerprint.append(None)
+        return tuple(fingerprint)
+
+    def bump(self):
+        """Record a write made by this worker"""
+        with self._lock:
+            self._value += 1
+            self._fingerprint = self._probe()
+            return self._value
+
+    def current(self):
+        """Current generation, advanced if another worker wrote to the database"""
+        fingerprint = self._probe()
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._value += 1
+                self._fingerprint = fingerprint
+            return self._value
+
+
+class ResponseCache:
+    """Cached response bodies, valid only for the generation they were built at"""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._counters = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+    @staticmethod
+    def make_etag(body):
+        """Strong ETag derived from the response body"""
+        return hashlib.sha256(body).hexdigest()[:32]
+
+    def get(self, key, generation):
+        """Return the (etag, body, mimetype) entry for key if still current"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._counters['hits'] += 1
+                return entry[1:]
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, key, generation, body, mimetype):
+        """Store a freshly built response body"""
+        etag = self.make_etag(body)
+        with self._lock:
+            self._entries[key] = (generation, etag, body, mimetype)
+        return etag
+
+    def count_not_modified(self):
+        """Count a 304 answered from cache"""
+        with self._lock:
+            self._counters['not_modified'] += 1
+
+    def stats(self):
+        """Cache counters for the debug endpoint"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        stats['generation'] = self.generation.current()
+        return stats
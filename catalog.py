@@ -0,0 +1,123 @@
+"""
+ACEP HIPAA Audit Assistant - Requirement catalog
+The HIPAA requirement list ships as a versioned data file. Its content hash is
+stored in the database, so a worker only syncs the catalog after it changes,
+and a sync upserts just the requirements that differ
+Created by Chaitanya Eshwar Prasad
+"""
+
+import hashlib
+import json
+import os
+
+CATALOG_NAME = 'hipaa_requirements'
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'hipaa_requirements.json')
+
+# Catalog columns, all required; status, notes and the assessment columns belong to the auditors
+FIELDS = ('requirement_id', 'title', 'description', 'category')
+
+
+def install_catalog_state(conn):
+    """Version and content hash of the catalog last synced into the database"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_state (
+            catalog TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def content_hash(path=CATALOG_PATH):
+    """SHA-256 of the catalog file; cheap enough to check on every start"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_catalog(path=CATALOG_PATH):
+    """Read and validate a catalog file: {'catalog', 'version', 'content_hash', 'requirements'}"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    document = json.loads(data)
+    if document.get('catalog') != CATALOG_NAME:
+        raise ValueError(f"{path}: not a {CATALOG_NAME} catalog")
+
+    requirements = []
+    seen = set()
+    for number, item in enumerate(document['requirements'], 1):
+        missing = [field for field in FIELDS if not item.get(field)]
+        if missing:
+            raise ValueError(f"{path}: requirement {number} has no {', '.join(missing)}")
+        if item['requirement_id'] in seen:
+            raise ValueError(f"{path}: requirement {item['requirement_id']} is listed twice")
+        seen.add(item['requirement_id'])
+        requirements.append(tuple(item[field] for field in FIELDS))
+
+    return {
+        'catalog': CATALOG_NAME,
+        'version': document['version'],
+        'content_hash': hashlib.sha256(data).hexdigest(),
+        'requirements': requirements,
+    }
+
+
+def synced_hash(conn):
+    """Content hash of the catalog file last synced, or None"""
+    row = conn.execute('SELECT content_hash FROM catalog_state WHERE catalog = ?', (CATALOG_NAME,)).fetchone()
+    return row[0] if row else None
+
+
+def apply_catalog(conn, catalog):
+    """Upsert the requirements that differ from the catalog, in the caller's transaction
+
+    Assessments (status, notes, assessed_by, assessed_at) are never touched.
+    Requirements no longer in the catalog are kept, with their evidence, and
+    reported as retired. Returns {'version', 'added', 'updated', 'retired'}.
+    """
+    current = {row[0]: tuple(row) for row in conn.execute(
+        'SELECT requirement_id, title, description, category FROM hipaa_requirements')}
+    changed = [row for row in catalog['requirements'] if current.get(row[0]) != row]
+    if changed:
+        conn.executemany('''
+            INSERT INTO hipaa_requirements (requirement_id, title, description, category)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(requirement_id) DO UPDATE SET
+                title = excluded.title,
+                description = excluded.description,
+                category = excluded.category,
+                updated_at = CURRENT_TIMESTAMP
+        ''', changed)
+    conn.execute('''
+        INSERT INTO catalog_state (catalog, version, content_hash) VALUES (?, ?, ?)
+        ON CONFLICT(catalog) DO UPDATE SET
+            version = excluded.version,
+            content_hash = excluded.content_hash,
+            synced_at = CURRENT_TIMESTAMP
+    ''', (catalog['catalog'], catalog['version'], catalog['content_hash']))
+
+    added = sum(1 for row in changed if row[0] not in current)
+    listed = {row[0] for row in catalog['requirements']}
+    return {
+        'version': catalog['version'],
+        'added': added,
+        'updated': len(changed) - added,
+        'retired': sorted(requirement_id for requirement_id in current if requirement_id not in listed),
+    }
+
+
+def sync_catalog(conn, catalog):
+    """Apply the catalog in its own transaction unless it is already synced; returns apply_catalog's report or None"""
+    # The write lock makes concurrent workers wait here, then find the
+    # catalog already synced by whoever got the lock first.
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if synced_hash(conn) == catalog['content_hash']:
+            conn.rollback()
+            return None
+        report = apply_catalog(conn, catalog)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return report
@@ -0,0 +1,173 @@
+"""
+ACEP HIPAA Audit Assistant - Database connection pool
+Pooled SQLite connections with WAL mode and tuned pragmas
+Created by Chaitanya Eshwar Prasad
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from metrics import TimedCursor
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that goes back to its pool instead of closing"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.checked_out = False
+        # Connections bound to a Flask request are released at teardown,
+        # so the close() calls inside route handlers become no-ops.
+        self.request_bound = False
+
+    # Every statement goes through a TimedCursor, so metrics see all queries
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        """Return the connection to its pool (or close it if unpooled)"""
+        if self.request_bound:
+            return
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def discard(self):
+        """Close the underlying SQLite handle for good"""
+        sqlite3.Connection.close(self)
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by all threads of a worker"""
+
+    def __init__(self, database, size=10, timeout=30.0, busy_timeout_ms=5000,
+                 cache_size_kb=16384, mmap_size=64 * 1024 * 1024):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = [
+            ('journal_mode', 'WAL'),
+            ('synchronous', 'NORMAL'),
+            ('busy_timeout', int(busy_timeout_ms)),
+            # Negative cache_size is interpreted by SQLite as KiB
+            ('cache_size', -int(cache_size_kb)),
+            ('mmap_size', int(mmap_size)),
+        ]
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()
+        self._open = 0
+        self._pid = os.getpid()
+        self._counters = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0, 'wait_seconds': 0.0}
+
+    def _connect(self):
+        """Open a new connection and apply the pool pragmas"""
+        conn = sqlite3.connect(self.database, factory=PooledConnection,
+                               timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f'PRAGMA {name} = {value}')
+        conn.pool = self
+        return conn
+
+    def _reset_after_fork(self):
+        """Forget connections inherited from a parent process"""
+        # SQLite handles must never be shared across fork(); drop them
+        # without closing so the parent's file locks are left untouched.
+        self._idle.clear()
+        self._open = 0
+        self._pid = os.getpid()
+
+    def acquire(self):
+        """Check a connection out of the pool, waiting if it is exhausted"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+
+            waited = False
+            deadline = time.monotonic() + self.timeout
+            wait_started = time.monotonic()
+            while not self._idle and self._open >= self.size:
+                waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout('Timed out waiting for a database connection')
+                self._available.wait(remaining)
+
+            if waited:
+                self._counters['waits'] += 1
+                self._counters['wait_seconds'] += time.monotonic() - wait_started
+
+            if self._idle:
+                conn = self._idle.pop()
+                self._counters['hits'] += 1
+                conn.checked_out = True
+                return conn
+
+            self._open += 1
+            self._counters['misses'] += 1
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._available.notify()
+            raise
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back unfinished work"""
+        if not conn.checked_out:
+            return
+        conn.checked_out = False
+        conn.request_bound = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.discard()
+            with self._lock:
+                self._open -= 1
+                self._available.notify()
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(conn)
+            self._available.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)"""
+        with self._lock:
+            while self._idle:
+                self._idle.pop().discard()
+                self._open -= 1
+
+    def stats(self):
+        """Pool counters for the debug endpoint"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['wait_seconds'] = round(stats['wait_seconds'], 4)
+            stats.update({'size': self.size, 'open': self._open,
+                          'idle': len(self._idle), 'in_use': self._open - len(self._idle)})
+        return stats
@@ -0,0 +1,109 @@
+"""
+ACEP HIPAA Audit Assistant - Change notifications
+Wakes Server-Sent Events subscribers when the audit data changes and builds
+the coalesced statistics events pushed to the dashboard
+Created by Chaitanya Eshwar Prasad
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+
+class TooManySubscribers(Exception):
+    """Raised when a worker already serves its maximum number of streams"""
+
+
+class ChangeNotifier:
+    """Wakes stream subscribers when the data generation moves
+
+    Writes made by this worker call publish() and wake subscribers at once.
+    Writes made by other workers are noticed through the generation's file
+    fingerprint, checked every poll_interval seconds (0 disables polling).
+    """
+
+    def __init__(self, generation, max_subscribers=50, poll_interval=2.0):
+        self.generation = generation
+        self.max_subscribers = max_subscribers
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        self._published = 0
+        self._subscribers = 0
+
+    def publish(self):
+        """Wake every subscriber after a write in this worker"""
+        with self._condition:
+            self._published += 1
+            self._condition.notify_all()
+
+    def subscribe(self):
+        """Reserve a stream slot, or raise TooManySubscribers"""
+        with self._condition:
+            if self._subscribers >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._subscribers += 1
+
+    def unsubscribe(self):
+        """Release a stream slot"""
+        with self._condition:
+            self._subscribers -= 1
+
+    def wait(self, seen_generation, timeout):
+        """Block until the generation moves past seen_generation or timeout passes
+
+        Returns the current generation; equal to seen_generation on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            # Note the publish counter first so a publish racing the check still wakes us
+            with self._condition:
+                published = self._published
+            current = self.generation.current()
+            if current != seen_generation:
+                return current
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return current
+            step = min(remaining, self.poll_interval) if self.poll_interval else remaining
+            with self._condition:
+                self._condition.wait_for(lambda: self._published != published, step)
+
+    def stats(self):
+        """Notifier counters for the debug endpoint"""
+        with self._condition:
+            return {
+                'subscribers': self._subscribers,
+                'max_subscribers': self.max_subscribers,
+                'published': self._published,
+            }
+
+
+def flatten_stats(summary):
+    """Dotted 'section.key' map of a read_rollup() summary"""
+    return {f'{section}.{key}': value
+            for section, values in summary.items()
+            for key, value in values.items()}
+
+
+def snapshot_id(values):
+    """Event id identifying a statistics snapshot across workers and restarts"""
+    encoded = json.dumps(values, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def stats_delta(previous, current):
+    """Change of every statistic that moved between two snapshots"""
+    return {key: round(value - previous.get(key, 0), 1)
+            for key, value in current.items() if previous.get(key) != value}
+
+
+def format_event(event, data, event_id=None):
+    """One text/event-stream message"""
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, sort_keys=True)}')
+    return '\n'.join(lines) + '\n\n'
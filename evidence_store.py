@@ -0,0 +1,148 @@
+"""
+ACEP HIPAA Audit Assistant - Evidence blob store
+Content-addressed storage for uploaded evidence: each distinct file is kept
+once under its SHA-256 and shared by every evidence row that references it
+Created by Chaitanya Eshwar Prasad
+"""
+
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+# Relative to the app root. Evidence must stay outside static/, where Flask
+# would serve it to anyone; it is only sent by the login-protected routes.
+DEFAULT_FOLDER = os.path.join('instance', 'evidence')
+LEGACY_FOLDER = os.path.join('static', 'uploads')  # where uploads lived before
+
+
+def blob_path(upload_folder, digest):
+    """Location of a blob inside the upload folder (fanned out by prefix)"""
+    return os.path.join(upload_folder, 'blobs', digest[:2], digest)
+
+
+def stream_to_temp(stream, upload_folder, root_path=''):
+    """Copy an upload stream to a temp file in chunks while hashing it"""
+    temp_dir = os.path.join(root_path, upload_folder, 'blobs', 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, prefix='upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path, sha256.hexdigest(), size
+
+
+def hash_file(path):
+    """SHA-256 and size of a file already on disk"""
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+            size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+def store_blob(conn, upload_folder, temp_path, digest, size, root_path=''):
+    """Add a reference to a blob, moving the temp file into place if it is new
+
+    Must run inside a write transaction (BEGIN IMMEDIATE) so the
+    reference count and the file on disk change together. Stored paths are
+    relative to root_path, like upload_folder.
+    """
+    row = conn.execute('SELECT file_path FROM evidence_blobs WHERE sha256 = ?', (digest,)).fetchone()
+    if row is not None and os.path.exists(os.path.join(root_path, row['file_path'])):
+        # Duplicate content: one reference more, nothing new on disk
+        os.remove(temp_path)
+        conn.execute('UPDATE evidence_blobs SET ref_count = ref_count + 1 WHERE sha256 = ?', (digest,))
+        return row['file_path']
+
+    path = blob_path(upload_folder, digest)
+    os.makedirs(os.path.dirname(os.path.join(root_path, path)), exist_ok=True)
+    os.replace(temp_path, os.path.join(root_path, path))
+    conn.execute('''
+        INSERT INTO evidence_blobs (sha256, file_path, file_size, ref_count)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT(sha256) DO UPDATE SET file_path = excluded.file_path, ref_count = ref_count + 1
+    ''', (digest, path, size))
+    return path
+
+
+def release_blob(conn, digest):
+    """Drop a reference to a blob; returns the blob's file path when that was the last one
+
+    Must run inside a write transaction. The file is left on disk: until the
+    transaction commits it may still be rolled back, so the caller removes it
+    afterwards with remove_unreferenced().
+    """
+    row = conn.execute('SELECT file_path, ref_count FROM evidence_blobs WHERE sha256 = ?', (digest,)).fetchone()
+    if row is None:
+        return None
+
+    if row['ref_count'] > 1:
+        conn.execute('UPDATE evidence_blobs SET ref_count = ref_count - 1 WHERE sha256 = ?', (digest,))
+        return None
+
+    conn.execute('DELETE FROM evidence_blobs WHERE sha256 = ?', (digest,))
+    return row['file_path']
+
+
+def remove_unreferenced(conn, digest, file_path, root_path=''):
+    """Delete a released blob's file unless the same content was stored again since
+
+    Must run in a write transaction committed after the release, so no
+    upload of the same content can re-register the file in between.
+    """
+    if conn.execute('SELECT 1 FROM evidence_blobs WHERE sha256 = ?', (digest,)).fetchone() is not None:
+        return False
+    try:
+        os.remove(os.path.join(root_path, file_path))
+    except OSError:
+        pass
+    return True
+
+
+def relocate(conn, old_folder, new_folder, root_path=''):
+    """Move stored evidence files (and anything else) from old_folder to new_folder; returns the files moved
+
+    Rows are repointed only at files that exist in the new place, so after
+    an interrupted run, running again finishes the job.
+    """
+    old_root = os.path.join(root_path, old_folder)
+    moved = 0
+    for table, key in (('evidence', 'id'), ('evidence_blobs', 'sha256')):
+        rows = conn.execute(f'SELECT {key}, file_path FROM {table} WHERE file_path LIKE ?',
+                            (os.path.join(old_folder, '%'),)).fetchall()
+        for row in rows:
+            path = os.path.join(new_folder, os.path.relpath(row['file_path'], old_folder))
+            source, target = os.path.join(root_path, row['file_path']), os.path.join(root_path, path)
+            if os.path.isfile(source) and not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(source, target)
+                moved += 1
+            if os.path.isfile(target):
+                conn.execute(f'UPDATE {table} SET file_path = ? WHERE {key} = ?', (path, row[key]))
+
+    # Previews, upload temp files and files no row refers to
+    for directory, _, names in os.walk(old_root):
+        for name in names:
+            source = os.path.join(directory, name)
+            target = os.path.join(root_path, new_folder, os.path.relpath(source, old_root))
+            if name != '.gitkeep' and not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(source, target)
+                moved += 1
+    return moved
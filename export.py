@@ -0,0 +1,146 @@
+"""
+ACEP HIPAA Audit Assistant - Bulk export
+Streams whole audit tables as CSV or NDJSON straight off a database cursor,
+optionally limited to rows changed since a timestamp, in constant memory;
+deletions are recorded as tombstones so incremental pulls can see them too
+Created by Chaitanya Eshwar Prasad
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+FETCH_SIZE = 500
+TOMBSTONES = 'export_tombstones'
+
+
+class ExportSpec:
+    """Columns of one exportable table and the column stamping its changes"""
+
+    def __init__(self, table, columns, changed_column):
+        self.table = table
+        self.columns = columns
+        self.changed_column = changed_column
+
+
+EXPORTS = {
+    'hipaa_requirements': ExportSpec(
+        'hipaa_requirements',
+        ['id', 'requirement_id', 'title', 'description', 'category', 'status', 'notes',
+         'assessed_by', 'assessed_at', 'updated_at'],
+        'updated_at',
+    ),
+    # Evidence rows are never edited, only added or deleted; the files stay behind the download route
+    'evidence': ExportSpec(
+        'evidence',
+        ['id', 'requirement_id', 'original_filename', 'file_size', 'description', 'blob_sha256',
+         'uploaded_by', 'uploaded_at'],
+        'uploaded_at',
+    ),
+    'risks': ExportSpec(
+        'risks',
+        ['id', 'title', 'description', 'likelihood', 'impact', 'risk_score', 'mitigation', 'owner',
+         'status', 'created_by', 'created_at', 'updated_at'],
+        'updated_at',
+    ),
+    'phi_tracking': ExportSpec(
+        'phi_tracking',
+        ['id', 'phi_type', 'description', 'classification', 'access_patterns', 'disposal_procedures',
+         'created_at', 'updated_at'],
+        'updated_at',
+    ),
+    'business_associates': ExportSpec(
+        'business_associates',
+        ['id', 'name', 'contact_person', 'email', 'phone', 'contract_status', 'compliance_status',
+         'last_assessment_date', 'next_assessment_date', 'created_at', 'updated_at'],
+        'updated_at',
+    ),
+    # One row per deleted record of the tables above, so updated_since pulls see deletions
+    'deletions': ExportSpec(
+        TOMBSTONES,
+        ['id', 'table_name', 'row_id', 'deleted_at'],
+        'deleted_at',
+    ),
+}
+
+
+def install_tombstones(conn):
+    """Tombstone table filled by a delete trigger on every exported table"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TOMBSTONES} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_tombstones_deleted ON {TOMBSTONES} (deleted_at)')
+    for spec in EXPORTS.values():
+        if spec.table == TOMBSTONES:
+            continue
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {spec.table}_tombstone
+            AFTER DELETE ON {spec.table}
+            BEGIN
+                INSERT INTO {TOMBSTONES} (table_name, row_id) VALUES ('{spec.table}', OLD.id);
+            END
+        ''')
+
+
+def parse_since(value):
+    """Normalise an updated_since value to SQLite's CURRENT_TIMESTAMP format (UTC)
+
+    Accepts an ISO 8601 date or date-time; raises ValueError otherwise.
+    """
+    moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def iter_rows(conn, spec, since=None):
+    """Rows of a table in change order, read from the cursor in batches"""
+    sql = f'SELECT {", ".join(spec.columns)} FROM {spec.table}'
+    params = []
+    if since:
+        sql += f' WHERE {spec.changed_column} >= ?'
+        params.append(since)
+    sql += f' ORDER BY {spec.changed_column}, id'
+
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def csv_stream(columns, batches):
+    """CSV text, one chunk per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def ndjson_stream(columns, batches):
+    """Newline-delimited JSON, one object per row and one chunk per batch"""
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+
+
+# format name -> (stream function, mimetype, file extension)
+FORMATS = {
+    'csv': (csv_stream, 'text/csv', 'csv'),
+    'ndjson': (ndjson_stream, 'application/x-ndjson', 'ndjson'),
+}
@@ -0,0 +1,374 @@
+"""
+ACEP HIPAA Audit Assistant - Evidence text extraction
+Background worker pool that pulls searchable text out of uploaded evidence
+(plain text, CSV, and the XML inside docx/xlsx/pptx) without blocking uploads
+Created by Chaitanya Eshwar Prasad
+"""
+
+import io
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+MAX_TEXT_CHARS = 1000000  # text kept per blob for the search index
+MAX_XML_BYTES = 32 * 1024 * 1024  # uncompressed XML read per document (zip bomb guard)
+SNIFF_BYTES = 8192
+MAX_CONTROL_RATIO = 0.01  # share of control characters beyond which Latin-1 "text" is binary
+STALE_RUNNING_SECONDS = 600  # a 'running' job older than this was orphaned by a crash
+
+# Office Open XML parts holding the document text, in reading order
+OFFICE_PARTS = [
+    ('docx', re.compile(r'^word/(document|footnotes|endnotes|header\d*|footer\d*)\.xml$')),
+    ('xlsx', re.compile(r'^xl/(sharedStrings|worksheets/sheet\d+)\.xml$')),
+    ('pptx', re.compile(r'^ppt/(slides/slide\d+|notesSlides/notesSlide\d+)\.xml$')),
+]
+
+# Formats with no plain text to index: PDF, images, OLE2 (.doc/.xls/.msg), archives, media
+BINARY_SIGNATURES = (b'%PDF', b'\x89PNG', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'II*\x00', b'MM\x00*',
+                     b'RIFF', b'\xd0\xcf\x11\xe0', b'\x1f\x8b', b'\xfd7zXZ', b'7z\xbc\xaf', b'Rar!',
+                     b'\x7fELF', b'OggS', b'fLaC')
+# Magic that is printable ASCII on its own ("ID3 ...", "BZh..." can start a text file), checked in full:
+# MP3 tag (ID3 + version byte) and bzip2 (BZh + block size + block magic)
+BINARY_MAGIC = re.compile(rb'ID3[\x00-\x04]|BZh[1-9]1AY&SY')
+_CONTROL = re.compile(rb'[\x00-\x08\x0b\x0e-\x1f\x7f]')
+
+# Element local names: text runs, line breaks (paragraphs, rows, shared strings) and cell gaps
+TEXT_ELEMENTS = {'t'}
+LINE_ELEMENTS = {'p', 'row', 'si', 'br'}
+SPACE_ELEMENTS = {'tab', 'tc'}
+
+
+class UnsupportedFormat(Exception):
+    """Evidence that holds no extractable text (images, PDFs, other binaries)"""
+
+
+def _natural_key(name):
+    """Sort key putting slide2.xml before slide10.xml"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def _local_name(element):
+    """Tag without its XML namespace"""
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _xml_text(data):
+    """Text content of an Office XML part, one line per paragraph or sheet row"""
+    pieces = []
+    for _, element in ElementTree.iterparse(io.BytesIO(data)):
+        name = _local_name(element)
+        if name in TEXT_ELEMENTS:
+            if element.text:
+                pieces.append(element.text)
+        elif name == 'c':
+            # Spreadsheet cell: literal values live in <v>; shared-string cells only hold an index
+            if element.get('t') not in ('s', 'inlineStr'):
+                pieces.extend(child.text for child in element if _local_name(child) == 'v' and child.text)
+            pieces.append(' ')
+        elif name in SPACE_ELEMENTS:
+            pieces.append(' ')
+        elif name in LINE_ELEMENTS:
+            pieces.append('\n')
+            element.clear()
+    return ''.join(pieces)
+
+
+def _office_text(path):
+    """Text of a docx/xlsx/pptx document"""
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        for _, pattern in OFFICE_PARTS:
+            parts = sorted((name for name in names if pattern.match(name)), key=_natural_key)
+            if not parts:
+                continue
+
+            texts = []
+            budget = MAX_XML_BYTES
+            for name in parts:
+                info = archive.getinfo(name)
+                if info.file_size > budget:
+                    break
+                budget -= info.file_size
+                texts.append(_xml_text(archive.read(name)))
+            return '\n'.join(texts)
+    raise UnsupportedFormat('zip archive is not a docx, xlsx or pptx document')
+
+
+def _plain_text(path):
+    """Text of a UTF-8 (or Latin-1) text file such as .txt, .log or .csv"""
+    with open(path, 'rb') as f:
+        data = f.read(MAX_TEXT_CHARS * 4)
+    if b'\x00' in data[:SNIFF_BYTES]:
+        raise UnsupportedFormat('binary file')
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as error:
+        # A character cut in two by the read limit is still UTF-8
+        if error.reason == 'unexpected end of data':
+            return data[:error.start].decode('utf-8')
+    # Latin-1 decodes any bytes, so only accept what reads as text
+    sample = data[:SNIFF_BYTES * 8]
+    if len(_CONTROL.findall(sample)) > len(sample) * MAX_CONTROL_RATIO:
+        raise UnsupportedFormat('binary file')
+    return data.decode('latin-1')
+
+
+def extract_text(path):
+    """Searchable text of an evidence file, identified by content rather than name"""
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    if head.startswith(b'PK\x03\x04'):
+        text = _office_text(path)
+    elif head.startswith(BINARY_SIGNATURES) or BINARY_MAGIC.match(head) or head[4:8] == b'ftyp':
+        raise UnsupportedFormat(f'binary file ({head[:8]!r})')
+    else:
+        text = _plain_text(path)
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    return re.sub(r'\n\s*\n+', '\n', text).strip()[:MAX_TEXT_CHARS]
+
+
+def install_extraction_jobs(conn):
+    """Per-blob extraction job and result table"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS evidence_text (
+            blob_sha256 TEXT PRIMARY KEY REFERENCES evidence_blobs (sha256),
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            content TEXT,
+            queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_evidence_text_status ON evidence_text (status)')
+    # Text goes away with the last reference to its blob
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS evidence_text_blob_delete
+        AFTER DELETE ON evidence_blobs
+        BEGIN
+            DELETE FROM evidence_text WHERE blob_sha256 = OLD.sha256;
+        END
+    ''')
+    # Blobs stored before extraction existed wait for the backfill command
+    conn.execute('''
+        INSERT OR IGNORE INTO evidence_text (blob_sha256)
+        SELECT sha256 FROM evidence_blobs
+    ''')
+
+
+def queue_blob(conn, digest):
+    """Record a pending extraction job for a blob (no-op if it already has one)"""
+    conn.execute('INSERT OR IGNORE INTO evidence_text (blob_sha256) VALUES (?)', (digest,))
+
+
+def skip_binary_text(conn, root_path=''):
+    """Mark text extracted from files now recognized as binary skipped, dropping it from the index
+
+    Returns how many blobs were skipped. Extracted text of office documents
+    and real text files is left as it is.
+    """
+    skipped = 0
+    rows = conn.execute('''
+        SELECT t.blob_sha256, b.file_path
+        FROM evidence_text t JOIN evidence_blobs b ON b.sha256 = t.blob_sha256
+        WHERE t.status = 'done'
+    ''').fetchall()
+    for row in rows:
+        path = os.path.join(root_path, row['file_path'])
+        try:
+            with open(path, 'rb') as f:
+                if f.read(4) == b'PK\x03\x04':
+                    continue
+            extract_text(path)
+        except UnsupportedFormat as unsupported:
+            conn.execute('''
+                UPDATE evidence_text SET status = 'skipped', content = NULL, error = ?
+                WHERE blob_sha256 = ?
+            ''', (str(unsupported), row['blob_sha256']))
+            skipped += 1
+        except OSError:
+            continue
+    return skipped
+
+
+def recheck_skipped_text(conn, root_path=''):
+    """Extract blobs skipped as binary that no longer look binary, such as text starting "ID3"
+
+    Returns how many blobs were extracted.
+    """
+    extracted = 0
+    rows = conn.execute('''
+        SELECT t.blob_sha256, b.file_path
+        FROM evidence_text t JOIN evidence_blobs b ON b.sha256 = t.blob_sha256
+        WHERE t.status = 'skipped' AND t.error LIKE 'binary file (%'
+    ''').fetchall()
+    for row in rows:
+        try:
+            text = extract_text(os.path.join(root_path, row['file_path']))
+        except (UnsupportedFormat, OSError):
+            continue
+        conn.execute('''
+            UPDATE evidence_text SET status = 'done', content = ?, error = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE blob_sha256 = ?
+        ''', (text, row['blob_sha256']))
+        extracted += 1
+    return extracted
+
+
+def job_counts(conn):
+    """Number of extraction jobs per status"""
+    return {row['status']: row['count'] for row in conn.execute('''
+        SELECT status, COUNT(*) AS count FROM evidence_text GROUP BY status
+    ''')}
+
+
+class ExtractionPool:
+    """Bounded pool of threads extracting evidence text in the background
+
+    Jobs live in the evidence_text table, so any worker process can claim
+    them and nothing is lost when a process restarts; the in-memory queue
+    only decides what this process works on next.
+    """
+
+    def __init__(self, db_pool, root_path='', workers=2, max_attempts=3, retry_delay=5.0, on_complete=None):
+        self.db_pool = db_pool
+        self.root_path = root_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.on_complete = on_complete
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = set()
+        self._idle = threading.Condition(self._lock)
+        self._counters = {'done': 0, 'skipped': 0, 'failed': 0, 'retried': 0}
+
+    def _get_executor(self):
+        """Start the threads on first use"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='evidence-extract')
+        return self._executor
+
+    def submit(self, digest):
+        """Queue a blob for extraction unless this process is already on it"""
+        with self._lock:
+            if digest in self._in_flight:
+                return False
+            self._in_flight.add(digest)
+            self._get_executor().submit(self._run, digest)
+            return True
+
+    def submit_pending(self, include_failed=False):
+        """Queue every pending (and optionally failed or orphaned) job; returns how many"""
+        statuses = ['pending', 'failed'] if include_failed else ['pending']
+        conn = self.db_pool.acquire()
+        try:
+            if include_failed:
+                conn.execute("UPDATE evidence_text SET attempts = 0 WHERE status = 'failed'")
+            conn.execute('''
+                UPDATE evidence_text SET status = 'pending'
+                WHERE status = 'running' AND started_at < datetime('now', ?)
+            ''', (f'-{STALE_RUNNING_SECONDS} seconds',))
+            conn.commit()
+            placeholders = ', '.join('?' for _ in statuses)
+            digests = [row[0] for row in conn.execute(
+                f'SELECT blob_sha256 FROM evidence_text WHERE status IN ({placeholders})', statuses)]
+        finally:
+            conn.close()
+        return sum(1 for digest in digests if self.submit(digest))
+
+    def drain(self, timeout=None):
+        """Wait until this process has no queued or running jobs"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _resubmit(self, digest):
+        """Run a job again; it stayed in flight while waiting for its retry"""
+        with self._lock:
+            self._get_executor().submit(self._run, digest)
+
+    def _finish(self, digest):
+        with self._idle:
+            self._in_flight.discard(digest)
+            self._idle.notify_all()
+
+    def _claim(self, conn, digest):
+        """Mark the job running; None if it is done or another worker has it"""
+        cursor = conn.execute('''
+            UPDATE evidence_text
+            SET status = 'running', attempts = attempts + 1, started_at = CURRENT_TIMESTAMP, error = NULL
+            WHERE blob_sha256 = ? AND status IN ('pending', 'failed') AND attempts < ?
+        ''', (digest, self.max_attempts))
+        conn.commit()
+        if cursor.rowcount == 0:
+            return None
+        return conn.execute('''
+            SELECT t.attempts, b.file_path
+            FROM evidence_text t JOIN evidence_blobs b ON b.sha256 = t.blob_sha256
+            WHERE t.blob_sha256 = ?
+        ''', (digest,)).fetchone()
+
+    def _run(self, digest):
+        """Extract one blob outside any transaction, then store the outcome"""
+        retry = False
+        try:
+            conn = self.db_pool.acquire()
+            try:
+                job = self._claim(conn, digest)
+                if job is None:
+                    return
+
+                status, content, error = 'done', None, None
+                try:
+                    content = extract_text(os.path.join(self.root_path, job['file_path']))
+                except UnsupportedFormat as unsupported:
+                    status, error = 'skipped', str(unsupported)
+                except Exception as failure:
+                    status, error = 'failed', f'{type(failure).__name__}: {failure}'
+                    retry = job['attempts'] < self.max_attempts
+
+                conn.execute('''
+                    UPDATE evidence_text
+                    SET status = ?, content = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+                    WHERE blob_sha256 = ?
+                ''', (status, content, error, digest))
+                conn.commit()
+                with self._lock:
+                    self._counters[status] += 1
+                    if retry:
+                        self._counters['retried'] += 1
+            finally:
+                conn.close()
+
+            if status == 'done' and self.on_complete is not None:
+                self.on_complete()
+        except Exception as failure:
+            print(f'Evidence extraction error for {digest}: {failure}')
+        finally:
+            if retry:
+                # Back off before the next attempt: retry_delay, 2x, 4x ...
+                delay = self.retry_delay * 2 ** (job['attempts'] - 1)
+                timer = threading.Timer(delay, self._resubmit, args=(digest,))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._finish(digest)
+
+    def stats(self):
+        """Pool counters for the debug endpoint"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['workers'] = self.workers
+            stats['in_flight'] = len(self._in_flight)
+        return stats
@@ -0,0 +1,56 @@
+"""
+ACEP HIPAA Audit Assistant - Gunicorn configuration
+Pre-fork serving: the master loads wsgi.py once (migrations, requirement
+catalog, compiled templates) and forks worker processes that each serve
+requests on a pool of threads
+Created by Chaitanya Eshwar Prasad
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:application
+       kill -HUP <master pid>   # graceful reload
+"""
+
+import multiprocessing
+import os
+
+bind = '0.0.0.0:5000'
+
+# The GIL gives a process one core, so one worker per core; threads overlap
+# SQLite and file I/O. Extra workers on the same core only add context
+# switches, and every worker has its own caches and write coordinator.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+
+# Migrate, sync the requirement catalog and compile templates once, before forking
+preload_app = True
+
+timeout = 60  # seconds a silent worker is given before it is restarted
+graceful_timeout = 30  # seconds in-flight requests get to finish on reload or shutdown
+keepalive = 5
+accesslog = '-'
+
+
+def on_reload(server):
+    """kill -HUP: re-sync the requirement catalog and recompile templates before new workers fork
+
+    The master keeps the application code it preloaded; deploying new code
+    takes a restart (or USR2 then QUIT to the old master).
+    """
+    import app as app_module
+    app_module.init_database()
+    app_module.preload()
+
+
+def post_fork(server, worker):
+    """Give each worker its own pools, caches and background threads"""
+    import app as app_module
+    # Each open dashboard stream holds a thread; keep half of them for other requests
+    config = app_module.app.config
+    config['SSE_MAX_SUBSCRIBERS'] = min(config['SSE_MAX_SUBSCRIBERS'], max(1, threads // 2))
+    app_module.init_services()
+
+
+def worker_exit(server, worker):
+    """Commit queued audit entries before the worker goes away"""
+    import app as app_module
+    app_module.audit_trail.flush(graceful_timeout)
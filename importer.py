@@ -0,0 +1,207 @@
+"""
+ACEP HIPAA Audit Assistant - Bulk import
+Validates CSV/JSON rows for the risk register, PHI types and Business
+Associates and inserts them with executemany in one transaction
+Created by Chaitanya Eshwar Prasad
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _text(value):
+    """Free text, stored as given"""
+    return str(value)
+
+
+def _score(value):
+    """Likelihood / impact rating on the 1..5 scale"""
+    if isinstance(value, bool):
+        raise ValueError('must be a whole number from 1 to 5')
+    try:
+        score = int(str(value).strip())
+    except ValueError:
+        raise ValueError('must be a whole number from 1 to 5')
+    if not 1 <= score <= 5:
+        raise ValueError('must be a whole number from 1 to 5')
+    return score
+
+
+def _date(value):
+    """Calendar date in YYYY-MM-DD form"""
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError('must be a date in YYYY-MM-DD form')
+
+
+def _choice(*options):
+    """Validator accepting one of a fixed set of values"""
+    def validate(value):
+        value = str(value).strip()
+        if value not in options:
+            raise ValueError(f"must be one of: {', '.join(options)}")
+        return value
+    return validate
+
+
+class ImportSpec:
+    """Columns accepted for one table: (name, required, validator, default)
+
+    entity_type is the name the audit trail files the table's rows under.
+    """
+
+    def __init__(self, table, entity_type, fields, created_by_column=None):
+        self.table = table
+        self.entity_type = entity_type
+        self.fields = fields
+        self.created_by_column = created_by_column
+
+    def insert_sql(self):
+        """INSERT statement for the accepted columns"""
+        columns = [name for name, _, _, _ in self.fields]
+        if self.created_by_column:
+            columns.append(self.created_by_column)
+        placeholders = ', '.join('?' for _ in columns)
+        return f'INSERT INTO {self.table} ({", ".join(columns)}) VALUES ({placeholders})'
+
+
+IMPORTS = {
+    'risks': ImportSpec('risks', 'risk', [
+        ('title', True, _text, None),
+        ('description', False, _text, None),
+        ('likelihood', True, _score, None),
+        ('impact', True, _score, None),
+        ('mitigation', False, _text, None),
+        ('owner', False, _text, None),
+        ('status', False, _choice('Open', 'In Progress', 'Closed'), 'Open'),
+    ], created_by_column='created_by'),
+    'phi_tracking': ImportSpec('phi_tracking', 'phi', [
+        ('phi_type', True, _text, None),
+        ('description', False, _text, None),
+        ('classification', True, _choice('High', 'Medium', 'Low'), None),
+        ('access_patterns', False, _text, None),
+        ('disposal_procedures', False, _text, None),
+    ]),
+    'business_associates': ImportSpec('business_associates', 'business_associate', [
+        ('name', True, _text, None),
+        ('contact_person', False, _text, None),
+        ('email', False, _text, None),
+        ('phone', False, _text, None),
+        ('contract_status', False, _choice('Active', 'Pending', 'Terminated'), 'Active'),
+        ('compliance_status', False, _choice('Compliant', 'Non-Compliant', 'Under Review', 'Not Assessed'),
+         'Not Assessed'),
+        ('last_assessment_date', False, _date, None),
+        ('next_assessment_date', False, _date, None),
+    ]),
+}
+
+
+def decode_upload(data):
+    """Text of an uploaded file, which must be UTF-8 (a BOM, as Excel writes, is dropped)"""
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError as error:
+        raise ValueError(f'File is not UTF-8 text (invalid byte at position {error.start}); '
+                         'save it as "CSV UTF-8" or UTF-8 JSON') from None
+
+
+def _csv_rows(text):
+    """DictReader rows, with malformed CSV reported as ValueError"""
+    reader = csv.DictReader(io.StringIO(text))
+    try:
+        yield from reader
+    except csv.Error as error:
+        raise ValueError(f'Malformed CSV after line {reader.line_num}: {error}') from None
+
+
+def parse_rows(text, data_format):
+    """Rows (dicts) from CSV or JSON text; JSON may be a list or {"rows": [...]}
+
+    Malformed input raises ValueError, for CSV possibly only once the rows
+    are read (import_rows rolls back then).
+    """
+    if data_format == 'csv':
+        return _csv_rows(text)
+    if data_format == 'json':
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get('rows')
+        if not isinstance(data, list):
+            raise ValueError('JSON must be a list of rows or an object with a "rows" list')
+        return data
+    raise ValueError(f'Unsupported format: {data_format}')
+
+
+def guess_format(filename):
+    """Import format from a file name, defaulting to CSV"""
+    return 'json' if filename and filename.lower().endswith('.json') else 'csv'
+
+
+def validate_row(spec, raw):
+    """Column values for one row in insert order, plus any validation errors"""
+    if not isinstance(raw, dict):
+        return None, ['row must be an object of column values']
+
+    values = []
+    errors = []
+    for name, required, validate, default in spec.fields:
+        value = raw.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            if required:
+                errors.append(f'{name} is required')
+            values.append(default)
+            continue
+        try:
+            values.append(validate(value))
+        except ValueError as error:
+            errors.append(f'{name} {error}')
+    return values, errors
+
+
+def import_rows(conn, spec, rows, batch_size=DEFAULT_BATCH_SIZE, created_by=None, strict=False):
+    """Validate and insert rows in one transaction, batch_size rows per executemany
+
+    Invalid rows are skipped and listed in the report; with strict=True a
+    single invalid row rolls back the whole import.
+    """
+    report = {'table': spec.table, 'received': 0, 'inserted': 0, 'errors': []}
+    sql = spec.insert_sql()
+    batch = []
+    inserted = 0
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for number, raw in enumerate(rows, start=1):
+            report['received'] += 1
+            values, errors = validate_row(spec, raw)
+            if errors:
+                report['errors'].append({'row': number, 'errors': errors})
+                continue
+            if spec.created_by_column:
+                values.append(created_by)
+            batch.append(values)
+            if len(batch) >= batch_size:
+                conn.executemany(sql, batch)
+                inserted += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(sql, batch)
+            inserted += len(batch)
+
+        if strict and report['errors']:
+            conn.rollback()
+            return report
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    report['inserted'] = inserted
+    return report
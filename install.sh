@@ -206,7 +206,7 @@ print_step "Step 7: Setting up application..."
 # Create necessary directories
 print_status "Creating necessary directories..."
 mkdir -p database
-mkdir -p static/uploads
+mkdir -p instance/evidence
 mkdir -p static/css
 mkdir -p static/js
 mkdir -p templates
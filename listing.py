@@ -0,0 +1,184 @@
+"""
+ACEP HIPAA Audit Assistant - List views
+Keyset (cursor) pagination and server-side filters for the evidence, risk,
+PHI, Business Associate and audit log lists, shared by the HTML pages and JSON APIs
+Created by Chaitanya Eshwar Prasad
+"""
+
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class ListSpec:
+    """How one list view selects, filters and orders its rows
+
+    sort_keys are (sql expression, row column) pairs; every key sorts
+    DESC and the last one must be unique (the id) so the order is total.
+    """
+
+    def __init__(self, select, sort_keys, filters):
+        self.select = select
+        self.sort_keys = sort_keys
+        self.filters = filters
+
+
+EVIDENCE = ListSpec(
+    select='''
+        SELECT e.*, h.title AS requirement_title
+        FROM evidence e
+        JOIN hipaa_requirements h ON e.requirement_id = h.requirement_id
+    ''',
+    sort_keys=[('e.uploaded_at', 'uploaded_at'), ('e.id', 'id')],
+    filters={
+        'requirement': 'e.requirement_id = ?',
+        'uploaded_by': 'e.uploaded_by = ?',
+    },
+)
+
+RISKS = ListSpec(
+    select='SELECT * FROM risks',
+    sort_keys=[('risk_score', 'risk_score'), ('created_at', 'created_at'), ('id', 'id')],
+    filters={
+        'status': 'status = ?',
+        'owner': 'owner = ?',
+        'level': {
+            'high': 'risk_score >= 15',
+            'medium': 'risk_score >= 8 AND risk_score < 15',
+            'low': 'risk_score < 8',
+        },
+    },
+)
+
+PHI_TYPES = ListSpec(
+    select='SELECT * FROM phi_tracking',
+    sort_keys=[('created_at', 'created_at'), ('id', 'id')],
+    filters={
+        'classification': 'classification = ?',
+    },
+)
+
+BUSINESS_ASSOCIATES = ListSpec(
+    select='SELECT * FROM business_associates',
+    sort_keys=[('created_at', 'created_at'), ('id', 'id')],
+    filters={
+        'status': 'contract_status = ?',
+        'compliance': 'compliance_status = ?',
+    },
+)
+
+AUDIT_LOG = ListSpec(
+    select='SELECT * FROM audit_log',
+    sort_keys=[('occurred_at', 'occurred_at'), ('id', 'id')],
+    filters={
+        'entity_type': 'entity_type = ?',
+        'entity_id': 'entity_id = ?',
+        'user': 'username = ?',
+        'action': 'action = ?',
+        'since': 'occurred_at >= ?',
+        'until': 'occurred_at < ?',
+    },
+)
+
+
+def encode_cursor(row, spec):
+    """Opaque cursor holding the sort-key values of a row"""
+    values = [row[column] for _, column in spec.sort_keys]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, spec):
+    """Sort-key values from a cursor, or None if it is missing or malformed"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(spec.sort_keys):
+        return None
+    return values
+
+
+def active_filters(args, spec):
+    """Filter values from the query string that the spec understands"""
+    selected = {}
+    for name, clause in spec.filters.items():
+        value = args.get(name, '').strip()
+        if not value:
+            continue
+        if isinstance(clause, dict) and value not in clause:
+            continue
+        selected[name] = value
+    return selected
+
+
+def page_size(args):
+    """Requested page size, clamped to a sane range"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def fetch_page(conn, spec, args):
+    """One page of a list view: the rows plus cursors for the neighbours
+
+    ?after=<cursor> pages forward, ?before=<cursor> pages back; both seek
+    straight to the position through the sort index instead of OFFSET.
+    """
+    limit = page_size(args)
+    filters = active_filters(args, spec)
+
+    where = []
+    params = []
+    for name, value in filters.items():
+        clause = spec.filters[name]
+        if isinstance(clause, dict):
+            where.append(clause[value])
+        else:
+            where.append(clause)
+            params.append(value)
+
+    columns = ', '.join(expression for expression, _ in spec.sort_keys)
+    placeholders = ', '.join('?' for _ in spec.sort_keys)
+
+    before = decode_cursor(args.get('before'), spec)
+    after = None if before else decode_cursor(args.get('after'), spec)
+    if after:
+        where.append(f'({columns}) < ({placeholders})')
+        params.extend(after)
+    elif before:
+        where.append(f'({columns}) > ({placeholders})')
+        params.extend(before)
+
+    direction = 'ASC' if before else 'DESC'
+    order = ', '.join(f'{expression} {direction}' for expression, _ in spec.sort_keys)
+    sql = spec.select
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += f' ORDER BY {order} LIMIT ?'
+    params.append(limit + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+
+    # Walking back we always came from a later page; walking forward we
+    # always have an earlier one (unless this is the first page).
+    has_next = has_more if not before else True
+    has_prev = bool(after) or bool(before and has_more)
+
+    return {
+        'items': rows,
+        'limit': limit,
+        'filters': filters,
+        'next_cursor': encode_cursor(rows[-1], spec) if rows and has_next else None,
+        'prev_cursor': encode_cursor(rows[0], spec) if rows and has_prev else None,
+    }
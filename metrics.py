@@ -0,0 +1,270 @@
+"""
+ACEP HIPAA Audit Assistant - Request and query metrics
+Per-endpoint latency histograms and SQL query accounting, rendered in the
+Prometheus text exposition format
+Created by Chaitanya Eshwar Prasad
+"""
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds; the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+BACKGROUND = 'background'  # endpoint label for queries outside a request (pools, writer threads)
+
+# Queries are tallied per thread, so the hot path takes no lock; a request's
+# tally is folded into the shared totals once, when it finishes
+_local = threading.local()
+_background_lock = threading.Lock()
+_background = [0, 0.0, 0]  # queries, seconds, rows
+
+# Optional slowlog.SlowQueryLog told about statements over its threshold
+_slow_query_log = None
+
+
+def set_slow_query_log(log):
+    """Report statements slower than log.threshold to log (None turns it off)"""
+    global _slow_query_log
+    _slow_query_log = log
+
+
+def current_route():
+    """Endpoint of the request this thread is serving, else the thread's name"""
+    return getattr(_local, 'route', None) or f'background:{threading.current_thread().name}'
+
+
+def observe_query(seconds, queries=0, rows=0):
+    """Add execute/fetch work to the current request's tally (or the background totals)"""
+    tally = getattr(_local, 'tally', None)
+    if tally is None:
+        with _background_lock:
+            _background[0] += queries
+            _background[1] += seconds
+            _background[2] += rows
+        return
+    tally[0] += queries
+    tally[1] += seconds
+    tally[2] += rows
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports its statements, time spent and rows fetched
+
+    A statement's duration runs from execute to the fetch that finishes it,
+    since SQLite does most of a query's work while stepping through rows.
+    """
+
+    _statement = None  # (sql, parameters) while the slow-query log is watching it
+    _elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            observe_query(elapsed, queries=1)
+        self._started(sql, parameters, elapsed)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            observe_query(elapsed, queries=1)
+        self._started(sql, None, elapsed)
+        return self
+
+    def _started(self, sql, parameters, elapsed):
+        if _slow_query_log is None:
+            self._statement = None
+            return
+        self._statement = (sql, parameters)
+        self._elapsed = elapsed
+        if self.description is None:
+            # Nothing to fetch: the statement is complete
+            self._finished()
+
+    def _finished(self):
+        sql, parameters = self._statement
+        self._statement = None
+        log = _slow_query_log
+        if log is not None and self._elapsed >= log.threshold:
+            log.record(self.connection, sql, parameters, self._elapsed, current_route())
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        elapsed = time.perf_counter() - start
+        observe_query(elapsed, rows=row is not None)
+        if self._statement is not None:
+            # fetchone is how single-row results are read; the statement counts as done
+            self._elapsed += elapsed
+            self._finished()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        elapsed = time.perf_counter() - start
+        observe_query(elapsed, rows=len(rows))
+        if self._statement is not None:
+            self._elapsed += elapsed
+            if len(rows) < size:
+                self._finished()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        elapsed = time.perf_counter() - start
+        observe_query(elapsed, rows=len(rows))
+        if self._statement is not None:
+            self._elapsed += elapsed
+            self._finished()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            if self._statement is not None:
+                self._elapsed += time.perf_counter() - start
+                self._finished()
+            raise
+        elapsed = time.perf_counter() - start
+        observe_query(elapsed, rows=1)
+        if self._statement is not None:
+            self._elapsed += elapsed
+        return row
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(int(value))
+
+
+class Histogram:
+    """Bucketed observations per label set; not thread-safe on its own"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}  # labels -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, name, label_names):
+        lines = []
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{name}_bucket{_labels(label_names, labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, labels)} {_number(series[-1])}')
+            lines.append(f'{name}_count{_labels(label_names, labels)} {cumulative}')
+        return lines
+
+
+class RequestMetrics:
+    """Per-endpoint request latency and query totals for one worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}  # (endpoint, method, status) -> count
+        self._latency = Histogram(LATENCY_BUCKETS)
+        self._query_counts = Histogram(QUERY_COUNT_BUCKETS)
+        self._queries = {}  # endpoint -> [queries, seconds, rows]
+        self.started = time.time()
+
+    def start_request(self, route=None):
+        """Begin timing the current thread's request and tallying its queries"""
+        _local.tally = [0, 0.0, 0]
+        _local.route = route
+        _local.start = time.perf_counter()
+
+    def finish_request(self, endpoint, method, status):
+        """Record the current thread's request; its later queries count as background"""
+        tally = getattr(_local, 'tally', None)
+        if tally is None:
+            return
+        elapsed = time.perf_counter() - _local.start
+        _local.tally = None
+        _local.route = None
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._latency.observe((endpoint, method), elapsed)
+            self._query_counts.observe((endpoint,), tally[0])
+            totals = self._queries.setdefault(endpoint, [0, 0.0, 0])
+            totals[0] += tally[0]
+            totals[1] += tally[1]
+            totals[2] += tally[2]
+
+    def render(self, families=()):
+        """Prometheus text format; families are extra (name, type, help, label names, {labels: value})"""
+        with self._lock:
+            queries = {endpoint: list(totals) for endpoint, totals in self._queries.items()}
+            lines = [
+                '# HELP acep_http_requests_total Requests handled, by endpoint, method and status',
+                '# TYPE acep_http_requests_total counter',
+            ]
+            lines += [f'acep_http_requests_total{_labels(("endpoint", "method", "status"), key)} {count}'
+                      for key, count in sorted(self._requests.items())]
+            lines += [
+                '# HELP acep_http_request_duration_seconds Request latency, from routing to the end of the response',
+                '# TYPE acep_http_request_duration_seconds histogram',
+            ]
+            lines += self._latency.render('acep_http_request_duration_seconds', ('endpoint', 'method'))
+            lines += [
+                '# HELP acep_db_queries_per_request SQL statements executed per request',
+                '# TYPE acep_db_queries_per_request histogram',
+            ]
+            lines += self._query_counts.render('acep_db_queries_per_request', ('endpoint',))
+        with _background_lock:
+            queries[BACKGROUND] = list(_background)
+
+        for index, (name, kind, help_text) in enumerate((
+                ('acep_db_queries_total', 'counter', 'SQL statements executed'),
+                ('acep_db_query_seconds_total', 'counter', 'Time spent executing statements and fetching rows'),
+                ('acep_db_rows_total', 'counter', 'Rows fetched from SQLite'))):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{_labels(("endpoint",), (endpoint,))} {_number(totals[index])}'
+                      for endpoint, totals in sorted(queries.items())]
+
+        for name, kind, help_text, label_names, values in families:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{_labels(label_names, labels)} {_number(value)}'
+                      for labels, value in sorted(values.items())]
+
+        lines += [
+            '# HELP acep_process_start_time_seconds Start time of this worker, in seconds since the epoch',
+            '# TYPE acep_process_start_time_seconds gauge',
+            f'acep_process_start_time_seconds {_number(self.started)}',
+        ]
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,304 @@
+"""
+ACEP HIPAA Audit Assistant - Report job queue
+Renders reports in a background pool and keeps each finished report on disk
+under (report type, data generation), so a repeat request is served from the
+stored file while the audit data is unchanged. Stored reports hold placeholders
+where the viewer's name goes, filled in as the file is sent
+Created by Chaitanya Eshwar Prasad
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPORT_TYPES = ('compliance', 'evidence', 'risk')
+
+# Tables whose changes make stored reports stale
+WATCHED_TABLES = ('hipaa_requirements', 'evidence', 'risks', 'phi_tracking', 'business_associates')
+
+STALE_RUNNING_SECONDS = 300  # a 'running' job older than this was orphaned by a crash
+
+# Stand-ins for the viewer's name and initial in stored reports; they pass
+# through HTML escaping unchanged, and no escaped name contains a NUL
+REQUESTER = '\x00requested-by\x00'
+REQUESTER_INITIAL = '\x00requested-by-initial\x00'
+
+
+def install_report_jobs(conn):
+    """Database-wide change counter and the persisted report jobs"""
+    # Unlike the per-worker DataGeneration, this counter is shared by every
+    # worker process, so they all agree on which stored report is current
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO change_counter (id, generation) VALUES (1, 0)')
+    for table in WATCHED_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS change_counter_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE change_counter SET generation = generation + 1 WHERE id = 1;
+                END
+            ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_type TEXT NOT NULL,
+            generation INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            requested_by TEXT,
+            error TEXT,
+            output_path TEXT,
+            output_size INTEGER,
+            render_seconds REAL,
+            requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            UNIQUE (report_type, generation)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_report_jobs_status ON report_jobs (status, finished_at)')
+
+
+def current_generation(conn):
+    """Generation of the audit data, bumped by triggers on every write"""
+    return conn.execute('SELECT generation FROM change_counter WHERE id = 1').fetchone()[0]
+
+
+def personalize(path, replacements, chunk_size=64 * 1024):
+    """Stream a stored report with each placeholder in replacements ({placeholder: text}) filled in"""
+    replacements = [(placeholder.encode('utf-8'), text.encode('utf-8')) for placeholder, text in replacements.items()]
+    longest = max(len(placeholder) for placeholder, _ in replacements)
+    with open(path, 'rb') as f:
+        pending = b''
+        while True:
+            chunk = f.read(chunk_size)
+            data = pending + chunk
+            for placeholder, text in replacements:
+                data = data.replace(placeholder, text)
+            # Hold back the start of a placeholder cut off by the end of the chunk
+            cut = data.find(b'\x00', max(0, len(data) - longest + 1)) if chunk else -1
+            if cut == -1:
+                cut = len(data)
+            if cut:
+                yield data[:cut]
+            pending = data[cut:]
+            if not chunk:
+                return
+
+
+def job_dict(job):
+    """JSON-friendly view of a report_jobs row"""
+    return {key: job[key] for key in ('id', 'report_type', 'generation', 'status', 'requested_by', 'error',
+                                      'output_size', 'render_seconds', 'requested_at', 'started_at',
+                                      'finished_at')}
+
+
+class ReportQueue:
+    """Bounded pool of threads rendering report jobs
+
+    render(report_type, out) writes a report's HTML to the text file out,
+    with REQUESTER and REQUESTER_INITIAL wherever the viewer is named. Jobs
+    and their outputs live in the database and on disk, so every worker
+    process can serve a report any other one rendered, to any user.
+    """
+
+    def __init__(self, db_pool, render, output_dir, root_path='', workers=2,
+                 max_age=7 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.db_pool = db_pool
+        self.render = render
+        self.output_dir = output_dir
+        self.root_path = root_path
+        self.workers = workers
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = set()
+        self._idle = threading.Condition(self._lock)
+        self._counters = {'requests': 0, 'stored_hits': 0, 'rendered': 0, 'failed': 0, 'evicted': 0}
+
+    def _get_executor(self):
+        """Start the threads on first use"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='report-render')
+        return self._executor
+
+    def output_exists(self, job):
+        """Whether a job's rendered file is still on disk"""
+        return job['output_path'] is not None and os.path.exists(os.path.join(self.root_path, job['output_path']))
+
+    def request(self, conn, report_type, requested_by):
+        """Job for a report of the current data: stored, in progress or newly queued"""
+        generation = current_generation(conn)
+        lookup = ('SELECT * FROM report_jobs WHERE report_type = ? AND generation = ?', (report_type, generation))
+        job = conn.execute(*lookup).fetchone()
+        if job is None:
+            # Another worker may insert the same job first; either row will do
+            conn.execute('''
+                INSERT OR IGNORE INTO report_jobs (report_type, generation, requested_by)
+                VALUES (?, ?, ?)
+            ''', (report_type, generation, requested_by))
+            job = conn.execute(*lookup).fetchone()
+
+        with self._lock:
+            self._counters['requests'] += 1
+            if job['status'] == 'done' and self.output_exists(job):
+                self._counters['stored_hits'] += 1
+                conn.commit()
+                return job
+
+        # Failed, evicted-from-disk and orphaned jobs are run again
+        conn.execute('''
+            UPDATE report_jobs SET status = 'queued', error = NULL
+            WHERE id = ? AND (status IN ('failed', 'done')
+                              OR (status = 'running' AND started_at < datetime('now', ?)))
+        ''', (job['id'], f'-{STALE_RUNNING_SECONDS} seconds'))
+        conn.commit()
+        self.submit(job['id'])
+        return self.get(conn, job['id'])
+
+    def get(self, conn, job_id):
+        """A report_jobs row, or None"""
+        return conn.execute('SELECT * FROM report_jobs WHERE id = ?', (job_id,)).fetchone()
+
+    def submit(self, job_id):
+        """Queue a job unless this process is already on it"""
+        with self._lock:
+            if job_id in self._in_flight:
+                return False
+            self._in_flight.add(job_id)
+            self._get_executor().submit(self._run, job_id)
+            return True
+
+    def wait(self, job_id, timeout):
+        """Wait up to timeout seconds for this process to finish a job"""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while job_id in self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _claim(self, conn, job_id):
+        """Mark the job running; None if another worker already has it"""
+        cursor = conn.execute('''
+            UPDATE report_jobs SET status = 'running', started_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'queued'
+        ''', (job_id,))
+        conn.commit()
+        if cursor.rowcount == 0:
+            return None
+        return self.get(conn, job_id)
+
+    def _run(self, job_id):
+        """Render one job to a file, then record the outcome and evict old reports"""
+        try:
+            conn = self.db_pool.acquire()
+            try:
+                job = self._claim(conn, job_id)
+                if job is None:
+                    return
+
+                output_path = os.path.join(self.output_dir, f"{job['id']}-{job['report_type']}.html")
+                start = time.perf_counter()
+                try:
+                    size = self._write(job, output_path)
+                except Exception as failure:
+                    print(f"Report generation error for job {job_id}: {failure}")
+                    conn.execute('''
+                        UPDATE report_jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (f'{type(failure).__name__}: {failure}', job_id))
+                    conn.commit()
+                    with self._lock:
+                        self._counters['failed'] += 1
+                    return
+
+                conn.execute('''
+                    UPDATE report_jobs
+                    SET status = 'done', output_path = ?, output_size = ?, render_seconds = ?,
+                        finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (output_path, size, round(time.perf_counter() - start, 3), job_id))
+                conn.commit()
+                with self._lock:
+                    self._counters['rendered'] += 1
+                self.evict(conn, keep=job_id)
+            finally:
+                conn.close()
+        except Exception as failure:
+            print(f"Report queue error for job {job_id}: {failure}")
+        finally:
+            with self._idle:
+                self._in_flight.discard(job_id)
+                self._idle.notify_all()
+
+    def _write(self, job, output_path):
+        """Render into a temp file renamed into place; returns the size in bytes"""
+        directory = os.path.join(self.root_path, os.path.dirname(output_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='render-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as out:
+                self.render(job['report_type'], out)
+            os.replace(temp_path, os.path.join(self.root_path, output_path))
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return os.path.getsize(os.path.join(self.root_path, output_path))
+
+    def _discard(self, conn, jobs):
+        """Delete jobs and their rendered files"""
+        for job in jobs:
+            if job['output_path']:
+                try:
+                    os.remove(os.path.join(self.root_path, job['output_path']))
+                except OSError:
+                    pass
+            conn.execute('DELETE FROM report_jobs WHERE id = ?', (job['id'],))
+        conn.commit()
+        with self._lock:
+            self._counters['evicted'] += len(jobs)
+
+    def evict(self, conn, keep=None):
+        """Drop finished jobs older than max_age, then the oldest until under max_bytes
+
+        The job in keep (the one just rendered) always survives, even alone over the limit.
+        """
+        expired = conn.execute('''
+            SELECT id, output_path FROM report_jobs
+            WHERE status IN ('done', 'failed') AND finished_at < datetime('now', ?) AND id IS NOT ?
+        ''', (f'-{int(self.max_age)} seconds', keep)).fetchall()
+        self._discard(conn, expired)
+
+        total = conn.execute("SELECT COALESCE(SUM(output_size), 0) FROM report_jobs WHERE status = 'done'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        oldest_first = []
+        for job in conn.execute('''
+            SELECT id, output_path, output_size FROM report_jobs
+            WHERE status = 'done' AND id IS NOT ? ORDER BY finished_at, id
+        ''', (keep,)):
+            if total <= self.max_bytes:
+                break
+            oldest_first.append(job)
+            total -= job['output_size'] or 0
+        self._discard(conn, oldest_first)
+
+    def stats(self):
+        """Queue counters for the debug endpoint"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['workers'] = self.workers
+            stats['in_flight'] = len(self._in_flight)
+        return stats
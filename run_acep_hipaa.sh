@@ -30,4 +30,10 @@ echo ""
 echo "Press Ctrl+C to stop the application"
 echo ""
 
+# --production builds the static assets and serves pre-forked gunicorn workers instead of the development server
+if [ "$1" = "--production" ]; then
+    flask --app app build-assets
+    exec gunicorn -c gunicorn.conf.py wsgi:application
+fi
+
 python3 app.py
@@ -0,0 +1,318 @@
+"""
+ACEP HIPAA Audit Assistant - Database schema and migrations
+Numbered migrations tracked in the schema_version table, each applied once
+Created by Chaitanya Eshwar Prasad
+"""
+
+import os
+import sqlite3
+
+import auditlog
+import catalog
+import evidence_store
+import export
+import extraction
+import reportjobs
+import search
+import stats
+
+
+def _baseline_tables(conn, root_path):
+    """Core application tables"""
+    # Users table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # HIPAA Security Rule Requirements table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hipaa_requirements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            requirement_id TEXT UNIQUE NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            category TEXT NOT NULL,
+            status TEXT DEFAULT 'Not Assessed',
+            notes TEXT,
+            assessed_by TEXT,
+            assessed_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Evidence table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS evidence (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            requirement_id TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            original_filename TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            file_size INTEGER,
+            description TEXT,
+            uploaded_by TEXT,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (requirement_id) REFERENCES hipaa_requirements (requirement_id)
+        )
+    ''')
+
+    # Databases created before evidence descriptions existed lack the column
+    if not _has_column(conn, 'evidence', 'description'):
+        conn.execute('ALTER TABLE evidence ADD COLUMN description TEXT')
+
+    # Risk register table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS risks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            likelihood INTEGER NOT NULL CHECK (likelihood BETWEEN 1 AND 5),
+            impact INTEGER NOT NULL CHECK (impact BETWEEN 1 AND 5),
+            risk_score INTEGER GENERATED ALWAYS AS (likelihood * impact) STORED,
+            mitigation TEXT,
+            owner TEXT,
+            status TEXT DEFAULT 'Open',
+            created_by TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # PHI Tracking table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS phi_tracking (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phi_type TEXT NOT NULL,
+            description TEXT,
+            classification TEXT NOT NULL,
+            access_patterns TEXT,
+            disposal_procedures TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Business Associate Management table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS business_associates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            contact_person TEXT,
+            email TEXT,
+            phone TEXT,
+            contract_status TEXT DEFAULT 'Active',
+            compliance_status TEXT DEFAULT 'Under Review',
+            last_assessment_date DATE,
+            next_assessment_date DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _hot_path_indexes(conn, root_path):
+    """Indexes matching the filters and sort orders used by the routes"""
+    indexes = [
+        'CREATE INDEX IF NOT EXISTS idx_evidence_requirement ON evidence (requirement_id)',
+        'CREATE INDEX IF NOT EXISTS idx_evidence_uploaded_at ON evidence (uploaded_at)',
+        'CREATE INDEX IF NOT EXISTS idx_risks_score_created ON risks (risk_score DESC, created_at DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_requirements_status ON hipaa_requirements (status)',
+        'CREATE INDEX IF NOT EXISTS idx_requirements_category ON hipaa_requirements (category, requirement_id)',
+        'CREATE INDEX IF NOT EXISTS idx_ba_contract_status ON business_associates (contract_status)',
+        'CREATE INDEX IF NOT EXISTS idx_ba_next_assessment ON business_associates (next_assessment_date)',
+    ]
+    for statement in indexes:
+        conn.execute(statement)
+
+
+def _stats_rollup(conn, root_path):
+    """Trigger-maintained statistics row"""
+    stats.install_rollup(conn)
+
+
+def _evidence_blobs(conn, root_path):
+    """Content-addressed evidence storage with reference counts"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS evidence_blobs (
+            sha256 TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    if not _has_column(conn, 'evidence', 'blob_sha256'):
+        conn.execute('ALTER TABLE evidence ADD COLUMN blob_sha256 TEXT REFERENCES evidence_blobs (sha256)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_evidence_blob ON evidence (blob_sha256)')
+
+    # Register files uploaded before the blob store existed. They stay where
+    # they are; the first copy of each distinct content becomes the blob.
+    legacy = conn.execute('SELECT id, file_path FROM evidence WHERE blob_sha256 IS NULL').fetchall()
+    for row in legacy:
+        path = os.path.join(root_path, row['file_path'])
+        if not os.path.isfile(path):
+            continue
+        digest, size = evidence_store.hash_file(path)
+        conn.execute('''
+            INSERT INTO evidence_blobs (sha256, file_path, file_size, ref_count)
+            VALUES (?, ?, ?, 1)
+            ON CONFLICT(sha256) DO UPDATE SET ref_count = ref_count + 1
+        ''', (digest, row['file_path'], size))
+        conn.execute('UPDATE evidence SET blob_sha256 = ? WHERE id = ?', (digest, row['id']))
+
+
+def _list_view_indexes(conn, root_path):
+    """Indexes for the paginated list views and their filters"""
+    indexes = [
+        'CREATE INDEX IF NOT EXISTS idx_risks_owner ON risks (owner)',
+        'CREATE INDEX IF NOT EXISTS idx_phi_created ON phi_tracking (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_phi_classification ON phi_tracking (classification, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_ba_created ON business_associates (created_at)',
+    ]
+    for statement in indexes:
+        conn.execute(statement)
+
+
+def _export_indexes(conn, root_path):
+    """Indexes for incremental exports filtered on the change timestamp"""
+    indexes = [
+        'CREATE INDEX IF NOT EXISTS idx_requirements_updated ON hipaa_requirements (updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_risks_updated ON risks (updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_phi_updated ON phi_tracking (updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_ba_updated ON business_associates (updated_at)',
+    ]
+    for statement in indexes:
+        conn.execute(statement)
+
+
+def _search_index(conn, root_path):
+    """FTS5 full-text index over the audit tables"""
+    search.install_search_index(conn)
+
+
+def _evidence_text(conn, root_path):
+    """Background text extraction jobs, searchable once extracted"""
+    extraction.install_extraction_jobs(conn)
+    search.install_evidence_content_index(conn)
+
+
+def _report_jobs(conn, root_path):
+    """Database-wide change counter and persisted report jobs"""
+    reportjobs.install_report_jobs(conn)
+
+
+def _audit_log(conn, root_path):
+    """Append-only, hash-chained audit trail"""
+    auditlog.install_audit_log(conn)
+
+
+def _catalog_state(conn, root_path):
+    """Content hash of the requirement catalog last synced"""
+    catalog.install_catalog_state(conn)
+
+
+def _shared_reports(conn, root_path):
+    """Re-render stored reports that have the first requester's name baked in"""
+    conn.execute('''
+        UPDATE report_jobs SET status = 'failed', error = 'Stored before reports named their viewer; generate it again'
+        WHERE status = 'done'
+    ''')
+
+
+def _evidence_outside_static(conn, root_path):
+    """Move evidence and previews out of static/, where they were served without a login"""
+    evidence_store.relocate(conn, evidence_store.LEGACY_FOLDER, evidence_store.DEFAULT_FOLDER, root_path)
+
+
+def _skip_binary_evidence_text(conn, root_path):
+    """Drop PDFs and other binaries that were indexed as Latin-1 text"""
+    extraction.skip_binary_text(conn, root_path)
+
+
+def _export_tombstones(conn, root_path):
+    """Tombstones for deleted rows, exported alongside incremental pulls"""
+    export.install_tombstones(conn)
+
+
+def _recheck_skipped_text(conn, root_path):
+    """Index text files wrongly skipped as MP3 or bzip2 because they start with ID3 or BZh"""
+    extraction.recheck_skipped_text(conn, root_path)
+
+
+# (version, description, apply(conn, root_path)) - append only, never renumber
+MIGRATIONS = [
+    (1, 'baseline tables', _baseline_tables),
+    (2, 'hot-path indexes', _hot_path_indexes),
+    (3, 'stats rollup', _stats_rollup),
+    (4, 'evidence blob store', _evidence_blobs),
+    (5, 'list view indexes', _list_view_indexes),
+    (6, 'export indexes', _export_indexes),
+    (7, 'full-text search index', _search_index),
+    (8, 'evidence text extraction', _evidence_text),
+    (9, 'report job queue', _report_jobs),
+    (10, 'audit trail', _audit_log),
+    (11, 'requirement catalog state', _catalog_state),
+    (12, 'stored reports name their viewer', _shared_reports),
+    (13, 'evidence outside static', _evidence_outside_static),
+    (14, 'binary evidence out of the text index', _skip_binary_evidence_text),
+    (15, 'export tombstones', _export_tombstones),
+    (16, 'text evidence skipped as binary', _recheck_skipped_text),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _has_column(conn, table, column):
+    """Check whether a table already has a column"""
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def current_version(conn):
+    """Highest applied migration version (0 for a fresh database)"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def migrate(conn, root_path=''):
+    """Apply pending migrations; returns the versions applied
+
+    Stored file paths (evidence, blobs) are relative to root_path.
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+
+    # The write lock makes concurrent workers wait here, then find the
+    # schema already migrated by whoever got the lock first.
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        version = current_version(conn)
+
+        applied = []
+        for number, description, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            apply(conn, root_path)
+            conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                         (number, description))
+            applied.append(number)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
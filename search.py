@@ -0,0 +1,214 @@
+"""
+ACEP HIPAA Audit Assistant - Full-text search
+One SQLite FTS5 index over requirements, evidence (including text extracted
+from the files), risks, PHI types and Business Associates, kept in sync with
+the base tables by triggers
+Created by Chaitanya Eshwar Prasad
+"""
+
+import re
+
+from markupsafe import escape
+
+# The FTS rowid packs the source row: rowid = source id * KIND_SPAN + kind number,
+# so a trigger can replace one entry by rowid without scanning the index.
+KIND_SPAN = 8
+
+# Highlight markers FTS5 puts around matches; swapped for <mark> after HTML escaping
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _joined(*columns):
+    """SQL concatenating nullable columns of {row} with spaces"""
+    return " || ' ' || ".join(f"COALESCE({{row}}.{column}, '')" for column in columns)
+
+
+# (kind number, kind name, table, indexed title SQL, indexed body SQL) with {row}
+# standing for NEW/OLD in triggers or the table itself when backfilling
+SEARCH_SOURCES = [
+    (1, 'requirement', 'hipaa_requirements',
+     _joined('requirement_id', 'title'), _joined('description', 'notes', 'category')),
+    (2, 'evidence', 'evidence',
+     _joined('original_filename'), _joined('description', 'requirement_id', 'uploaded_by')),
+    (3, 'risk', 'risks',
+     _joined('title'), _joined('description', 'mitigation', 'owner', 'status')),
+    (4, 'phi', 'phi_tracking',
+     _joined('phi_type'), _joined('description', 'classification', 'access_patterns', 'disposal_procedures')),
+    (5, 'business_associate', 'business_associates',
+     _joined('name'), _joined('contact_person', 'email', 'contract_status', 'compliance_status')),
+]
+
+# Text extracted from evidence files, one entry per evidence row sharing the blob
+EVIDENCE_CONTENT_KIND = 6
+
+KINDS = {name: number for number, name, _, _, _ in SEARCH_SOURCES}
+KINDS['evidence_content'] = EVIDENCE_CONTENT_KIND
+KIND_NAMES = {number: name for name, number in KINDS.items()}
+
+SEARCH_TABLE = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+'''
+
+
+def _search_triggers():
+    """CREATE TRIGGER statements keeping search_index current"""
+    statements = []
+    for number, _, table, title, body in SEARCH_SOURCES:
+        insert = (f'INSERT INTO search_index (rowid, title, body) VALUES '
+                  f'(NEW.id * {KIND_SPAN} + {number}, {title.format(row="NEW")}, {body.format(row="NEW")});')
+        delete = f'DELETE FROM search_index WHERE rowid = OLD.id * {KIND_SPAN} + {number};'
+        for suffix, event, actions in [('insert', 'INSERT', insert),
+                                       ('delete', 'DELETE', delete),
+                                       ('update', 'UPDATE', f'{delete}\n{insert}')]:
+            statements.append(f'''
+                CREATE TRIGGER IF NOT EXISTS search_index_{table}_{suffix}
+                AFTER {event} ON {table}
+                BEGIN
+                    {actions}
+                END
+            ''')
+    return statements
+
+
+def _backfill(conn):
+    """Index every existing row of the source tables"""
+    for number, _, table, title, body in SEARCH_SOURCES:
+        conn.execute(f'''
+            INSERT INTO search_index (rowid, title, body)
+            SELECT id * {KIND_SPAN} + {number}, {title.format(row=table)}, {body.format(row=table)}
+            FROM {table}
+        ''')
+
+
+def _evidence_content_triggers():
+    """Triggers indexing extracted evidence text under every evidence row of the blob"""
+    entry = f'id * {KIND_SPAN} + {EVIDENCE_CONTENT_KIND}'
+    return [f'''
+        CREATE TRIGGER IF NOT EXISTS search_index_evidence_content_extracted
+        AFTER UPDATE OF content ON evidence_text
+        BEGIN
+            DELETE FROM search_index WHERE rowid IN (
+                SELECT {entry} FROM evidence WHERE blob_sha256 = NEW.blob_sha256);
+            INSERT INTO search_index (rowid, title, body)
+            SELECT {entry}, COALESCE(original_filename, ''), NEW.content
+            FROM evidence WHERE blob_sha256 = NEW.blob_sha256 AND NEW.content IS NOT NULL;
+        END
+    ''', f'''
+        CREATE TRIGGER IF NOT EXISTS search_index_evidence_content_removed
+        AFTER DELETE ON evidence_text
+        BEGIN
+            DELETE FROM search_index WHERE rowid IN (
+                SELECT {entry} FROM evidence WHERE blob_sha256 = OLD.blob_sha256);
+        END
+    ''', f'''
+        CREATE TRIGGER IF NOT EXISTS search_index_evidence_content_insert
+        AFTER INSERT ON evidence
+        BEGIN
+            INSERT INTO search_index (rowid, title, body)
+            SELECT NEW.{entry}, COALESCE(NEW.original_filename, ''), content
+            FROM evidence_text WHERE blob_sha256 = NEW.blob_sha256 AND content IS NOT NULL;
+        END
+    ''', f'''
+        CREATE TRIGGER IF NOT EXISTS search_index_evidence_content_delete
+        AFTER DELETE ON evidence
+        BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.{entry};
+        END
+    ''']
+
+
+def _backfill_evidence_content(conn):
+    """Index text already extracted from evidence files"""
+    conn.execute(f'''
+        INSERT INTO search_index (rowid, title, body)
+        SELECT e.id * {KIND_SPAN} + {EVIDENCE_CONTENT_KIND}, COALESCE(e.original_filename, ''), t.content
+        FROM evidence e JOIN evidence_text t ON t.blob_sha256 = e.blob_sha256
+        WHERE t.content IS NOT NULL
+    ''')
+
+
+def install_evidence_content_index(conn):
+    """Add extracted evidence text to the search index (needs the evidence_text table)"""
+    for statement in _evidence_content_triggers():
+        conn.execute(statement)
+    _backfill_evidence_content(conn)
+
+
+def install_search_index(conn):
+    """Create the FTS5 index and its triggers, indexing existing rows"""
+    conn.execute(SEARCH_TABLE)
+    for statement in _search_triggers():
+        conn.execute(statement)
+    if conn.execute('SELECT 1 FROM search_index LIMIT 1').fetchone() is None:
+        _backfill(conn)
+
+
+def rebuild_search_index(conn):
+    """Re-index every row from scratch and merge the index segments"""
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    conn.execute('DELETE FROM search_index')
+    _backfill(conn)
+    _backfill_evidence_content(conn)
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+    conn.commit()
+    return conn.execute('SELECT COUNT(*) FROM search_index').fetchone()[0]
+
+
+def match_expression(query):
+    """FTS5 MATCH expression for free text: every word must match, the last as a prefix
+
+    Words are quoted so user input can never be parsed as FTS5 syntax.
+    """
+    words = re.findall(r'\w+', query, re.UNICODE)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlighted(text):
+    """HTML-escape indexed text, turning the FTS5 match markers into <mark> tags"""
+    return str(escape(text)).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+def search(conn, query, kinds=None, limit=DEFAULT_LIMIT, offset=0):
+    """Ranked matches with highlighted title and body snippet, plus the total count"""
+    expression = match_expression(query)
+    if expression is None:
+        return {'total': 0, 'results': []}
+
+    where = 'search_index MATCH ?'
+    params = [expression]
+    if kinds:
+        where += f" AND (rowid % {KIND_SPAN}) IN ({', '.join('?' for _ in kinds)})"
+        params.extend(KINDS[kind] for kind in kinds)
+
+    total = conn.execute(f'SELECT COUNT(*) FROM search_index WHERE {where}', params).fetchone()[0]
+    rows = conn.execute(f'''
+        SELECT rowid,
+               highlight(search_index, 0, ?, ?) AS title,
+               snippet(search_index, 1, ?, ?, '...', 16) AS snippet,
+               bm25(search_index, 10.0, 1.0) AS score
+        FROM search_index
+        WHERE {where}
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    ''', [MATCH_START, MATCH_END, MATCH_START, MATCH_END] + params + [limit, offset]).fetchall()
+
+    results = [{
+        'type': KIND_NAMES[row['rowid'] % KIND_SPAN],
+        'id': row['rowid'] // KIND_SPAN,
+        'title': _highlighted(row['title']),
+        'snippet': _highlighted(row['snippet']),
+        'score': round(-row['score'], 4),
+    } for row in rows]
+    return {'total': total, 'results': results}
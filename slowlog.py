@@ -0,0 +1,172 @@
+"""
+ACEP HIPAA Audit Assistant - Slow-query log
+Statements slower than a threshold are logged with their normalized SQL,
+parameter shape, duration, route and EXPLAIN QUERY PLAN, and aggregated
+into a top-N report
+Created by Chaitanya Eshwar Prasad
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+MAX_STATEMENTS = 500  # distinct normalized statements kept in memory
+MAX_SHAPES = 5  # parameter shapes and routes remembered per statement
+PLAN_REFRESH_SECONDS = 600  # re-run EXPLAIN QUERY PLAN after this, in case indexes changed
+
+# Statements EXPLAIN QUERY PLAN can describe
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_FULL_SCAN = re.compile(r'\s*SCAN (?!CONSTANT ROW)\S+')
+
+
+def normalize_sql(sql):
+    """SQL with literals replaced and whitespace collapsed, so variants group together"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(?, ...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def param_shape(parameters):
+    """Types of the bound parameters; the values may be PHI and are never logged"""
+    if parameters is None:
+        return 'many'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in sorted(parameters.items())) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+
+
+def explain(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN as indented lines, or None for statements it cannot describe"""
+    if parameters is None or not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    try:
+        # A plain cursor, so the plan lookup is not itself timed or logged
+        rows = conn.cursor(sqlite3.Cursor).execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    except sqlite3.Error as failure:
+        return [f'(plan unavailable: {failure})']
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return lines
+
+
+def plan_flags(plan):
+    """Full table scans and temp B-tree sorts, the usual reasons a query got slow"""
+    plan = plan or []
+    return {
+        # "SCAN t" with no index named reads every row of the table
+        'full_scan': any(_FULL_SCAN.fullmatch(line) for line in plan),
+        'temp_btree': any('USE TEMP B-TREE' in line for line in plan),
+    }
+
+
+class SlowQueryLog:
+    """Statements over the threshold, appended to a JSON-lines file and aggregated per normalized SQL"""
+
+    def __init__(self, threshold_ms=100, log_path=None, top=20):
+        self.threshold = threshold_ms / 1000.0
+        self.log_path = log_path
+        self.top = top
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._counters = {'logged': 0, 'dropped_statements': 0}
+
+    def record(self, conn, sql, parameters, seconds, route):
+        """Called by the timed cursor when a statement finishes over the threshold"""
+        normalized = normalize_sql(sql)
+        with self._lock:
+            known = self._statements.get(normalized)
+            plan = known['plan'] if known else None
+            stale = known is None or time.monotonic() - known['planned_at'] > PLAN_REFRESH_SECONDS
+        if stale:
+            plan = explain(conn, sql, parameters)
+
+        entry = {
+            'at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'route': route,
+            'duration_ms': round(seconds * 1000, 2),
+            'sql': normalized,
+            'params': param_shape(parameters),
+            'plan': plan,
+        }
+        self.add(entry, replan=stale)
+        if self.log_path:
+            try:
+                with self._lock, open(self.log_path, 'a', encoding='utf-8') as log:
+                    log.write(json.dumps(entry) + '\n')
+            except OSError as failure:
+                print(f'Slow query log write failed: {failure}')
+
+    def add(self, entry, replan=True):
+        """Fold one logged entry into the per-statement aggregates"""
+        with self._lock:
+            self._counters['logged'] += 1
+            stats = self._statements.get(entry['sql'])
+            if stats is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    # Forget the statement that has cost the least so far
+                    cheapest = min(self._statements, key=lambda sql: self._statements[sql]['total_ms'])
+                    del self._statements[cheapest]
+                    self._counters['dropped_statements'] += 1
+                stats = self._statements[entry['sql']] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'routes': {}, 'params': [],
+                    'plan': None, 'planned_at': 0.0, 'last_seen': None,
+                }
+            stats['count'] += 1
+            stats['total_ms'] += entry['duration_ms']
+            stats['max_ms'] = max(stats['max_ms'], entry['duration_ms'])
+            stats['last_seen'] = entry['at']
+            stats['routes'][entry['route']] = stats['routes'].get(entry['route'], 0) + 1
+            if entry['params'] not in stats['params'] and len(stats['params']) < MAX_SHAPES:
+                stats['params'].append(entry['params'])
+            if replan and entry['plan'] is not None:
+                stats['plan'] = entry['plan']
+                stats['planned_at'] = time.monotonic()
+
+    def report(self, top=None):
+        """The statements with the most total time spent over the threshold"""
+        with self._lock:
+            ranked = sorted(self._statements.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+            ranked = ranked[:top or self.top]
+            statements = []
+            for sql, stats in ranked:
+                routes = sorted(stats['routes'].items(), key=lambda item: item[1], reverse=True)[:MAX_SHAPES]
+                statements.append(dict({
+                    'sql': sql,
+                    'count': stats['count'],
+                    'total_ms': round(stats['total_ms'], 2),
+                    'avg_ms': round(stats['total_ms'] / stats['count'], 2),
+                    'max_ms': stats['max_ms'],
+                    'routes': dict(routes),
+                    'params': list(stats['params']),
+                    'plan': stats['plan'],
+                    'last_seen': stats['last_seen'],
+                }, **plan_flags(stats['plan'])))
+            return {
+                'threshold_ms': round(self.threshold * 1000, 3),
+                'distinct_statements': len(self._statements),
+                'logged': self._counters['logged'],
+                'statements': statements,
+            }
+
+
+def read_log(path, threshold_ms=0, top=20):
+    """Aggregate a slow-query log file (all worker processes) into the same report"""
+    log = SlowQueryLog(threshold_ms, top=top)
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                log.add(json.loads(line))
+    return log.report()
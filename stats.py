@@ -0,0 +1,266 @@
+"""
+ACEP HIPAA Audit Assistant - Compliance statistics
+Single-pass aggregate queries shared by the dashboard, reports and stats APIs,
+plus a trigger-maintained rollup row so page views read the counts in O(1)
+Created by Chaitanya Eshwar Prasad
+"""
+
+# Risk score buckets (risk_score = likelihood * impact, 1..25)
+HIGH_RISK_THRESHOLD = 15
+MEDIUM_RISK_THRESHOLD = 8
+
+
+def requirement_stats(conn):
+    """Requirement counts by assessment status in one table scan"""
+    row = conn.execute('''
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(CASE WHEN status = 'Compliant' THEN 1 ELSE 0 END), 0) AS compliant,
+               COALESCE(SUM(CASE WHEN status = 'Not Compliant' THEN 1 ELSE 0 END), 0) AS non_compliant,
+               COALESCE(SUM(CASE WHEN status = 'Not Applicable' THEN 1 ELSE 0 END), 0) AS not_applicable,
+               COALESCE(SUM(CASE WHEN status = 'Not Assessed' THEN 1 ELSE 0 END), 0) AS not_assessed
+        FROM hipaa_requirements
+    ''').fetchone()
+    return dict(row)
+
+
+def risk_stats(conn):
+    """Risk counts by score bucket in one table scan"""
+    row = conn.execute('''
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(CASE WHEN risk_score >= ? THEN 1 ELSE 0 END), 0) AS high,
+               COALESCE(SUM(CASE WHEN risk_score >= ? AND risk_score < ? THEN 1 ELSE 0 END), 0) AS medium,
+               COALESCE(SUM(CASE WHEN risk_score < ? THEN 1 ELSE 0 END), 0) AS low
+        FROM risks
+    ''', (HIGH_RISK_THRESHOLD, MEDIUM_RISK_THRESHOLD, HIGH_RISK_THRESHOLD, MEDIUM_RISK_THRESHOLD)).fetchone()
+    return dict(row)
+
+
+def evidence_stats(conn):
+    """Evidence file count and total stored size"""
+    row = conn.execute('''
+        SELECT COUNT(*) AS total, COALESCE(SUM(file_size), 0) AS total_size
+        FROM evidence
+    ''').fetchone()
+    return dict(row)
+
+
+def phi_stats(conn):
+    """PHI type count"""
+    row = conn.execute('SELECT COUNT(*) AS total FROM phi_tracking').fetchone()
+    return dict(row)
+
+
+def business_associate_stats(conn):
+    """Business Associate counts by contract status"""
+    row = conn.execute('''
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(CASE WHEN contract_status = 'Active' THEN 1 ELSE 0 END), 0) AS active
+        FROM business_associates
+    ''').fetchone()
+    return dict(row)
+
+
+def phi_classification_stats(conn):
+    """PHI type counts by risk classification"""
+    row = conn.execute('''
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(CASE WHEN classification = 'High' THEN 1 ELSE 0 END), 0) AS high,
+               COALESCE(SUM(CASE WHEN classification = 'Medium' THEN 1 ELSE 0 END), 0) AS medium,
+               COALESCE(SUM(CASE WHEN classification = 'Low' THEN 1 ELSE 0 END), 0) AS low
+        FROM phi_tracking
+    ''').fetchone()
+    return dict(row)
+
+
+def business_associate_status_stats(conn):
+    """Business Associate counts by contract and compliance status"""
+    row = conn.execute('''
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(CASE WHEN contract_status = 'Active' THEN 1 ELSE 0 END), 0) AS active,
+               COALESCE(SUM(CASE WHEN contract_status = 'Pending' THEN 1 ELSE 0 END), 0) AS pending,
+               COALESCE(SUM(CASE WHEN compliance_status = 'Compliant' THEN 1 ELSE 0 END), 0) AS compliant,
+               COALESCE(SUM(CASE WHEN compliance_status = 'Under Review' THEN 1 ELSE 0 END), 0) AS under_review
+        FROM business_associates
+    ''').fetchone()
+    return dict(row)
+
+
+def evidence_overview(conn, today):
+    """Evidence totals for the evidence page header"""
+    row = conn.execute('''
+        SELECT COUNT(*) AS total,
+               COUNT(DISTINCT requirement_id) AS requirements_covered,
+               COUNT(DISTINCT uploaded_by) AS uploaders,
+               COALESCE(SUM(file_size), 0) AS total_size,
+               COALESCE(SUM(CASE WHEN uploaded_at >= ? THEN 1 ELSE 0 END), 0) AS today_uploads
+        FROM evidence
+    ''', (today,)).fetchone()
+    return dict(row)
+
+
+def compliance_percentage(requirements):
+    """Share of assessed requirements that are compliant"""
+    assessed = requirements['total'] - requirements['not_assessed']
+    return round((requirements['compliant'] / assessed * 100) if assessed > 0 else 0, 1)
+
+
+def collect_stats(conn):
+    """All dashboard statistics, one aggregate query per table"""
+    return {
+        'requirements': requirement_stats(conn),
+        'risks': risk_stats(conn),
+        'evidence': evidence_stats(conn),
+        'phi': phi_stats(conn),
+        'business_associates': business_associate_stats(conn),
+    }
+
+
+# Materialized statistics: one row kept current by triggers on the base tables.
+# Each column maps to (section, key) in the collect_stats() structure.
+ROLLUP_COLUMNS = [
+    ('req_total', 'requirements', 'total'),
+    ('req_compliant', 'requirements', 'compliant'),
+    ('req_non_compliant', 'requirements', 'non_compliant'),
+    ('req_not_applicable', 'requirements', 'not_applicable'),
+    ('req_not_assessed', 'requirements', 'not_assessed'),
+    ('risk_total', 'risks', 'total'),
+    ('risk_high', 'risks', 'high'),
+    ('risk_medium', 'risks', 'medium'),
+    ('risk_low', 'risks', 'low'),
+    ('evidence_total', 'evidence', 'total'),
+    ('evidence_size', 'evidence', 'total_size'),
+    ('phi_total', 'phi', 'total'),
+    ('ba_total', 'business_associates', 'total'),
+    ('ba_active', 'business_associates', 'active'),
+]
+
+ROLLUP_TABLE = '''
+    CREATE TABLE IF NOT EXISTS stats_rollup (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        {columns},
+        rebuilt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''.format(columns=',\n        '.join(f'{column} INTEGER NOT NULL DEFAULT 0' for column, _, _ in ROLLUP_COLUMNS))
+
+
+def _flag(condition):
+    """Contribution of 1 when condition holds, else 0 (NULL-safe)"""
+    return f'CASE WHEN {condition} THEN 1 ELSE 0 END'
+
+
+# Per source table: the rollup columns it feeds and the contribution of a
+# single row to each, with {row} standing for NEW or OLD inside the trigger.
+ROLLUP_SOURCES = [
+    ('hipaa_requirements', 'status', [
+        ('req_total', '1'),
+        ('req_compliant', _flag("{row}.status = 'Compliant'")),
+        ('req_non_compliant', _flag("{row}.status = 'Not Compliant'")),
+        ('req_not_applicable', _flag("{row}.status = 'Not Applicable'")),
+        ('req_not_assessed', _flag("{row}.status = 'Not Assessed'")),
+    ]),
+    # risk_score is a generated column, so watch the inputs that drive it
+    ('risks', 'likelihood, impact', [
+        ('risk_total', '1'),
+        ('risk_high', _flag(f'{{row}}.risk_score >= {HIGH_RISK_THRESHOLD}')),
+        ('risk_medium', _flag(f'{{row}}.risk_score >= {MEDIUM_RISK_THRESHOLD} '
+                              f'AND {{row}}.risk_score < {HIGH_RISK_THRESHOLD}')),
+        ('risk_low', _flag(f'{{row}}.risk_score < {MEDIUM_RISK_THRESHOLD}')),
+    ]),
+    ('evidence', 'file_size', [
+        ('evidence_total', '1'),
+        ('evidence_size', 'COALESCE({row}.file_size, 0)'),
+    ]),
+    ('phi_tracking', None, [
+        ('phi_total', '1'),
+    ]),
+    ('business_associates', 'contract_status', [
+        ('ba_total', '1'),
+        ('ba_active', _flag("{row}.contract_status = 'Active'")),
+    ]),
+]
+
+
+def _rollup_triggers():
+    """CREATE TRIGGER statements keeping stats_rollup current"""
+    statements = []
+    for table, watched_columns, contributions in ROLLUP_SOURCES:
+        events = [
+            ('insert', 'INSERT', [f'{column} = {column} + ({value.format(row="NEW")})'
+                                  for column, value in contributions]),
+            ('delete', 'DELETE', [f'{column} = {column} - ({value.format(row="OLD")})'
+                                  for column, value in contributions]),
+        ]
+        if watched_columns:
+            events.append(('update', f'UPDATE OF {watched_columns}',
+                           [f'{column} = {column} - ({value.format(row="OLD")}) + ({value.format(row="NEW")})'
+                            for column, value in contributions if value != '1']))
+        for suffix, event, clauses in events:
+            statements.append(f'''
+                CREATE TRIGGER IF NOT EXISTS stats_rollup_{table}_{suffix}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE stats_rollup SET {', '.join(clauses)} WHERE id = 1;
+                END
+            ''')
+    return statements
+
+
+def install_rollup(conn):
+    """Create the rollup table and triggers, seeding the row if needed"""
+    conn.execute(ROLLUP_TABLE)
+    for statement in _rollup_triggers():
+        conn.execute(statement)
+    if conn.execute('SELECT 1 FROM stats_rollup WHERE id = 1').fetchone() is None:
+        _store_rollup(conn, _flatten(collect_stats(conn)))
+
+
+def _flatten(collected):
+    """Map collect_stats() output onto rollup column names"""
+    return {column: collected[section][key] for column, section, key in ROLLUP_COLUMNS}
+
+
+def _store_rollup(conn, values):
+    """Overwrite the rollup row with freshly computed values"""
+    columns = ', '.join(values)
+    placeholders = ', '.join('?' for _ in values)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO stats_rollup (id, {columns}, rebuilt_at)
+        VALUES (1, {placeholders}, CURRENT_TIMESTAMP)
+    ''', list(values.values()))
+
+
+def rebuild_rollup(conn):
+    """Recompute the rollup from the base tables; returns the drift found"""
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    actual = _flatten(collect_stats(conn))
+    drift = _diff_rollup(conn, actual)
+    _store_rollup(conn, actual)
+    conn.commit()
+    return drift
+
+
+def _diff_rollup(conn, actual):
+    """Columns whose stored rollup value differs from actual"""
+    stored = conn.execute('SELECT * FROM stats_rollup WHERE id = 1').fetchone()
+    if stored is None:
+        return {column: {'stored': None, 'actual': value} for column, value in actual.items()}
+    return {column: {'stored': stored[column], 'actual': value}
+            for column, value in actual.items() if stored[column] != value}
+
+
+def check_rollup(conn):
+    """Compare the rollup with the base tables without modifying it"""
+    return _diff_rollup(conn, _flatten(collect_stats(conn)))
+
+
+def read_rollup(conn):
+    """All statistics from the materialized row (same shape as collect_stats)"""
+    row = conn.execute('SELECT * FROM stats_rollup WHERE id = 1').fetchone()
+    if row is None:
+        return collect_stats(conn)
+
+    summary = {}
+    for column, section, key in ROLLUP_COLUMNS:
+        summary.setdefault(section, {})[key] = row[column]
+    return summary
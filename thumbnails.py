@@ -0,0 +1,183 @@
+"""
+ACEP HIPAA Audit Assistant - Image evidence previews
+Renders thumbnails and downscaled previews of image evidence in a background
+pool, cached on disk under the blob's SHA-256 so they never change
+Created by Chaitanya Eshwar Prasad
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow missing: evidence keeps its file-type icon
+    Image = None
+
+# Rendition name -> bounding box; largest first, each one is scaled from the previous
+RENDITIONS = {
+    'preview': (1280, 1280),
+    'thumb': (320, 320),
+}
+JPEG_QUALITY = 82
+MAX_IMAGE_PIXELS = 64 * 1000 * 1000  # refuse to decode larger images (decompression bomb guard)
+
+# Leading bytes of the formats Pillow decodes; the upload's file name is not trusted
+IMAGE_SIGNATURES = (
+    b'\x89PNG\r\n\x1a\n',
+    b'\xff\xd8\xff',
+    b'GIF87a',
+    b'GIF89a',
+    b'BM',
+    b'II*\x00',
+    b'MM\x00*',
+)
+
+
+def available():
+    """Whether Pillow is installed"""
+    return Image is not None
+
+
+def rendition_path(cache_dir, digest, name):
+    """Cache location of one rendition of a blob (fanned out like the blob store)"""
+    return os.path.join(cache_dir, digest[:2], f'{digest}-{name}.jpg')
+
+
+def is_image(path):
+    """Sniff the file header for a supported image format"""
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return True
+    return head.startswith(IMAGE_SIGNATURES)
+
+
+def _flatten(image):
+    """RGB copy of an image, transparent areas painted white (JPEG has no alpha)"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render(source_path, cache_dir, digest):
+    """Write every rendition of an image; returns the paths written"""
+    written = []
+    with Image.open(source_path) as image:
+        if image.width * image.height > MAX_IMAGE_PIXELS:
+            raise ValueError(f'image too large ({image.width}x{image.height})')
+
+        # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale, skipping most of the work
+        image.draft('RGB', next(iter(RENDITIONS.values())))
+        current = _flatten(ImageOps.exif_transpose(image))
+
+    for name, size in RENDITIONS.items():
+        current.thumbnail(size, Image.LANCZOS, reducing_gap=3.0)
+        path = rendition_path(cache_dir, digest, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename, so a request never sees a half-written file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='render-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                current.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        written.append(path)
+    return written
+
+
+def remove_renditions(cache_dir, digest):
+    """Delete the cached renditions of a blob that no longer exists"""
+    for name in RENDITIONS:
+        try:
+            os.remove(rendition_path(cache_dir, digest, name))
+        except OSError:
+            pass
+
+
+class ThumbnailPool:
+    """Bounded pool of threads rendering image previews in the background
+
+    Pillow releases the GIL while decoding and resampling, so threads scale
+    across cores. The cache on disk is the only state: a rendition that
+    exists is done.
+    """
+
+    def __init__(self, cache_dir, root_path='', workers=1):
+        self.cache_dir = cache_dir
+        self.root_path = root_path
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = set()
+        self._idle = threading.Condition(self._lock)
+        self._counters = {'rendered': 0, 'skipped': 0, 'failed': 0, 'render_seconds': 0.0}
+
+    def _get_executor(self):
+        """Start the threads on first use"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='evidence-preview')
+        return self._executor
+
+    def cached(self, digest, name='thumb'):
+        """Whether a rendition of the blob is on disk"""
+        return os.path.exists(os.path.join(self.root_path, rendition_path(self.cache_dir, digest, name)))
+
+    def submit(self, digest, file_path):
+        """Queue a blob for rendering unless it is cached, unsupported or already queued"""
+        if not available() or self.cached(digest, 'preview'):
+            return False
+        with self._lock:
+            if digest in self._in_flight:
+                return False
+            self._in_flight.add(digest)
+            self._get_executor().submit(self._run, digest, file_path)
+            return True
+
+    def drain(self, timeout=None):
+        """Wait until this process has no queued or running renders"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _run(self, digest, file_path):
+        """Render one blob; non-images are skipped, broken images only counted"""
+        start = time.perf_counter()
+        try:
+            source_path = os.path.join(self.root_path, file_path)
+            if not is_image(source_path):
+                outcome = 'skipped'
+            else:
+                render(source_path, os.path.join(self.root_path, self.cache_dir), digest)
+                outcome = 'rendered'
+        except Exception as failure:
+            print(f'Evidence preview error for {digest}: {failure}')
+            outcome = 'failed'
+        with self._idle:
+            self._counters[outcome] += 1
+            self._counters['render_seconds'] += time.perf_counter() - start
+            self._in_flight.discard(digest)
+            self._idle.notify_all()
+
+    def stats(self):
+        """Pool counters for the debug endpoint"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['render_seconds'] = round(stats['render_seconds'], 3)
+            stats['workers'] = self.workers
+            stats['in_flight'] = len(self._in_flight)
+            stats['available'] = available()
+        return stats
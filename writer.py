@@ -0,0 +1,183 @@
+"""
+ACEP HIPAA Audit Assistant - Write coordinator
+Serializes the routes' database writes through one writer thread per worker,
+which group-commits queued write intents in a single transaction each
+Created by Chaitanya Eshwar Prasad
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class WriteTimeout(Exception):
+    """Raised when a write intent is not committed in time"""
+
+
+class WriteCoordinator:
+    """Single writer thread applying write intents in group commits
+
+    A write intent is a function taking the writer's connection. Intents
+    queued while a transaction is in progress are applied together in the
+    next one, each inside its own SAVEPOINT: a failing intent is rolled
+    back alone and its exception re-raised in the caller, the rest commit.
+    Intents must not commit, roll back or BEGIN themselves; work that must
+    wait for the commit, like deleting files, is queued with after_commit().
+
+    Reads stay on the pooled connections and run in parallel under WAL.
+    """
+
+    def __init__(self, db_pool, max_batch=64, max_queue=1000, timeout=30.0):
+        self.db_pool = db_pool
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._conn = None
+        self._after_commit = []
+        self._counters = {'intents': 0, 'failed_intents': 0, 'batches': 0, 'largest_batch': 0,
+                          'commit_errors': 0, 'commit_seconds': 0.0, 'after_commit_errors': 0}
+
+    def _ensure_thread(self):
+        """Start the writer thread on first use"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, intent, *args):
+        """Queue a write intent; returns a Future for its result"""
+        self._ensure_thread()
+        future = Future()
+        try:
+            self._queue.put((future, intent, args), timeout=self.timeout)
+        except queue.Full:
+            raise WriteTimeout(f'write queue full for {self.timeout}s') from None
+        return future
+
+    def run(self, intent, *args):
+        """Apply a write intent and wait until it is committed; returns its result"""
+        future = self.submit(intent, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            raise WriteTimeout(f'write not committed within {self.timeout}s') from None
+
+    def after_commit(self, intent, *args):
+        """From inside a write intent: apply another intent once the current batch has committed
+
+        It runs on the writer thread in a transaction of its own, before the
+        callers of the batch are released, and is dropped if the intent that
+        queued it, or the whole batch, is rolled back. Its errors are logged.
+        """
+        self._after_commit.append((intent, args))
+
+    def execute(self, sql, params=()):
+        """Commit a single statement; returns its cursor (lastrowid, rowcount)"""
+        return self.run(lambda conn: conn.execute(sql, params))
+
+    def _loop(self):
+        """Take whatever is queued (up to max_batch) and apply it as one transaction"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(batch)
+
+    def _connection(self):
+        """The writer's own connection, held for the life of the thread"""
+        if self._conn is None:
+            self._conn = self.db_pool.acquire()
+        return self._conn
+
+    def _apply(self, batch):
+        """Run a batch of intents under savepoints and commit them together"""
+        start = time.perf_counter()
+        outcomes = []
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            for future, intent, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT write_intent')
+                queued = len(self._after_commit)
+                try:
+                    result = intent(conn, *args)
+                    conn.execute('RELEASE write_intent')
+                    outcomes.append((future, result, None))
+                except Exception as failure:
+                    conn.execute('ROLLBACK TO write_intent')
+                    conn.execute('RELEASE write_intent')
+                    del self._after_commit[queued:]
+                    outcomes.append((future, None, failure))
+            conn.commit()
+        except Exception as failure:
+            self._after_commit.clear()
+            # Nothing in the batch was committed; every caller gets the error.
+            # The pool rolls the connection back (or discards it if broken).
+            if self._conn is not None:
+                self.db_pool.release(self._conn)
+                self._conn = None
+            with self._lock:
+                self._counters['commit_errors'] += 1
+            for future, _, _ in batch:
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(failure)
+            return
+
+        with self._lock:
+            self._counters['intents'] += len(outcomes)
+            self._counters['failed_intents'] += sum(1 for _, _, failure in outcomes if failure is not None)
+            self._counters['batches'] += 1
+            self._counters['largest_batch'] = max(self._counters['largest_batch'], len(outcomes))
+            self._counters['commit_seconds'] += time.perf_counter() - start
+        self._apply_after_commit()
+        for future, result, failure in outcomes:
+            if failure is None:
+                future.set_result(result)
+            else:
+                future.set_exception(failure)
+
+    def _apply_after_commit(self):
+        """Run the intents queued with after_commit, each under its own savepoint"""
+        follow_ups, self._after_commit = self._after_commit, []
+        if not follow_ups:
+            return
+        failures = 0
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            for intent, args in follow_ups:
+                conn.execute('SAVEPOINT write_intent')
+                try:
+                    intent(conn, *args)
+                    conn.execute('RELEASE write_intent')
+                except Exception as failure:
+                    conn.execute('ROLLBACK TO write_intent')
+                    conn.execute('RELEASE write_intent')
+                    print(f"After-commit write {getattr(intent, '__name__', intent)} failed: {failure}")
+                    failures += 1
+            conn.commit()
+        except Exception as failure:
+            print(f"After-commit writes not committed: {failure}")
+            failures = len(follow_ups)
+            if self._conn is not None:
+                self.db_pool.release(self._conn)
+                self._conn = None
+        with self._lock:
+            self._counters['after_commit_errors'] += failures
+
+    def stats(self):
+        """Writer counters for the debug endpoint"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['commit_seconds'] = round(stats['commit_seconds'], 4)
+        stats['queued'] = self._queue.qsize()
+        stats['max_batch'] = self.max_batch
+        return stats
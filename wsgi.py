@@ -0,0 +1,12 @@
+"""
+ACEP HIPAA Audit Assistant - WSGI entry point
+Production servers load `application` from here; gunicorn.conf.py runs it
+as pre-forked worker processes
+Created by Chaitanya Eshwar Prasad
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:application
+"""
+
+from app import create_app
+
+application = create_app()